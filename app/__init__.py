@@ -1,19 +1,32 @@
 from flask import Flask
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-import redis
 from flask_cors import CORS
+from flask_migrate import Migrate
 from sqlalchemy.exc import SQLAlchemyError
 from flasgger import Swagger
 
 from .config import Config
+from .commands import register_commands
 from .database import db
 from .routes.users import users_bp
 from .routes.products import products_bp
 from .routes.orders import orders_bp
+from .routes.cart import cart_bp
+from .routes.analytics import analytics_bp
 from .routes.auth import auth_bp
 from .routes.email import email_bp
+from .routes.metrics import metrics_bp
+from .services.rate_limit import RateLimitCost, rate_limit_key, endpoint_cost
+from .services.related_products import RelatedProducts
+from .services.order_events import OrderEventHub
 from .utils.error_handler import ErrorHandler
+from .utils.json_provider import get_json_provider_class
+from .utils.compression import Compression
+from .utils.cache import ResponseCache
+from .utils.metrics import Metrics, InstrumentedRedis
+from .utils.query_tracker import QueryTracker
+from .utils.rate_limit_storage import HybridRedisStorage  # registers the hybrid+redis:// storage scheme
+from .utils.profiler import RequestProfiler
 
 
 def create_app(config: Config = None):
@@ -23,6 +36,8 @@ def create_app(config: Config = None):
     else:
         app.config.from_object(Config)
 
+    app.json = get_json_provider_class(app.config.get("JSON_PROVIDER"))(app)
+
     CORS(app,
          origins=["https://dag-c.github.io"],
          methods=["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
@@ -30,22 +45,44 @@ def create_app(config: Config = None):
          supports_credentials=True)
 
     db.init_app(app)
+    Migrate(app, db)
+
+    # after_request hooks run in reverse order: compression is registered first to run last
+    Compression.init_app(app)
+
+    # Instrumentation hooks go first so they also see requests rejected by the limiter
+    QueryTracker.init_app(app)
+    Metrics.init_app(app)
+    RequestProfiler.init_app(app)
 
-    redis_connection = redis.Redis.from_url(app.config["REDIS_URL"])
+    redis_connection = InstrumentedRedis.from_url(app.config["REDIS_URL"])
+    app.extensions["redis"] = redis_connection
+    ResponseCache.init_app(app)
+    RelatedProducts.init_app(app)
+    # One pub/sub connection per worker shared by all its open /orders/stream connections
+    app.extensions["order_events"] = OrderEventHub(redis_connection)
 
+    # Local counters in each worker, reconciled with Redis in batches
+    redis_url = app.config["REDIS_URL"]
     limiter = Limiter(
-        get_remote_address,
-        storage_uri=Config.REDIS_URL,
+        rate_limit_key,
+        storage_uri=f"hybrid+{redis_url}" if redis_url else None,
         app=app,
-        default_limits=["100/hour"]
+        default_limits=["100/hour"],
+        default_limits_cost=endpoint_cost
     )
+    RateLimitCost.init_app(app, limiter)
 
     # Register blueprints
     app.register_blueprint(users_bp)
     app.register_blueprint(products_bp)
     app.register_blueprint(orders_bp)
+    app.register_blueprint(cart_bp)
+    app.register_blueprint(analytics_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(email_bp)
+    app.register_blueprint(metrics_bp)
+    limiter.exempt(metrics_bp)
 
     # Swagger
     swagger_template = {
@@ -71,6 +108,7 @@ def create_app(config: Config = None):
     Swagger(app, template=swagger_template)
 
     ErrorHandler.init_app(app)
+    register_commands(app)
 
     with app.app_context():
         try:
@@ -0,0 +1,256 @@
+import time
+import logging
+from datetime import datetime, timezone
+import click
+from redis.exceptions import RedisError
+from flask import current_app
+from flask.cli import with_appcontext
+from app.database import db
+from app.services import analytics, flash_sale, leaderboard, partitions, related_products, reservations
+from app.services.cart import invalidate_product_snapshots
+from app.utils.cache import invalidate_tags
+from app.services.synthetic_data import generate
+
+
+class _RateReporter:
+    """
+    Prints the rows loaded so far and the rows per second of every table.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.rows = {}
+
+    def __call__(self, table: str, rows: int):
+        self.rows[table] = self.rows.get(table, 0) + rows
+        elapsed = time.perf_counter() - self.start
+        click.echo(f"{table}: {self.rows[table]} rows ({sum(self.rows.values()) / elapsed:,.0f} rows/s overall)")
+
+
+@click.command("generate-data")
+@click.option("--users", default=10000, show_default=True)
+@click.option("--products", default=5000, show_default=True)
+@click.option("--orders", default=1000000, show_default=True)
+@click.option("--seed", default=42, show_default=True, help="Same seed, same data.")
+@click.option("--skew", default=1.1, show_default=True, help="Zipf exponent of product and buyer popularity.")
+@click.option("--days", default=365, show_default=True, help="Orders are spread over this many days.")
+@click.option("--batch-size", default=10000, show_default=True)
+@with_appcontext
+def generate_data_command(users, products, orders, seed, skew, days, batch_size):
+    """Bulk load deterministic synthetic users, products and orders."""
+    reporter = _RateReporter()
+    counts = generate(users, products, orders, seed=seed, skew=skew, days=days, batch_size=batch_size,
+                      report=reporter)
+    elapsed = time.perf_counter() - reporter.start
+    total = sum(counts.values())
+    click.echo(f"Loaded {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s): {counts}")
+
+
+@click.command("rebuild-leaderboard")
+@click.option("--days", default=leaderboard.MAX_WINDOW_DAYS, show_default=True,
+              type=click.IntRange(1, leaderboard.MAX_WINDOW_DAYS), help="Daily buckets to recompute.")
+@with_appcontext
+def rebuild_leaderboard_command(days):
+    """Recompute the best-seller counters in Redis from the order items."""
+    buckets = leaderboard.rebuild(days)
+    click.echo(f"Rebuilt the best-seller leaderboard: {buckets} days with sales in the last {days} days")
+
+
+@click.command("build-related-products")
+@click.option("--top-k", default=20, show_default=True, help="Neighbours kept per product.")
+@click.option("--chunk-orders", default=50000, show_default=True, help="Orders read per query.")
+@click.option("--full", is_flag=True, help="Recount every order instead of the ones since the previous run.")
+@click.option("--settle-minutes", default=related_products.SETTLE_MINUTES, show_default=True,
+              help="Orders younger than this are left for the next run.")
+@with_appcontext
+def build_related_products_command(top_k, chunk_orders, full, settle_minutes):
+    """Count the products bought together and publish the top neighbours of each one."""
+    start = time.perf_counter()
+    items = 0
+
+    def report(rows):
+        nonlocal items
+        items += rows
+        click.echo(f"order_items: {items} rows ({items / (time.perf_counter() - start):,.0f} rows/s)")
+
+    summary = related_products.build(current_app.extensions["related_products"],
+                                     current_app.config["RELATED_PRODUCTS_DIR"], k=top_k, chunk_orders=chunk_orders,
+                                     full=full, settle_minutes=settle_minutes, report=report)
+    click.echo(f"Published related products in {time.perf_counter() - start:.1f}s: {summary}")
+
+
+@click.command("refresh-sales-rollups")
+@click.option("--from", "start", type=click.DateTime(formats=["%Y-%m-%d"]),
+              help="Rebuild from this day instead of refreshing the days changed since the last run.")
+@click.option("--to", "end", type=click.DateTime(formats=["%Y-%m-%d"]), help="Last day to rebuild (default: today).")
+@click.option("--loop", is_flag=True, help="Keep refreshing the changed days, as a worker.")
+@click.option("--interval", default=60.0, show_default=True, help="Seconds between refreshes with --loop.")
+@with_appcontext
+def refresh_sales_rollups_command(start, end, loop, interval):
+    """Update the daily sales rollups behind GET /analytics/sales."""
+    if start or end:
+        end = end.date() if end else datetime.now(timezone.utc).date()
+        start = start.date() if start else end
+        if start > end:
+            raise click.BadParameter("--from must not be after --to")
+        analytics.refresh(start, end)
+        click.echo(f"Rebuilt the sales rollups from {start} to {end}")
+        return
+
+    while True:
+        try:
+            days = analytics.refresh_dirty()
+            if days or not loop:
+                click.echo(f"Refreshed the sales rollups of {len(days)} days")
+        except RedisError:
+            if not loop:
+                raise
+            logging.error("Could not read the days to refresh", exc_info=True)
+        if not loop:
+            return
+        time.sleep(interval)
+
+
+@click.group("flash-sale")
+def flash_sale_group():
+    """Manage the products whose stock is taken from Redis while a sale is on."""
+
+
+@flash_sale_group.command("start")
+@click.argument("product_ids", nargs=-1, type=int, required=True)
+@with_appcontext
+def flash_sale_start_command(product_ids):
+    """Load the stock of the products into Redis and switch them to flash-sale mode."""
+    started = flash_sale.start(list(product_ids))
+    click.echo(f"Flash sale started for products {started}")
+
+
+@flash_sale_group.command("stop")
+@click.argument("product_ids", nargs=-1, type=int, required=True)
+@with_appcontext
+def flash_sale_stop_command(product_ids):
+    """Flush the pending decrements and switch the products back to database stock."""
+    stopped = flash_sale.stop(list(product_ids))
+    click.echo(f"Flash sale stopped for products {stopped}")
+
+
+@flash_sale_group.command("flush")
+@click.option("--loop", is_flag=True, help="Keep flushing, as the write-behind worker.")
+@click.option("--interval", default=1.0, show_default=True, help="Seconds between flushes with --loop.")
+@with_appcontext
+def flash_sale_flush_command(loop, interval):
+    """Write the stock taken in Redis to the products table."""
+    while True:
+        try:
+            written = flash_sale.flush()
+            if written is None:
+                click.echo("Another worker is flushing")
+            elif written or not loop:
+                click.echo(f"Flushed {sum(written.values())} units of {len(written)} products")
+        except RedisError:
+            if not loop:
+                raise
+            logging.error("Could not flush the flash-sale stock", exc_info=True)
+        if not loop:
+            return
+        time.sleep(interval)
+
+
+@flash_sale_group.command("reconcile")
+@with_appcontext
+def flash_sale_reconcile_command():
+    """Reset the Redis counters from the products table and report the ones that drifted."""
+    drift = flash_sale.reconcile()
+    for product_id, (before, after) in drift.items():
+        click.echo(f"product {product_id}: counter {before} -> {after}")
+    click.echo(f"{len(drift)} counters corrected")
+
+
+@click.command("release-expired-reservations")
+@click.option("--batch-size", default=1000, show_default=True, help="Reservations deleted per transaction.")
+@click.option("--loop", is_flag=True, help="Keep sweeping, as a worker.")
+@click.option("--interval", default=30.0, show_default=True, help="Seconds between sweeps with --loop.")
+@with_appcontext
+def release_expired_reservations_command(batch_size, loop, interval):
+    """Delete the expired stock reservations of pending orders, in batches."""
+    while True:
+        released = 0
+        while True:
+            count, product_ids = reservations.release_expired(batch_size)
+            if not count:
+                break
+            released += count
+            invalidate_tags("products:list", *(f"product:{product_id}" for product_id in product_ids))
+            invalidate_product_snapshots(*product_ids)
+        if released or not loop:
+            click.echo(f"Released {released} expired reservations")
+        if not loop:
+            return
+        time.sleep(interval)
+
+
+@click.group("orders-partitions")
+def orders_partitions_group():
+    """Monthly partitions of the orders and order_items tables (PostgreSQL)."""
+
+
+@orders_partitions_group.command("enable")
+@click.option("--months-ahead", default=3, show_default=True, help="Future months to create partitions for.")
+@with_appcontext
+def orders_partitions_enable_command(months_ahead):
+    """Convert orders and order_items to monthly partitioned tables (locks both while copying)."""
+    with db.engine.begin() as connection:
+        if connection.dialect.name != "postgresql":
+            raise click.ClickException("Partitioning needs PostgreSQL")
+        if partitions.is_partitioned(connection):
+            raise click.ClickException("The orders table is already partitioned")
+        created = partitions.enable(connection, months_ahead)
+    click.echo(f"Partitioned orders and order_items into {len(created)} monthly partitions")
+
+
+@orders_partitions_group.command("create")
+@click.option("--months-ahead", default=3, show_default=True, help="Future months to create partitions for.")
+@click.option("--loop", is_flag=True, help="Keep creating the coming months, as a worker.")
+@click.option("--interval", default=86400.0, show_default=True, help="Seconds between runs with --loop.")
+@with_appcontext
+def orders_partitions_create_command(months_ahead, loop, interval):
+    """Create the partitions of the coming months ahead of time."""
+    while True:
+        with db.engine.begin() as connection:
+            partitioned = partitions.is_partitioned(connection)
+            created = partitions.create_partitions(connection, months_ahead) if partitioned else []
+        if partitioned:
+            click.echo(f"Created the partitions of {[f'{month:%Y-%m}' for month in created]}")
+        elif not loop:
+            click.echo("The orders table is not partitioned, nothing to do")
+            return
+        if not loop:
+            return
+        # A worker keeps checking: the tables may be partitioned later with "enable"
+        time.sleep(interval)
+
+
+@orders_partitions_group.command("detach")
+@click.option("--keep-months", type=click.IntRange(1), required=True,
+              help="Months kept attached, the current one included.")
+@click.option("--archive-schema", help="Move the detached partitions to this schema.")
+@click.option("--drop", is_flag=True, help="Drop the detached partitions instead of keeping them.")
+@with_appcontext
+def orders_partitions_detach_command(keep_months, archive_schema, drop):
+    """Detach the partitions of old months: their orders are no longer served by the API."""
+    if archive_schema and drop:
+        raise click.BadParameter("--archive-schema and --drop are exclusive")
+    with db.engine.begin() as connection:
+        if not partitions.is_partitioned(connection):
+            raise click.ClickException("The orders table is not partitioned")
+        months = partitions.detach_partitions(connection, keep_months, archive_schema, drop)
+    click.echo(f"Detached the partitions of {[f'{month:%Y-%m}' for month in months]}")
+
+
+def register_commands(app):
+    app.cli.add_command(generate_data_command)
+    app.cli.add_command(rebuild_leaderboard_command)
+    app.cli.add_command(build_related_products_command)
+    app.cli.add_command(flash_sale_group)
+    app.cli.add_command(release_expired_reservations_command)
+    app.cli.add_command(refresh_sales_rollups_command)
+    app.cli.add_command(orders_partitions_group)
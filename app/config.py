@@ -45,4 +45,11 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f"postgresql://{USER}:{PASSWORD}@{HOST}/{DATABASE}"
     SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS")
     SECRET_KEY = os.getenv("SECRET_KEY")
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER")  # "orjson" or "stdlib", defaults to the fastest available
+    JSON_DATETIME_FORMAT = os.getenv("JSON_DATETIME_FORMAT", "rfc822")  # "rfc822" (Flask's) or "iso8601"
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis")  # "redis", "local" or "" to disable
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    RELATED_PRODUCTS_STORE = os.getenv("RELATED_PRODUCTS_STORE", "redis")  # "redis" or "file"
+    RELATED_PRODUCTS_DIR = os.getenv("RELATED_PRODUCTS_DIR", "data")
+    STOCK_RESERVATION_MINUTES = float(os.getenv("STOCK_RESERVATION_MINUTES", 30))
 
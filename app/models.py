@@ -1,6 +1,7 @@
 from app.database import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
-from sqlalchemy import Integer, String, ForeignKey, DateTime, func, Float
+from sqlalchemy import (Integer, BigInteger, String, Boolean, ForeignKey, ForeignKeyConstraint, UniqueConstraint, Date,
+                        DateTime, func, Float, Index, DDL, event, false)
 from typing import List
 from enum import Enum
 
@@ -20,6 +21,10 @@ class User(db.Model):
     password: Mapped[str] = mapped_column(String(255), nullable=False)
     role: Mapped[RoleEnum]
     created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+    # Optimistic locking: every UPDATE checks and increments it (see app.utils.versioning)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Validates
     @validates('role')
@@ -37,44 +42,165 @@ class Product(db.Model):
     __tablename__ = 'products'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    seller_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
+    seller_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(String)
     price: Mapped[int] = mapped_column(Integer, nullable=False)
     stock: Mapped[int] = mapped_column(Integer, nullable=False)
+    # In flash-sale mode orders take the stock from a Redis counter (see app.services.flash_sale)
+    flash_sale: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false())
     created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+    # Position in the product change feed, assigned on every insert and update (see app.services.change_feed)
+    change_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    # Optimistic locking, like User.version; bulk updates of products must increment it too
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     seller: Mapped["User"] = relationship("User", back_populates="products")
     order_products: Mapped[List["OrderItem"]] = relationship("OrderItem", back_populates="product")
 
 
+class ProductTombstone(db.Model):
+    """
+    A deleted product, kept so the change feed can report the deletion.
+    """
+    __tablename__ = 'product_tombstones'
+
+    change_seq: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    deleted_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+
+
+class ChangeSequence(db.Model):
+    """
+    Counters of the change feeds. The row is updated to reserve sequence numbers, so
+    writers are serialized on it until they commit and numbers become visible in order.
+    """
+    __tablename__ = 'change_sequences'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+event.listen(ChangeSequence.__table__, 'after_create',
+             DDL("INSERT INTO change_sequences (name, value) VALUES ('products', 0)"))
+
+
+class FlashSaleFlush(db.Model):
+    """
+    Id of the last batch of flash-sale decrements written to products.stock, committed with
+    the batch itself so a flush retried after a crash is never applied twice.
+    """
+    __tablename__ = 'flash_sale_flushes'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    batch_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    applied_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        # Orders of a buyer, newest or by date range; the summary view is answered from the index alone
+        Index('ix_orders_buyer_id_created_at', 'buyer_id', 'created_at',
+              postgresql_include=['status', 'total', 'item_count']),
+        # Target of the order_items foreign key; with monthly partitions (app.services.partitions)
+        # it becomes the primary key, which must include the partition key
+        UniqueConstraint('id', 'created_at', name='uq_orders_id_created_at'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     buyer_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
     total: Mapped[float] = mapped_column(Float, nullable=False)
+    # Units in the order, written with the total when the order is placed so list views do not
+    # have to read order_items
+    item_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     status: Mapped[str] = mapped_column(String(20), nullable=False)
-    created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, default=func.now())
+    # Optimistic locking, like User.version
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    # created_at is read back on insert, so the order items can carry it
+    __mapper_args__ = {"eager_defaults": True, "version_id_col": version}
 
     # Relationships
     buyer: Mapped["User"] = relationship("User", back_populates="orders")
     order_products: Mapped[List["OrderItem"]] = relationship("OrderItem", back_populates="order",
                                                              cascade="all, delete-orphan")
+    reservations: Mapped[List["StockReservation"]] = relationship(
+        "StockReservation", primaryjoin="Order.id == foreign(StockReservation.order_id)", cascade="all, delete-orphan")
+
+
+class StockReservation(db.Model):
+    """
+    Units of a product held for a pending order until expires_at. Expired holds no longer
+    count and are deleted in batches by "flask release-expired-reservations".
+    """
+    __tablename__ = 'stock_reservations'
+    __table_args__ = (
+        # Active holds of some products, answered from the index alone in PostgreSQL
+        Index('ix_stock_reservations_product_id_expires_at', 'product_id', 'expires_at',
+              postgresql_include=['quantity']),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # No foreign key: a partitioned orders table can only be referenced with its created_at.
+    # Holds are deleted with their order by the ORM (and expire anyway)
+    order_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id'), nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    expires_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, index=True)
 
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        ForeignKeyConstraint(['order_id', 'order_created_at'], ['orders.id', 'orders.created_at'],
+                             name='fk_order_items_order', ondelete="CASCADE"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey('orders.id', ondelete="CASCADE"), nullable=False)
-    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id'), nullable=False)
+    order_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    # created_at of the order (copied by the relationship): the partition key of order_items,
+    # so the items of an order live in the same month as the order
+    order_created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id'), nullable=False, index=True)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     price: Mapped[float] = mapped_column(Float, nullable=False)
+    # The stock was already taken when the order was placed (flash sale), not when it ships
+    stock_taken: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false())
 
     # Relationships
     order: Mapped["Order"] = relationship("Order", back_populates="order_products")
     product: Mapped["Product"] = relationship("Product", back_populates="order_products")
 
 
+class SalesDaily(db.Model):
+    """
+    Sales of each day (orders not cancelled, by the day they were placed), rolled up from the
+    orders by app.services.analytics.
+    """
+    __tablename__ = 'sales_daily'
+
+    day: Mapped[Date] = mapped_column(Date, primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer, nullable=False)
+    units: Mapped[int] = mapped_column(Integer, nullable=False)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class SalesDailyProduct(db.Model):
+    """
+    Sales of each product per day, with its seller, for the product and seller reports.
+    """
+    __tablename__ = 'sales_daily_products'
+
+    day: Mapped[Date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seller_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    orders: Mapped[int] = mapped_column(Integer, nullable=False)
+    units: Mapped[int] = mapped_column(Integer, nullable=False)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False)
@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify
+from app.services.analytics import GROUPINGS, MAX_RANGE_DAYS, sales
+from app.services.auth import token_required
+from app.utils.cache import cached
+from app.utils.exceptions import BadRequestsError
+
+# Create a Blueprint for the sales reports
+analytics_bp = Blueprint('analytics', __name__)
+
+
+def _date_arg(name: str, default: date) -> date:
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequestsError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+# Get the sales report (GET)
+@analytics_bp.route('/analytics/sales', methods=['GET'])
+@token_required
+@cached(ttl=300, tags=["analytics:sales"], query_params=("group_by", "from", "to", "limit"))
+def get_sales():
+    """
+    Sales report
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Analytics
+    summary: Revenue and units sold by day, product or seller
+    description: |
+      Served from daily rollup tables (orders not cancelled, by the day they were placed), never
+      from the orders themselves. The rollups are refreshed by `flask refresh-sales-rollups`, so
+      the last orders can take until its next run to appear.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - in: query
+        name: group_by
+        type: string
+        enum: [day, product, seller]
+        required: false
+        default: day
+      - in: query
+        name: from
+        type: string
+        format: date
+        required: false
+        description: First day of the report, 29 days before `to` by default
+      - in: query
+        name: to
+        type: string
+        format: date
+        required: false
+        description: Last day of the report (included), today (UTC) by default
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        default: 100
+        description: Products or sellers returned, the ones with the most revenue (up to 1000)
+    responses:
+      200:
+        description: The report
+        schema:
+          type: object
+          properties:
+            group_by:
+              type: string
+              example: day
+            from:
+              type: string
+              example: "2025-04-01"
+            to:
+              type: string
+              example: "2025-04-30"
+            results:
+              type: array
+              items:
+                type: object
+                properties:
+                  day:
+                    type: string
+                    example: "2025-04-01"
+                  product_id:
+                    type: integer
+                    example: 7
+                  seller_id:
+                    type: integer
+                    example: 3
+                  orders:
+                    type: integer
+                    example: 42
+                  units:
+                    type: integer
+                    example: 57
+                  revenue:
+                    type: number
+                    example: 2850.5
+      400:
+        description: Invalid group_by, dates or limit
+      401:
+        description: Unauthorized, invalid or missing token
+    """
+    group_by = request.args.get('group_by', 'day')
+    if group_by not in GROUPINGS:
+        raise BadRequestsError(f"group_by must be one of: {', '.join(GROUPINGS)}")
+
+    end = _date_arg('to', datetime.now(timezone.utc).date())
+    start = _date_arg('from', end - timedelta(days=29))
+    if start > end:
+        raise BadRequestsError("from must not be after to")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise BadRequestsError(f"The report can cover up to {MAX_RANGE_DAYS} days")
+
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        raise BadRequestsError("limit must be an integer")
+    if not 1 <= limit <= 1000:
+        raise BadRequestsError("limit must be between 1 and 1000")
+
+    return jsonify({
+        "group_by": group_by,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "results": sales(group_by, start, end, limit)
+    }), 200
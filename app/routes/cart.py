@@ -0,0 +1,241 @@
+from flask import Blueprint, request, jsonify, g
+from app.serializers import ORDER, order_items
+from app.services.auth import token_required
+from app.services.cart import get_cart, add_item, remove_item, checkout
+from app.utils.exceptions import BadRequestsError
+
+# Create a Blueprint for the shopping cart
+cart_bp = Blueprint('cart', __name__)
+
+
+def _current_user_id() -> int:
+    return int(g.jwt_payload['sub'])
+
+
+def _cart_response(user_id: int) -> dict:
+    lines = get_cart(user_id)
+    items = [
+        {
+            "product_id": product_id,
+            "name": snapshot["name"],
+            "price": snapshot["price"],
+            "quantity": quantity,
+            "subtotal": snapshot["price"] * quantity,
+            "in_stock": snapshot["stock"] >= quantity
+        }
+        for product_id, (quantity, snapshot) in lines.items()
+    ]
+    return {"items": items, "total": sum(item["subtotal"] for item in items)}
+
+
+# Get the cart of the authenticated user (GET)
+@cart_bp.route('/cart', methods=['GET'])
+@token_required
+def view_cart():
+    """
+    Get the shopping cart
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Cart
+    summary: Products in the cart of the authenticated user
+    description: |
+      Carts are kept in Redis and expire after a week without changes. Prices and stock are
+      the current ones (cached for up to a minute); `in_stock` is false when the product no
+      longer has the quantity in the cart.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+    responses:
+      200:
+        description: The cart
+        schema:
+          type: object
+          properties:
+            items:
+              type: array
+              items:
+                type: object
+                properties:
+                  product_id:
+                    type: integer
+                    example: 7
+                  name:
+                    type: string
+                    example: Xiaomi 13T Plus
+                  price:
+                    type: number
+                    example: 499
+                  quantity:
+                    type: integer
+                    example: 2
+                  subtotal:
+                    type: number
+                    example: 998
+                  in_stock:
+                    type: boolean
+                    example: true
+            total:
+              type: number
+              example: 998
+      401:
+        description: Unauthorized, invalid or missing token
+      503:
+        description: The cart is temporarily unavailable
+    """
+    return jsonify(_cart_response(_current_user_id())), 200
+
+
+# Add a product to the cart (POST)
+@cart_bp.route('/cart/items', methods=['POST'])
+@token_required
+def add_cart_item():
+    """
+    Add a product to the cart
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Cart
+    summary: Add units of a product to the cart of the authenticated user
+    description: |
+      Adds `quantity` units to the ones already in the cart. The request is rejected when the
+      product does not have enough stock for the resulting quantity.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - in: body
+        name: item
+        required: true
+        schema:
+          type: object
+          required:
+            - product_id
+            - quantity
+          properties:
+            product_id:
+              type: integer
+              example: 7
+            quantity:
+              type: integer
+              example: 1
+    responses:
+      200:
+        description: The updated cart
+      400:
+        description: Invalid data or not enough stock
+      401:
+        description: Unauthorized, invalid or missing token
+      404:
+        description: Product not found
+      503:
+        description: The cart is temporarily unavailable
+    """
+    data = request.get_json(silent=True)
+    if not data or 'product_id' not in data:
+        raise BadRequestsError("Missing required field: product_id")
+    try:
+        product_id = int(data['product_id'])
+        quantity = int(data.get('quantity', 1))
+    except (ValueError, TypeError):
+        raise BadRequestsError("product_id and quantity must be integers")
+    if quantity <= 0:
+        raise BadRequestsError("quantity must be greater than 0")
+
+    user_id = _current_user_id()
+    add_item(user_id, product_id, quantity)
+    return jsonify(_cart_response(user_id)), 200
+
+
+# Remove a product from the cart (DELETE)
+@cart_bp.route('/cart/items/<int:product_id>', methods=['DELETE'])
+@token_required
+def remove_cart_item(product_id: int):
+    """
+    Remove a product from the cart
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Cart
+    summary: Remove every unit of a product from the cart of the authenticated user
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - in: path
+        name: product_id
+        required: true
+        type: integer
+    responses:
+      200:
+        description: The updated cart
+      401:
+        description: Unauthorized, invalid or missing token
+      404:
+        description: The product is not in the cart
+      503:
+        description: The cart is temporarily unavailable
+    """
+    user_id = _current_user_id()
+    remove_item(user_id, product_id)
+    return jsonify(_cart_response(user_id)), 200
+
+
+# Turn the cart into an order (POST)
+@cart_bp.route('/cart/checkout', methods=['POST'])
+@token_required
+def checkout_cart():
+    """
+    Checkout the cart
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Cart
+    summary: Create an order with the products in the cart
+    description: |
+      Creates a pending order for the authenticated user with the products in the cart, at the
+      current prices and in a single transaction, then empties the cart. The stock of every
+      product is checked in the database.
+    parameters:
+      - in: header
+        name: Authorization
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+    responses:
+      201:
+        description: Order created
+        schema:
+          type: object
+          properties:
+            message:
+              type: string
+              example: Order created
+            order_id:
+              type: integer
+              example: 123
+            total:
+              type: number
+              example: 998
+      400:
+        description: Empty cart, not enough stock or a checkout already in progress
+      401:
+        description: Unauthorized, invalid or missing token
+      404:
+        description: A product in the cart no longer exists
+      503:
+        description: The cart is temporarily unavailable
+    """
+    order = checkout(_current_user_id())
+    return jsonify({"message": "Order created", **ORDER.dump(order, order_products=order_items)}), 201
@@ -0,0 +1,27 @@
+from flask import Blueprint, Response
+from app.utils.metrics import generate_metrics
+
+# Create a Blueprint for metrics
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics
+    ---
+    tags:
+      - Monitoring
+    summary: Expose the application metrics
+    description: Per-endpoint request count and latency, in-flight requests, DB usage per request, connection pool, Redis latency and rate-limit rejections in the Prometheus text format.
+    responses:
+      200:
+        description: Metrics in the Prometheus text exposition format
+        content:
+          text/plain:
+            schema:
+              type: string
+              example: "http_requests_total{endpoint=\\"products.get_all_products\\",method=\\"GET\\",status=\\"200\\"} 42.0"
+    """
+    data, content_type = generate_metrics()
+    return Response(data, content_type=content_type)
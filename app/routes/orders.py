@@ -1,12 +1,86 @@
-from flask import Blueprint, request, jsonify
-from app.models import Order, Product, OrderItem
+import logging
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from flask import Blueprint, Response, current_app, g, request, jsonify, stream_with_context
+from redis.exceptions import RedisError
+from app.models import Order, Product
 from app.database import db
-from app.services.auth import token_required
-from app.utils.exceptions import ResourceNotFound, BadRequestsError
+from app.serializers import ORDER, order_items
+from app.services.analytics import mark_dirty
+from app.services.auth import token_required, decode_jwt_token, get_bearer_token
+from app.services.order_events import (order_event_stream, publish_order_status, subscribe, is_valid_event_id,
+                                       issue_ticket, redeem_ticket, TICKET_TTL)
+from app.services.cart import invalidate_product_snapshots
+from app.services.flash_sale import take_stock, release_stock
+from app.services.leaderboard import record_sales
+from app.services.reservations import held_quantities, release, reserve
+from app.services.orders import MAX_BULK_ORDERS, place_order, ship_orders
+from app.services.partitions import load_order_items
+from app.services.rate_limit import charge_rows
+from app.utils.cache import cached, invalidate_tags
+from app.utils.exceptions import ResourceNotFound, BadRequestsError, TokenMissing, TokenInvalid, ServiceUnavailable
+from app.utils.versioning import check_if_match, version_headers
 
 # Create a Blueprint for orders
 orders_bp = Blueprint('orders', __name__)
 
+# Fields of ?view=summary: only the orders table is read, without the items
+SUMMARY_FIELDS = ("order_id", "buyer_id", "total", "status", "created_at", "item_count")
+
+
+def _give_back_flash_stock(items: list):
+    """
+    release_stock() once the order change is committed: a Redis outage must not fail the
+    request, the counters are corrected by "flask flash-sale reconcile".
+    """
+    try:
+        release_stock(items)
+    except RedisError:
+        logging.error("Could not give back the flash-sale stock %s", items, exc_info=True)
+
+
+def _created_between(query):
+    """
+    Apply the optional "from" and "to" days (YYYY-MM-DD, inclusive) of the request to an
+    orders query; a bound on created_at lets PostgreSQL skip the other monthly partitions.
+    """
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if value is None:
+            continue
+        try:
+            day = datetime.combine(date.fromisoformat(value), time.min)
+        except ValueError:
+            raise BadRequestsError(f"{name} must be a date (YYYY-MM-DD)")
+        if name == 'from':
+            query = query.filter(Order.created_at >= day)
+        else:
+            query = query.filter(Order.created_at < day + timedelta(days=1))
+    return query
+
+
+def _requested_fields() -> tuple:
+    """
+    Fields of the order lists: ?fields= when given, else the ones of ?view= (full or summary).
+    """
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        raise BadRequestsError("view must be 'full' or 'summary'")
+    return ORDER.requested_fields(SUMMARY_FIELDS if view == 'summary' else None)
+
+
+def _dump_orders(query, fields: tuple) -> list:
+    """
+    Serialize the orders of "query" reading only the columns of "fields"; the items are
+    loaded (in one query) only when order_products is requested.
+    """
+    if 'order_products' not in fields:
+        return ORDER.dump_many(query.with_entities(*ORDER.columns(fields)), fields)
+
+    orders = query.options(ORDER.load_only(fields)).all()
+    load_order_items(orders)
+    return ORDER.dump_many(orders, fields, order_products=order_items)
+
 
 # Create a new order
 @orders_bp.route('/orders', methods=['POST'])
@@ -24,6 +98,10 @@ def create_order():
               This endpoint allows an authenticated user to create a new order by providing a `buyer_id` and a list of products.
               Each product in the list must include a `product_id` and a `quantity`. The total price will be automatically calculated.
 
+              The stock of the products is reserved for the order until it ships or is cancelled, for
+              `STOCK_RESERVATION_MINUTES` (30 by default); the order is rejected when a product does not
+              have enough available stock (stock minus the units reserved by other pending orders).
+
               Requires a valid JWT token in the `Authorization` header.
 
             parameters:
@@ -104,7 +182,7 @@ def create_order():
                             example: 9.99
 
               400:
-                description: Invalid input or missing data
+                description: Invalid input, missing data or not enough available stock
                 schema:
                   type: object
                   properties:
@@ -187,74 +265,14 @@ def create_order():
     if not all(field in data for field in required_fields):
         raise BadRequestsError("Missing required fields: buyer_id or products")
 
-    try:
-        # Create new order
-        new_order = Order(
-            buyer_id=data['buyer_id'],
-            total=0.01,
-            status="pending"
-        )
-
-        db.session.add(new_order)
-        db.session.flush()  # assign an id before to make a commit
-
-        total_price = 0
-        order_products = []
-        order_re_products = [p for p in data['products']]
-        products_db = {p.id: p for p in Product.query.filter(Product.id.in_(product.get('product_id') for product in
-                                                                            order_re_products)).all()}
-
-        for product in order_re_products:
-
-            if not product.get('product_id') or not product.get('quantity'):
-                raise BadRequestsError("Each product must have 'product_id' and 'quantity'")
-            try:
-                product["product_id"] = int(product["product_id"])
-                product["quantity"] = int(product["quantity"])
-            except (ValueError, TypeError):
-                raise BadRequestsError("product_id must be an integer and quantity must be an integer")
-
-            if product["product_id"] < 0 or product["quantity"] <= 0:
-                raise BadRequestsError("Product_id must be non-negative and quantity must be greater than 0")
-
-            product_db = products_db.get(product["product_id"])
-            if not product_db:
-                raise ResourceNotFound(f"Product with id {product["product_id"]} not found")
-            total_price += product_db.price * product["quantity"]
-            order_item = OrderItem(
-                order=new_order,
-                product_id=product["product_id"],
-                quantity=product["quantity"],
-                price=product_db.price
-            )
-            order_products.append(order_item)
-        db.session.add_all(order_products)
-
-        new_order.total = total_price
-        db.session.commit()
+    new_order = place_order(data['buyer_id'], data['products'])
 
-        return jsonify({
-            "message": "Order created",
-            "order_id": new_order.id,
-            "buyer_id": new_order.buyer_id,
-            "total": round(float(new_order.total), 2),
-            "status": new_order.status,
-            "created_at": new_order.created_at,
-            "order_products": [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price": round(float(item.price), 3),
-                } for item in new_order.order_products
-            ]
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        raise
+    return jsonify({"message": "Order created", **ORDER.dump(new_order, order_products=order_items)}), 201
 
 
 @orders_bp.route('/orders/<int:order_id>', methods=['GET'])
 @token_required
+@cached(ttl=60, tags=["order:{order_id}"], query_params=("fields",))
 def get_order(order_id: int) -> tuple:
     """
     Get details of a specific order by ID.
@@ -291,6 +309,12 @@ def get_order(order_id: int) -> tuple:
         schema:
           type: integer
           example: 1
+      - in: query
+        name: fields
+        required: false
+        description: Comma-separated fields to return, e.g. order_id,status,total (only those columns are read)
+        schema:
+          type: string
 
     responses:
       200:
@@ -397,26 +421,13 @@ def get_order(order_id: int) -> tuple:
               example: "An unexpected error occurred"
     """
 
-    #order = Order.query.get(order_id)
-    order = db.session.get(Order, order_id)
+    fields = ORDER.requested_fields()
+    order = db.session.get(Order, order_id, options=[ORDER.load_only(fields, "version")])
 
     if not order:
         raise ResourceNotFound("Order not found")
 
-    return jsonify({
-        "order_id": order.id,
-        "buyer_id": order.buyer_id,
-        "total": round(float(order.total), 2),
-        "status": order.status,
-        "created_at": order.created_at,
-        "order_products": [
-            {
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "price": round(float(item.price), 3),
-            } for item in order.order_products
-        ]
-    }), 200
+    return jsonify(ORDER.dump(order, fields, order_products=order_items)), 200, version_headers(order)
 
 
 @orders_bp.route('/orders', methods=['GET'])
@@ -439,6 +450,29 @@ def get_all_orders() -> tuple:
         required: true
         type: string
         description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - in: query
+        name: from
+        type: string
+        format: date
+        required: false
+        description: Only orders placed on or after this day (YYYY-MM-DD)
+      - in: query
+        name: to
+        type: string
+        format: date
+        required: false
+        description: Only orders placed on or before this day (YYYY-MM-DD)
+      - in: query
+        name: view
+        type: string
+        enum: [full, summary]
+        required: false
+        description: "summary: item_count instead of the order_products of each order, read from the orders table only"
+      - in: query
+        name: fields
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. order_id,status,total (only those columns are read)
 
     security:
       - BearerAuth: []
@@ -549,34 +583,17 @@ def get_all_orders() -> tuple:
               type: string
               example: "An unexpected error occurred"
     """
-    orders = Order.query.all()
-
+    orders = _dump_orders(_created_between(Order.query), _requested_fields())
     if not orders:
         raise ResourceNotFound("No orders found")
+    charge_rows(len(orders))
 
-    orders_list = [
-        {
-            "order_id": order.id,
-            "buyer_id": order.buyer_id,
-            "total": round(float(order.total), 2),
-            "status": order.status,
-            "created_at": order.created_at,
-            "order_products": [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price": round(float(item.price), 3),
-                } for item in order.order_products
-            ]
-        }
-        for order in orders
-    ]
-
-    return jsonify(orders_list), 200
+    return jsonify(orders), 200
 
 
 @orders_bp.route('/orders/buyer/<int:buyer_id>', methods=['GET'])
 @token_required
+@cached(ttl=60, tags=["orders:buyer:{buyer_id}"], query_params=("fields", "view", "from", "to"))
 def get_orders_buyer(buyer_id: int) -> tuple:
     """
     Get all orders for a specific buyer by buyer ID.
@@ -604,6 +621,29 @@ def get_orders_buyer(buyer_id: int) -> tuple:
           type: string
           example: "Bearer your_jwt_token_here"
         description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - in: query
+        name: from
+        type: string
+        format: date
+        required: false
+        description: Only orders placed on or after this day (YYYY-MM-DD)
+      - in: query
+        name: to
+        type: string
+        format: date
+        required: false
+        description: Only orders placed on or before this day (YYYY-MM-DD)
+      - in: query
+        name: view
+        type: string
+        enum: [full, summary]
+        required: false
+        description: "summary: item_count instead of the order_products of each order, read from the orders table only"
+      - in: query
+        name: fields
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. order_id,status,total (only those columns are read)
 
     responses:
       200:
@@ -689,30 +729,244 @@ def get_orders_buyer(buyer_id: int) -> tuple:
               type: string
               example: "An unexpected error occurred"
     """
-    orders = Order.query.filter_by(buyer_id=buyer_id).all()
-
+    orders = _dump_orders(_created_between(Order.query.filter_by(buyer_id=buyer_id)), _requested_fields())
     if not orders:
         raise ResourceNotFound("No orders found for this buyer")
+    charge_rows(len(orders))
+
+    return jsonify(orders), 200
+
+
+@orders_bp.route('/orders/stream/ticket', methods=['POST'])
+@token_required
+def create_stream_ticket():
+    """
+    Get a ticket to open the order event stream.
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Orders
+    summary: Exchange the token for a single-use stream ticket
+    description: |
+      EventSource clients cannot set the `Authorization` header. They send this ticket in the `ticket`
+      query parameter of `GET /orders/stream` instead of the token, so the JWT never appears in URLs
+      (and access logs). The ticket is valid for 30 seconds and for one connection.
+    parameters:
+      - name: Authorization
+        in: header
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+    responses:
+      201:
+        description: Ticket created
+        schema:
+          type: object
+          properties:
+            ticket:
+              type: string
+            expires_in:
+              type: integer
+              example: 30
+      401:
+        description: Unauthorized, invalid or missing token
+      503:
+        description: The event stream is temporarily unavailable
+    """
+    try:
+        ticket = issue_ticket(current_app.extensions["redis"], int(g.jwt_payload['sub']))
+    except RedisError:
+        raise ServiceUnavailable("The order event stream is temporarily unavailable")
+    return jsonify({"ticket": ticket, "expires_in": TICKET_TTL}), 201
 
-    orders_list = [
-        {
-            "order_id": order.id,
-            "buyer_id": order.buyer_id,
-            "total": round(float(order.total), 2),
-            "status": order.status,
-            "created_at": order.created_at,
-            "order_products": [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price": round(float(item.price), 2),
-                } for item in order.order_products
-            ]
-        }
-        for order in orders
-    ]
-
-    return jsonify(orders_list), 200
+
+@orders_bp.route('/orders/stream', methods=['GET'])
+def stream_order_events():
+    """
+    Stream the status changes of the buyer's orders (Server-Sent Events).
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Orders
+    summary: Receive order status changes as they happen
+    description: |
+      Keeps the connection open and sends an `order_status` event every time one of the authenticated
+      buyer's orders changes status, so clients do not need to poll `GET /orders/<id>`.
+
+      Reconnecting with the `Last-Event-ID` header (browsers' EventSource does it automatically) replays
+      the events missed in between. A `: keep-alive` comment is sent every 15 seconds while idle.
+
+      The token is sent in the `Authorization` header or, for EventSource clients that cannot set
+      headers, exchanged for a ticket (`POST /orders/stream/ticket`) sent in the `ticket` query parameter.
+
+    produces:
+      - text/event-stream
+    parameters:
+      - name: Authorization
+        in: header
+        required: false
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - name: ticket
+        in: query
+        required: false
+        type: string
+        description: Single-use stream ticket, when the token cannot be sent in the Authorization header
+      - name: Last-Event-ID
+        in: header
+        required: false
+        type: string
+        description: Id of the last event received, to resume the stream after it
+        example: "1743778522000-0"
+
+    responses:
+      200:
+        description: Event stream
+        schema:
+          type: string
+          example: |
+            id: 1743778522000-0
+            event: order_status
+            data: {"order_id": 123, "status": "shipped", "previous_status": "pending"}
+      400:
+        description: Invalid Last-Event-ID
+      401:
+        description: Unauthorized, invalid or missing token
+      503:
+        description: The event stream is temporarily unavailable
+    """
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id is not None and not is_valid_event_id(last_event_id):
+        raise BadRequestsError("Invalid Last-Event-ID")
+
+    token = get_bearer_token()
+    ticket = request.args.get('ticket')
+    if not token and not ticket:
+        raise TokenMissing()
+
+    redis_connection = current_app.extensions["redis"]
+    try:
+        if token:
+            buyer_id = int(decode_jwt_token(token)['sub'])
+        else:
+            buyer_id = redeem_ticket(redis_connection, ticket)
+            if buyer_id is None:
+                raise TokenInvalid("The stream ticket is invalid, expired or already used")
+        subscription, last_id = subscribe(current_app.extensions["order_events"], buyer_id, last_event_id)
+    except RedisError:
+        raise ServiceUnavailable("The order event stream is temporarily unavailable")
+
+    response = Response(stream_with_context(order_event_stream(redis_connection, subscription, buyer_id, last_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@orders_bp.route('/orders/status', methods=['PATCH'])
+@token_required
+def update_orders_status():
+    """
+    Ship a batch of orders.
+    ---
+    security:
+      - BearerAuth: []
+    tags:
+      - Orders
+    summary: Mark up to 500 pending orders as shipped in one request
+    description: |
+      Bulk version of `PATCH /orders/{order_id}` for fulfilment. The stock of all the orders is
+      taken per product in one statement and the statuses change in another, in a single
+      transaction. Orders are shipped in the given order while the stock not held by other
+      pending orders lasts; the ones that can not be shipped are listed in `failed` with the
+      reason and are left unchanged.
+
+      Only the `shipped` status can be set in bulk.
+    parameters:
+      - name: Authorization
+        in: header
+        required: true
+        type: string
+        description: "Bearer token for authentication. Example: Bearer your_token_here"
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - order_ids
+            - status
+          properties:
+            order_ids:
+              type: array
+              items:
+                type: integer
+              example: [101, 102, 103]
+            status:
+              type: string
+              enum: [shipped]
+              example: shipped
+    responses:
+      200:
+        description: The orders shipped and the ones that were not
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+              example: shipped
+            updated:
+              type: array
+              items:
+                type: integer
+              example: [101, 103]
+            failed:
+              type: array
+              items:
+                type: object
+                properties:
+                  order_id:
+                    type: integer
+                    example: 102
+                  message:
+                    type: string
+                    example: There is not enough stock of Xiaomi 13T Plus to complete the order
+      400:
+        description: Invalid data or unsupported status
+      401:
+        description: Unauthorized, invalid or missing token
+      409:
+        description: The stock changed while shipping, nothing was shipped
+    """
+    data = request.get_json(silent=True)
+    if not data or 'order_ids' not in data or 'status' not in data:
+        raise BadRequestsError("Missing required fields: order_ids and status")
+    if data['status'] != 'shipped':
+        raise BadRequestsError("Only the 'shipped' status can be set in bulk, use PATCH /orders/<order_id>")
+
+    order_ids = data['order_ids']
+    if not isinstance(order_ids, list) or not order_ids:
+        raise BadRequestsError("order_ids must be a non-empty list")
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise BadRequestsError(f"At most {MAX_BULK_ORDERS} orders can be updated at once")
+    try:
+        order_ids = [int(order_id) for order_id in order_ids]
+    except (ValueError, TypeError):
+        raise BadRequestsError("order_ids must be integers")
+
+    shipped, failed, product_ids = ship_orders(order_ids)
+    invalidate_product_snapshots(*product_ids)
+    for order_id, buyer_id in shipped.items():
+        publish_order_status(buyer_id, order_id, 'shipped', 'pending')
+
+    return jsonify({
+        "status": "shipped",
+        "updated": list(shipped),
+        "failed": [{"order_id": order_id, "message": message} for order_id, message in failed.items()]
+    }), 200
 
 
 @orders_bp.route('/orders/<int:order_id>', methods=['PATCH'])
@@ -741,6 +995,10 @@ def update_order(order_id):
         - `shipped`
         - `delivered`
 
+      Send the `ETag` of the order (from `GET /orders/{order_id}`) in `If-Match` to update it only
+      if it has not changed since it was read. An order changed by another request meanwhile is
+      not updated (409).
+
       Requires a valid JWT token in the `Authorization` header (e.g., "Bearer your_token_here").
 
     parameters:
@@ -759,6 +1017,12 @@ def update_order(order_id):
           example: "Bearer your_jwt_token_here"
         description: Bearer token for authentication.
 
+      - name: If-Match
+        in: header
+        required: false
+        type: string
+        description: ETag of the order as last read, e.g. "2"
+
       - in: body
         name: body
         required: true
@@ -837,6 +1101,18 @@ def update_order(order_id):
               type: string
               example: Order not found
 
+      409:
+        description: The order or one of its products was modified by another request
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: Conflict
+            message:
+              type: string
+              example: The resource was modified by another request, read it again and retry
+
       429:
         description: Too many requests
         schema:
@@ -869,41 +1145,103 @@ def update_order(order_id):
 
     if not order:
         raise ResourceNotFound("Order not found")
+    check_if_match(order)
 
     if order.status in ['shipped', 'delivered']:
         raise BadRequestsError("Cannot modify an order that has already been shipped or delivered")
 
     allowed_fields = ['status']
+    previous_status = order.status
 
+    taken_now = []
+    reopened = False
     for key, value in data.items():
         if key in allowed_fields:
             if key == 'status' and value == 'shipped':
-                for product in order.order_products:
-                    product_db = Product.query.get(product.product_id)
-                    if product_db.stock < product.quantity:
+                # Items of flash-sale products took their stock when the order was placed; the
+                # others can use the stock not held by other pending orders. The products are
+                # locked in id order, like reserve() does, so a hold committed meanwhile is seen
+                to_take = [item for item in order.order_products if not item.stock_taken]
+                needed = Counter()
+                for item in to_take:
+                    needed[item.product_id] += item.quantity
+                products = {product.id: product for product in Product.query.filter(Product.id.in_(needed))
+                            .order_by(Product.id).with_for_update()}
+                held = held_quantities(list(needed), exclude_order_ids=[order.id])
+                for product_id, quantity in sorted(needed.items()):
+                    product = products[product_id]
+                    if not product.flash_sale and product.stock - held.get(product_id, 0) < quantity:
                         db.session.rollback()
-                        raise BadRequestsError(f"There is not enough stock of {product_db.name} to complete the order")
-
-                for product in order.order_products:
-                    product_db = Product.query.get(product.product_id)
-                    product_db.stock -= product.quantity
+                        raise BadRequestsError(f"There is not enough stock of {product.name} to complete the order")
+
+                for item in to_take:
+                    product = products[item.product_id]
+                    if product.flash_sale:
+                        taken_now.append(item)
+                    else:
+                        product.stock -= item.quantity
+
+            elif key == 'status' and value == 'pending' and previous_status == 'cancelled':
+                # A reopened order holds its stock again, or takes it from a running flash sale
+                flash_products = {product.id for product in Product.query.with_entities(Product.id).filter(
+                    Product.id.in_({item.product_id for item in order.order_products}), Product.flash_sale.is_(True))}
+                quantities = Counter()
+                for item in order.order_products:
+                    if item.product_id in flash_products:
+                        taken_now.append(item)
+                    else:
+                        quantities[item.product_id] += item.quantity
+                reserve(order, quantities)
+                reopened = True
 
             setattr(order, key, value)
 
+    for item in taken_now:
+        item.stock_taken = True
+
+    # Only pending orders hold stock: shipping took it, cancelling gives it back
+    released_holds = order.status != 'pending' and bool(order.reservations)
+    if released_holds:
+        release(order)
+
+    released = []
+    if order.status == 'cancelled' and previous_status != 'cancelled':
+        released = [item for item in order.order_products if item.stock_taken]
+        for item in released:
+            item.stock_taken = False
+
+    # The flash-sale stock is taken from Redis last and given back if the commit fails
+    taken = False
     try:
+        if taken_now:
+            take_stock([(item.product_id, item.quantity) for item in taken_now])
+            taken = True
         db.session.commit()
-        return jsonify({
-            'message': 'Order updated successfully',
-            "order_id": order.id,
-            "buyer_id": order.buyer_id,
-            "total": float(order.total),
-            "status": order.status,
-            "created_at": order.created_at
-        }), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
+        if taken:
+            release_stock([(item.product_id, item.quantity) for item in taken_now])
         raise
 
+    if released:
+        _give_back_flash_stock([(item.product_id, item.quantity) for item in released])
+    invalidate_tags(f"order:{order.id}", f"orders:buyer:{order.buyer_id}")
+    if order.status != previous_status:
+        publish_order_status(order.buyer_id, order.id, order.status, previous_status)
+    if 'cancelled' in (order.status, previous_status) and order.status != previous_status:
+        # Cancelled orders do not count as sales
+        record_sales(order.created_at, [(item.product_id, item.quantity) for item in order.order_products],
+                     sign=-1 if order.status == 'cancelled' else 1)
+        mark_dirty(order.created_at)
+    if order.status == 'shipped' or released_holds or reopened:
+        # Shipping changed the stock of the products, cancelling or reopening their available stock
+        invalidate_tags("products:list", *(f"product:{item.product_id}" for item in order.order_products))
+        invalidate_product_snapshots(*(item.product_id for item in order.order_products))
+    return jsonify({
+        'message': 'Order updated successfully',
+        **ORDER.dump(order, ("order_id", "buyer_id", "total", "status", "created_at"))
+    }), 200, version_headers(order)
+
 
 @orders_bp.route('/orders/<int:order_id>', methods=['DELETE'])
 @token_required
@@ -1003,10 +1341,29 @@ def delete_order(order_id: int) -> tuple:
     if not order:
         raise ResourceNotFound("Order not found")
 
+    buyer_id = order.buyer_id
+    ordered_at = order.created_at
+    sold = [] if order.status == 'cancelled' else [(item.product_id, item.quantity) for item in order.order_products]
+    # Stock taken by a flash-sale order that never shipped goes back to the sale
+    held = [] if order.status in ('shipped', 'delivered') else [
+        (item.product_id, item.quantity) for item in order.order_products if item.stock_taken]
+    # Products whose available stock changes: the reservations of the order go with it
+    freed = sorted({reservation.product_id for reservation in order.reservations} |
+                   {product_id for product_id, _ in held})
     try:
         db.session.delete(order)
         db.session.commit()
-        return jsonify({"message": "Order deleted successfully"}), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         raise
+
+    if held:
+        _give_back_flash_stock(held)
+    invalidate_tags(f"order:{order_id}", f"orders:buyer:{buyer_id}")
+    if freed:
+        invalidate_tags("products:list", *(f"product:{product_id}" for product_id in freed))
+        invalidate_product_snapshots(*freed)
+    record_sales(ordered_at, sold, sign=-1)
+    if sold:
+        mark_dirty(ordered_at)
+    return jsonify({"message": "Order deleted successfully"}), 200
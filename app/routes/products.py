@@ -1,13 +1,27 @@
-from flask import Blueprint, request, jsonify
+import re
+from flask import Blueprint, current_app, request, jsonify
+from redis.exceptions import RedisError
 from sqlalchemy.exc import SQLAlchemyError
 from app.models import Product
 from app.database import db
+from app.serializers import PRODUCT
 from app.services.auth import token_required
-from app.utils.exceptions import BadRequestsError, ResourceNotFound
+from app.services.cart import invalidate_product_snapshots
+from app.services.change_feed import product_changes
+from app.services.flash_sale import adjust_stock
+from app.services.leaderboard import MAX_WINDOW_DAYS, top_products
+from app.services.rate_limit import charge_rows
+from app.services.reservations import available_quantities
+from app.utils.cache import cached, invalidate_tags
+from app.utils.exceptions import BadRequestsError, ResourceNotFound, ServiceUnavailable
+from app.utils.versioning import check_if_match, version_headers
 
 # Create a Blueprint for products
 products_bp = Blueprint('products', __name__)
 
+UPDATED_FIELDS = ("id", "seller_id", "name", "description", "price", "stock", "created_at")
+CHANGE_FIELDS = UPDATED_FIELDS + ("updated_at",)
+
 
 # Create a new product (POST)
 @products_bp.route('/products', methods=['POST', 'OPTIONS'])
@@ -136,12 +150,14 @@ def create_products():
     except SQLAlchemyError as e:
         db.session.rollback()
         raise
+    invalidate_tags("products:list")
 
     return jsonify({"message": "Product created", "product": new_product.id}), 201
 
 
 # Get a product by ID (GET)
 @products_bp.route('/products/<int:id>', methods=['GET'])
+@cached(ttl=300, tags=["product:{id}"], query_params=("fields",))
 def get_product(id: int):
     """
     Get product by ID
@@ -149,7 +165,9 @@ def get_product(id: int):
     tags:
       - Products
     summary: Retrieve a product by their unique ID
-    description: Endpoint to retrieve a product's data by their unique ID.
+    description: |
+      Endpoint to retrieve a product's data by their unique ID. The `ETag` header carries the
+      version of the product, to send in `If-Match` when updating it.
     parameters:
       - in: path
         name: id
@@ -158,6 +176,12 @@ def get_product(id: int):
         schema:
           type: integer
           example: 123
+      - in: query
+        name: fields
+        required: false
+        description: Comma-separated fields to return, e.g. id,name,price (only those columns are read)
+        schema:
+          type: string
     responses:
       200:
         description: Product data successfully retrieved
@@ -185,6 +209,10 @@ def get_product(id: int):
                 stock:
                   type: integer
                   example: 35
+                available_stock:
+                  type: integer
+                  description: Stock minus the units reserved by pending orders
+                  example: 32
                 created_at:
                   type: string
                   format: date-time
@@ -239,24 +267,19 @@ def get_product(id: int):
                   type: string
                   example: "Database connection error"
     """
-    #product = Product.query.get(id)
-    product = db.session.get(Product, id)
+    fields = PRODUCT.requested_fields()
+    product = db.session.get(Product, id, options=[PRODUCT.load_only(fields, "version")])
     if not product:
         raise ResourceNotFound("Product not found")
 
-    return jsonify({
-        "id": product.id,
-        "seller_id": product.seller_id,
-        "name": product.name,
-        "description": product.description,
-        "price": product.price,
-        "stock": product.stock,
-        "created_at": product.created_at
-    }), 200
+    return jsonify(PRODUCT.dump(
+        product, fields, available_stock=lambda product: available_quantities([product])[product.id]
+    )), 200, version_headers(product)
 
 
 # Get all products (GET)
 @products_bp.route('/products', methods=['GET'])
+@cached(ttl=60, tags=["products:list"], query_params=("fields",))
 def get_all_products():
     """
         Get All Products
@@ -265,6 +288,12 @@ def get_all_products():
           - Products
         summary: Retrieve all products
         description: Returns a list of all available products ordered by their ID.
+        parameters:
+          - in: query
+            name: fields
+            type: string
+            required: false
+            description: Comma-separated fields to return, e.g. id,name,price (only those columns are read)
         responses:
           200:
             description: A list of products
@@ -291,7 +320,10 @@ def get_all_products():
                     description: Price of the product
                   stock:
                     type: integer
-                    description: Available stock
+                    description: Physical stock
+                  available_stock:
+                    type: integer
+                    description: Stock minus the units reserved by pending orders
                   created_at:
                     type: string
                     format: date-time
@@ -305,25 +337,294 @@ def get_all_products():
                   type: string
                   example: No products found
         """
-    products = Product.query.order_by(Product.id).all()
+    fields = PRODUCT.requested_fields()
+    # Only the columns of the requested fields are selected, as plain rows
+    products = Product.query.with_entities(*PRODUCT.columns(fields)).order_by(Product.id).all()
     if not products:
         raise ResourceNotFound("Products not found")
+    charge_rows(len(products))
+    available = available_quantities(products, all_products=True) if 'available_stock' in fields else {}
 
-    # turn the list of objects to a dictionary list
-    products_list = [
-        {
-            "id": product.id,
-            "seller_id": product.seller_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "stock": product.stock,
-            "created_at": product.created_at
-        }
-        for product in products
-    ]
+    return jsonify(PRODUCT.dump_many(products, fields, available_stock=lambda product: available[product.id])), 200
 
-    return jsonify(products_list), 200
+
+# Get the product changes since a cursor (GET)
+@products_bp.route('/products/changes', methods=['GET'])
+def get_product_changes():
+    """
+        Product change feed
+        ---
+        tags:
+          - Products
+        summary: Products created, updated or deleted since a cursor
+        description: |
+          Incremental sync of the catalog. Start with `since=0` and pass the returned `next_cursor`
+          as `since` in the next call; while `has_more` is true there are more changes to fetch.
+
+          Changes are ordered by their sequence number and only the current state of each product is
+          returned. Deleted products are reported with `op: delete` and `product: null`.
+        parameters:
+          - in: query
+            name: since
+            type: integer
+            required: false
+            default: 0
+            description: Cursor returned by the previous call
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            default: 500
+            description: Maximum number of changes to return (up to 1000)
+        responses:
+          200:
+            description: Changes after the cursor
+            schema:
+              type: object
+              properties:
+                changes:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      seq:
+                        type: integer
+                        example: 1042
+                      op:
+                        type: string
+                        enum: [upsert, delete]
+                      id:
+                        type: integer
+                        example: 7
+                      product:
+                        type: object
+                next_cursor:
+                  type: integer
+                  example: 1042
+                has_more:
+                  type: boolean
+                  example: false
+          400:
+            description: Invalid cursor or limit
+            schema:
+              type: object
+              properties:
+                error:
+                  type: string
+                  example: Bad Request
+                message:
+                  type: string
+                  example: since must be a non-negative integer
+        """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', 500))
+    except ValueError:
+        raise BadRequestsError("since and limit must be integers")
+    if since < 0:
+        raise BadRequestsError("since must be a non-negative integer")
+    if not 1 <= limit <= 1000:
+        raise BadRequestsError("limit must be between 1 and 1000")
+
+    changes, has_more = product_changes(since, limit)
+    charge_rows(len(changes))
+
+    changes_list = []
+    for change in changes:
+        if isinstance(change, Product):
+            changes_list.append({
+                "seq": change.change_seq,
+                "op": "upsert",
+                "id": change.id,
+                "product": PRODUCT.dump(change, CHANGE_FIELDS)
+            })
+        else:
+            changes_list.append({"seq": change.change_seq, "op": "delete", "id": change.product_id, "product": None})
+
+    return jsonify({
+        "changes": changes_list,
+        "next_cursor": changes_list[-1]["seq"] if changes_list else since,
+        "has_more": has_more
+    }), 200
+
+
+# Get the best-selling products (GET)
+@products_bp.route('/products/top', methods=['GET'])
+def get_top_products():
+    """
+        Best-selling products
+        ---
+        tags:
+          - Products
+        summary: Products with the most units sold in a recent window
+        description: |
+          Ranking of the products by units sold in the orders placed during the last `window` days
+          (cancelled orders are not counted). Counters are kept per day in Redis and merged on demand,
+          so the order items are never scanned per request.
+        parameters:
+          - in: query
+            name: window
+            type: string
+            required: false
+            default: 7d
+            description: Number of days to rank, from 1d to 30d
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            default: 10
+            description: Number of products to return (up to 100)
+        responses:
+          200:
+            description: Best sellers, first the one with the most units sold
+            schema:
+              type: object
+              properties:
+                window:
+                  type: string
+                  example: 7d
+                products:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                        example: 7
+                      name:
+                        type: string
+                        example: Xiaomi 13T Plus
+                      price:
+                        type: number
+                        example: 499
+                      units_sold:
+                        type: integer
+                        example: 132
+          400:
+            description: Invalid window or limit
+          503:
+            description: The leaderboard is temporarily unavailable
+        """
+    window = request.args.get('window', '7d')
+    match = re.fullmatch(r'(\d+)d', window)
+    if not match or not 1 <= int(match.group(1)) <= MAX_WINDOW_DAYS:
+        raise BadRequestsError(f"window must be between 1d and {MAX_WINDOW_DAYS}d")
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        raise BadRequestsError("limit must be an integer")
+    if not 1 <= limit <= 100:
+        raise BadRequestsError("limit must be between 1 and 100")
+
+    try:
+        top = top_products(int(match.group(1)), limit)
+    except RedisError:
+        raise ServiceUnavailable("The best-seller leaderboard is temporarily unavailable")
+
+    products = {product.id: product for product in
+                Product.query.filter(Product.id.in_([product_id for product_id, _ in top])).all()}
+
+    return jsonify({
+        "window": window,
+        "products": [
+            {
+                "id": product_id,
+                "name": products[product_id].name,
+                "price": products[product_id].price,
+                "units_sold": units
+            }
+            # Deleted products stay in the counters until their buckets expire
+            for product_id, units in top if product_id in products
+        ]
+    }), 200
+
+
+# Get the products frequently bought together with a product (GET)
+@products_bp.route('/products/<int:product_id>/related', methods=['GET'])
+def get_related_products(product_id: int):
+    """
+        Frequently bought together
+        ---
+        tags:
+          - Products
+        summary: Products most often bought in the same order as this one
+        description: |
+          Precomputed by the `flask build-related-products` job from the order items, so the lookup
+          does not depend on the number of orders. Products without enough orders return an empty list.
+        parameters:
+          - in: path
+            name: product_id
+            type: integer
+            required: true
+            description: ID of the product
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            default: 10
+            description: Number of related products to return (up to 50)
+        responses:
+          200:
+            description: Related products, the most frequent first
+            schema:
+              type: object
+              properties:
+                product_id:
+                  type: integer
+                  example: 7
+                related:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                        example: 12
+                      name:
+                        type: string
+                        example: Phone case
+                      price:
+                        type: number
+                        example: 15
+                      orders_together:
+                        type: integer
+                        example: 48
+          400:
+            description: Invalid limit
+          404:
+            description: Product not found
+          503:
+            description: Related products are temporarily unavailable
+        """
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        raise BadRequestsError("limit must be an integer")
+    if not 1 <= limit <= 50:
+        raise BadRequestsError("limit must be between 1 and 50")
+
+    try:
+        neighbours = current_app.extensions["related_products"].get(product_id)[:limit]
+    except RedisError:
+        raise ServiceUnavailable("Related products are temporarily unavailable")
+
+    products = {product.id: product for product in
+                Product.query.filter(Product.id.in_([product_id] + [related_id for related_id, _ in neighbours]))}
+    if product_id not in products:
+        raise ResourceNotFound("Product not found")
+
+    return jsonify({
+        "product_id": product_id,
+        "related": [
+            {
+                "id": related_id,
+                "name": products[related_id].name,
+                "price": products[related_id].price,
+                "orders_together": count
+            }
+            for related_id, count in neighbours if related_id in products
+        ]
+    }), 200
 
 
 @products_bp.route('/products/<int:product_id>', methods=['PATCH'])
@@ -335,10 +636,19 @@ def update_product(product_id: int):
         tags:
           - Products
         summary: Update an existing product
-        description: Update one or more fields of an existing product by its ID. Requires authentication via token.
+        description: |
+          Update one or more fields of an existing product by its ID. Requires authentication via token.
+
+          Send the `ETag` of the product in `If-Match` to update it only if it has not changed since it
+          was read. A product changed by another request meanwhile is not updated (409).
         security:
           - Bearer: []
         parameters:
+          - name: If-Match
+            in: header
+            type: string
+            required: false
+            description: ETag of the product as last read, e.g. "3"
           - name: product_id
             in: path
             type: integer
@@ -402,6 +712,8 @@ def update_product(product_id: int):
                 error:
                   type: string
                   example: Product not found
+          409:
+            description: The product was modified by another request, read it again and retry
         """
     data = request.get_json()
     if not data:
@@ -411,6 +723,7 @@ def update_product(product_id: int):
 
     if not product:
         raise ResourceNotFound("Product not found")
+    check_if_match(product)
 
     if 'seller_id' in data:
         product.seller_id = data['seller_id']
@@ -433,6 +746,7 @@ def update_product(product_id: int):
             raise BadRequestsError("Stock must be an integer")
         if data['stock'] < 0:
             raise BadRequestsError("Stock must be non-negative")
+        stock_delta = data['stock'] - product.stock
         product.stock = data['stock']
 
     # Safe the changes in database
@@ -441,20 +755,16 @@ def update_product(product_id: int):
     except SQLAlchemyError as e:
         db.session.rollback()
         raise
+    if product.flash_sale and 'stock' in data and stock_delta:
+        adjust_stock(product_id, stock_delta)
+    invalidate_tags(f"product:{product_id}", "products:list")
+    invalidate_product_snapshots(product_id)
 
     # Response
     return jsonify({
         "message": "Product updated  successfully",
-        "product": {
-            "id": product.id,
-            "seller_id": product.seller_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "stock": product.stock,
-            "created_at": product.created_at
-        }
-    }), 200
+        "product": PRODUCT.dump(product, UPDATED_FIELDS)
+    }), 200, version_headers(product)
 
 
 @products_bp.route('/products/<int:product_id>', methods=['DELETE'])
@@ -546,6 +856,8 @@ def delete_product(product_id: int):
     except SQLAlchemyError as e:
         db.session.rollback()
         raise
+    invalidate_tags(f"product:{product_id}", "products:list")
+    invalidate_product_snapshots(product_id)
 
     # Response
     return jsonify({"message": "Product delete successfully"}), 200
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from app.models import User
 from app.database import db
+from app.serializers import USER
 from app.services.auth import encrypt_password, token_required
+from app.services.rate_limit import charge_rows
+from app.utils.cache import cached, invalidate_tags
 from app.utils.exceptions import *
+from app.utils.versioning import check_if_match, version_headers
 
 # Create a Blueprint for users
 users_bp = Blueprint('users', __name__)
@@ -103,6 +107,7 @@ def create_user():
 # Get a user by ID (GET)
 @users_bp.route('/users/<int:id>', methods=['GET'])
 @token_required
+@cached(ttl=300, tags=["user:{id}"], query_params=("fields",))
 def get_user(id: int):
     """
     Get user by ID
@@ -112,7 +117,9 @@ def get_user(id: int):
     tags:
       - Users
     summary: Retrieve a user by their unique ID
-    description: Endpoint to retrieve a user's data by their unique ID.
+    description: |
+      Endpoint to retrieve a user's data by their unique ID. The `ETag` header carries the
+      version of the user, to send in `If-Match` when updating it.
     parameters:
       - in: path
         name: id
@@ -121,6 +128,12 @@ def get_user(id: int):
         schema:
           type: integer
           example: 123
+      - in: query
+        name: fields
+        required: false
+        description: Comma-separated fields to return, e.g. id,name (only those columns are read)
+        schema:
+          type: string
       - in: header
         name: Authorization
         required: true
@@ -203,17 +216,12 @@ def get_user(id: int):
                   example: "Database connection error"
     """
 
-    user = User.query.get(id)
+    fields = USER.requested_fields()
+    user = db.session.get(User, id, options=[USER.load_only(fields, "version")])
     if not user:
         raise ResourceNotFound("User not found")
 
-    return jsonify({
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "role": user.role.name,
-        "created_at": user.created_at
-    }), 200
+    return jsonify(USER.dump(user, fields)), 200, version_headers(user)
 
 
 # Get a user all users
@@ -237,6 +245,12 @@ def get_all_users():
             schema:
               type: string
               example: "Bearer your_jwt_token_here"
+          - in: query
+            name: fields
+            required: false
+            description: Comma-separated fields to return, e.g. id,name (only those columns are read)
+            schema:
+              type: string
         responses:
           200:
             description: Successfully retrieved the list of users
@@ -302,23 +316,14 @@ def get_all_users():
 
     """
 
-    users = User.query.order_by(User.id).all()
+    fields = USER.requested_fields()
+    # Only the columns of the requested fields are selected, as plain rows
+    users = User.query.with_entities(*USER.columns(fields)).order_by(User.id).all()
     if not users:
         raise ResourceNotFound("No users found")
+    charge_rows(len(users))
 
-    # turn the list of objects to a dictionary list
-    users_list = [
-        {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "role": user.role.name,
-            "created_at": user.created_at
-        }
-        for user in users
-    ]
-
-    return jsonify(users_list), 200
+    return jsonify(USER.dump_many(users, fields)), 200
 
 
 @users_bp.route('/users/<int:user_id>', methods=['PATCH'])
@@ -339,6 +344,11 @@ def update_user(user_id: int):
             schema:
               type: string
               example: "Bearer your_jwt_token_here"
+          - name: If-Match
+            in: header
+            type: string
+            required: false
+            description: ETag of the user as last read, e.g. "3". The update is rejected (409) if the user changed since
           - name: user_id
             in: path
             type: integer
@@ -409,6 +419,8 @@ def update_user(user_id: int):
                 error:
                   type: string
                   example: "Token is missing or invalid"
+          409:
+            description: The user was modified by another request, read it again and retry
         """
 
     data = request.get_json()
@@ -416,6 +428,7 @@ def update_user(user_id: int):
 
     if not user:
         raise ResourceNotFound("User not found")
+    check_if_match(user)
 
     if 'name' in data:
         user.name = data['name']
@@ -430,17 +443,13 @@ def update_user(user_id: int):
 
     # Save the changes in database
     db.session.commit()
+    invalidate_tags(f"user:{user_id}")
 
     # Response
     return jsonify({
         "message": "User updated successfully",
-        "user": {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "role": user.role.name
-        }
-    }), 200
+        "user": USER.dump(user, ("id", "name", "email", "role"))
+    }), 200, version_headers(user)
 
 
 @users_bp.route('/users/<int:user_id>', methods=['DELETE'])
@@ -502,6 +511,7 @@ def delete_user(user_id: int):
     # Delete user
     db.session.delete(user)
     db.session.commit()
+    invalidate_tags(f"user:{user_id}", f"orders:buyer:{user_id}")
 
     # Response
     return jsonify({"message": "User delete successfully"}), 200
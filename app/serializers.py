@@ -0,0 +1,163 @@
+from operator import attrgetter
+from flask import request
+from sqlalchemy.orm import load_only
+from app.models import User, Product, Order, OrderItem
+from app.utils.exceptions import BadRequestsError
+
+
+class Computed:
+    """
+    A field whose value the caller supplies when dumping (e.g. the available stock of a
+    product), with the columns it needs loaded.
+    """
+    def __init__(self, *columns):
+        self.columns = columns
+
+
+def _money(value):
+    return round(float(value), 2)
+
+
+def _unit_price(value):
+    return round(float(value), 3)
+
+
+class Serializer:
+    """
+    Turns model instances, or rows with the same attribute names (Core column projections),
+    into dicts.
+
+    "fields" maps each output name, in output order, to an attribute path ("role.name"), an
+    (attribute path, converter) pair or a Computed field. The attributes of every set of
+    fields are read with one attrgetter built the first time that set is used, and the dicts
+    are zipped from the tuples it returns.
+    """
+    def __init__(self, model, fields: dict, default: tuple | None = None):
+        self.model = model
+        self.fields = fields
+        self.default = default or tuple(fields)
+        self._positions = {name: position for position, name in enumerate(fields)}
+        self._plans = {}
+
+    def _plan(self, names: tuple):
+        plan = self._plans.get(names)
+        if plan is not None:
+            return plan
+
+        paths, converters, computed = [], [], []
+        for index, name in enumerate(names):
+            spec = self.fields[name]
+            if isinstance(spec, Computed):
+                computed.append((index, name))
+                continue
+            path, convert = spec if isinstance(spec, tuple) else (spec, None)
+            if convert is not None:
+                converters.append((len(paths), convert))
+            paths.append(path)
+
+        if len(paths) == 1:
+            single = attrgetter(paths[0])
+            getter = lambda obj: (single(obj),)
+        elif paths:
+            getter = attrgetter(*paths)
+        else:
+            getter = lambda obj: ()
+        plan = self._plans[names] = (names, getter, tuple(converters), tuple(computed))
+        return plan
+
+    def requested_fields(self, default: tuple | None = None) -> tuple:
+        """
+        Fields of the "fields" query parameter (comma separated), in output order, or the
+        default ones when it is missing. Raises BadRequestsError on unknown fields.
+        """
+        value = request.args.get('fields')
+        if value is None:
+            return default or self.default
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = sorted(names - self.fields.keys())
+        if not names or unknown:
+            raise BadRequestsError(f"Unknown fields: {', '.join(unknown) or value!r}; "
+                                   f"valid fields are: {', '.join(self.fields)}")
+        return tuple(sorted(names, key=self._positions.__getitem__))
+
+    def columns(self, names: tuple, *extra) -> list:
+        """
+        Model attributes that "names" (and the "extra" attribute names) need, to select them
+        with Query.with_entities() or load_only().
+        """
+        columns = list(extra)
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, Computed):
+                columns.extend(spec.columns)
+            else:
+                columns.append((spec[0] if isinstance(spec, tuple) else spec).split('.')[0])
+        return [getattr(self.model, column) for column in dict.fromkeys(columns)]
+
+    def load_only(self, names: tuple, *extra):
+        return load_only(*self.columns(names, *extra))
+
+    def dump_many(self, objs, names: tuple | None = None, **computed) -> list:
+        """
+        Dicts of "objs" with the fields "names" (the default ones when None). Computed fields
+        take their value from the function of the same name in "computed", called with the object.
+        """
+        names, getter, converters, computed_fields = self._plan(names or self.default)
+        if not converters and not computed_fields:
+            return [dict(zip(names, getter(obj))) for obj in objs]
+
+        functions = [(index, computed[name]) for index, name in computed_fields]
+        dumped = []
+        for obj in objs:
+            values = list(getter(obj))
+            for index, convert in converters:
+                values[index] = convert(values[index])
+            for index, function in functions:
+                values.insert(index, function(obj))
+            dumped.append(dict(zip(names, values)))
+        return dumped
+
+    def dump(self, obj, names: tuple | None = None, **computed) -> dict:
+        return self.dump_many((obj,), names, **computed)[0]
+
+
+PRODUCT = Serializer(Product, {
+    "id": "id",
+    "seller_id": "seller_id",
+    "name": "name",
+    "description": "description",
+    "price": "price",
+    "stock": "stock",
+    "available_stock": Computed("id", "stock", "flash_sale"),
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}, default=("id", "seller_id", "name", "description", "price", "stock", "available_stock", "created_at"))
+
+ORDER_ITEM = Serializer(OrderItem, {
+    "product_id": "product_id",
+    "quantity": "quantity",
+    "price": ("price", _unit_price),
+})
+
+ORDER = Serializer(Order, {
+    "order_id": "id",
+    "buyer_id": "buyer_id",
+    "total": ("total", _money),
+    "status": "status",
+    "created_at": "created_at",
+    "item_count": "item_count",
+    # The items are loaded by order id and date (see app.services.partitions.load_order_items)
+    "order_products": Computed("id", "created_at"),
+}, default=("order_id", "buyer_id", "total", "status", "created_at", "order_products"))
+
+USER = Serializer(User, {
+    "id": "id",
+    "name": "name",
+    "email": "email",
+    "role": "role.name",
+    "created_at": "created_at",
+})
+
+
+def order_items(order) -> list:
+    return ORDER_ITEM.dump_many(order.order_products)
@@ -0,0 +1,137 @@
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import Date, cast, delete, distinct, func, insert, literal_column, select
+from app.database import db
+from app.models import Order, OrderItem, Product, SalesDaily, SalesDailyProduct
+from app.utils.cache import invalidate_tags
+
+# Cancelled orders are not sales; listing the others keeps ix_orders_status_created_at usable
+SOLD_STATUSES = ('pending', 'shipped', 'delivered')
+# Days whose orders changed since the last refresh (a set of ISO dates)
+DIRTY_DAYS_KEY = "analytics:dirty_days"
+REFRESHING_DAYS_KEY = "analytics:dirty_days:refreshing"
+MAX_RANGE_DAYS = 366
+GROUPINGS = ("day", "product", "seller")
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _day_bucket(column):
+    if db.engine.dialect.name == "postgresql":
+        # A literal, not a bound parameter: GROUP BY must repeat the exact SELECT expression
+        return cast(func.date_trunc(literal_column("'day'"), column), Date)
+    return func.date(column)
+
+
+def mark_dirty(ordered_at: datetime | None):
+    """
+    Queue the day an order was placed for the next refresh, after the order was created,
+    cancelled, restored or deleted. A Redis outage is only logged: "flask refresh-sales-rollups
+    --from --to" rebuilds the missed days.
+    """
+    day = ordered_at.date() if ordered_at else _today()
+    try:
+        current_app.extensions["redis"].sadd(DIRTY_DAYS_KEY, day.isoformat())
+    except RedisError:
+        logging.error("Could not queue %s for the sales rollups", day, exc_info=True)
+
+
+def refresh(start: date, end: date):
+    """
+    Recompute the rollups of the days from "start" to "end" (inclusive) from the orders, with
+    one INSERT ... SELECT per table, in a single transaction.
+    """
+    start_at, end_at = datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+    day = _day_bucket(Order.created_at).label("day")
+    sold = (Order.status.in_(SOLD_STATUSES), Order.created_at >= start_at, Order.created_at < end_at)
+
+    db.session.execute(delete(SalesDaily).where(SalesDaily.day.between(start, end)))
+    db.session.execute(delete(SalesDailyProduct).where(SalesDailyProduct.day.between(start, end)))
+    db.session.execute(insert(SalesDaily).from_select(
+        ["day", "orders", "units", "revenue"],
+        select(day, func.count(distinct(Order.id)), func.sum(OrderItem.quantity),
+               func.sum(OrderItem.quantity * OrderItem.price))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(*sold)
+        .group_by(day)
+    ))
+    db.session.execute(insert(SalesDailyProduct).from_select(
+        ["day", "product_id", "seller_id", "orders", "units", "revenue"],
+        select(day, OrderItem.product_id, Product.seller_id, func.count(distinct(Order.id)),
+               func.sum(OrderItem.quantity), func.sum(OrderItem.quantity * OrderItem.price))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(*sold)
+        .group_by(day, OrderItem.product_id, Product.seller_id)
+    ))
+    db.session.commit()
+    invalidate_tags("analytics:sales")
+
+
+def _ranges(days: list) -> list:
+    """
+    Consecutive days merged into (start, end) ranges.
+    """
+    ranges = []
+    for day in sorted(days):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(day_range) for day_range in ranges]
+
+
+def refresh_dirty() -> list:
+    """
+    Refresh the days queued by mark_dirty and return them. The queue is moved aside first, so
+    orders changed during the refresh are queued for the next one, and it is kept when the
+    refresh fails.
+    """
+    redis_connection = current_app.extensions["redis"]
+    pipeline = redis_connection.pipeline()
+    pipeline.sunionstore(REFRESHING_DAYS_KEY, [REFRESHING_DAYS_KEY, DIRTY_DAYS_KEY])
+    pipeline.delete(DIRTY_DAYS_KEY)
+    pipeline.smembers(REFRESHING_DAYS_KEY)
+    days = sorted(date.fromisoformat(day.decode()) for day in pipeline.execute()[-1])
+
+    for start, end in _ranges(days):
+        refresh(start, end)
+    redis_connection.delete(REFRESHING_DAYS_KEY)
+    return days
+
+
+def sales(group_by: str, start: date, end: date, limit: int = 100) -> list:
+    """
+    Rows of the sales report from the rollups: one per day (oldest first), or the best products
+    or sellers by revenue.
+    """
+    if group_by == "day":
+        rows = db.session.execute(
+            select(SalesDaily.day, SalesDaily.orders, SalesDaily.units, SalesDaily.revenue)
+            .where(SalesDaily.day.between(start, end))
+            .order_by(SalesDaily.day)
+        )
+        return [{"day": day.isoformat(), "orders": orders, "units": units, "revenue": round(revenue, 2)}
+                for day, orders, units, revenue in rows]
+
+    key = SalesDailyProduct.product_id if group_by == "product" else SalesDailyProduct.seller_id
+    revenue = func.sum(SalesDailyProduct.revenue)
+    rows = db.session.execute(
+        select(key, func.sum(SalesDailyProduct.orders), func.sum(SalesDailyProduct.units), revenue)
+        .where(SalesDailyProduct.day.between(start, end))
+        .group_by(key)
+        .order_by(revenue.desc(), key)
+        .limit(limit)
+    )
+    report = []
+    for key_id, orders, units, revenue in rows:
+        row = {f"{group_by}_id": key_id, "units": int(units), "revenue": round(revenue, 2)}
+        if group_by == "product":
+            # An order counts once per product; per seller the same order would be counted once per product
+            row["orders"] = int(orders)
+        report.append(row)
+    return report
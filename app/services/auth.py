@@ -1,9 +1,10 @@
 import bcrypt
 import jwt
 from functools import wraps
-from flask import request
+from flask import request, g
 from datetime import datetime, timedelta, timezone
-from app.models import User
+from app.models import User, RoleEnum
+from app.database import db
 from app.config import Config
 from app.utils.exceptions import InvalidTokenFormat, TokenMissing, TokenExpired, TokenInvalid
 
@@ -30,6 +31,39 @@ def generate_jwt_token(user: User) -> str:
     return token
 
 
+def decode_jwt_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise TokenExpired()
+    except jwt.InvalidTokenError:
+        raise TokenInvalid()
+
+
+def get_bearer_token() -> str | None:
+    authorization = request.headers.get('Authorization', '')
+    parts = authorization.split(" ")
+    if len(parts) != 2 or parts[0] != 'Bearer':
+        return None
+    return parts[1]
+
+
+def is_admin_request() -> bool:
+    """
+    True when the request carries a valid token of a user with the admin role.
+    """
+    token = get_bearer_token()
+    if not token:
+        return False
+    try:
+        payload = decode_jwt_token(token)
+    except (TokenExpired, TokenInvalid):
+        return False
+
+    user = db.session.get(User, int(payload['sub']))
+    return user is not None and user.role == RoleEnum.admin
+
+
 def token_required(f):
     @wraps(f)
     def decorator(*args, **kwargs):
@@ -44,12 +78,7 @@ def token_required(f):
         if not token:
             raise TokenMissing()
 
-        try:
-            payload = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            raise TokenExpired()
-        except jwt.InvalidTokenError:
-            raise TokenInvalid()
+        g.jwt_payload = decode_jwt_token(token)
 
         return f(*args, **kwargs)
     return decorator
@@ -0,0 +1,138 @@
+import logging
+from flask import current_app
+from redis.exceptions import RedisError
+from app.models import Product
+from app.services.orders import place_order
+from app.services.reservations import available_quantities
+from app.utils.exceptions import BadRequestsError, ResourceNotFound
+
+# Carts live only in Redis: a hash per user (field: product id, value: quantity) that
+# expires after a week without changes
+CART_TTL = 7 * 24 * 60 * 60
+CHECKOUT_LOCK_TTL = 30
+# Price, stock and name of the products in carts, so adding to a cart does not hit the database
+SNAPSHOT_TTL = 60
+
+
+def cart_key(user_id: int) -> str:
+    return f"cart:{user_id}"
+
+
+def snapshot_key(product_id: int) -> str:
+    return f"product:snapshot:{product_id}"
+
+
+def product_snapshots(product_ids: list) -> dict:
+    """
+    {product_id: {"name", "price", "stock"}} of the existing products, read from Redis and
+    completed from the database for the ones not cached. "stock" is the available stock.
+    """
+    redis_connection = current_app.extensions["redis"]
+    pipeline = redis_connection.pipeline(transaction=False)
+    for product_id in product_ids:
+        pipeline.hgetall(snapshot_key(product_id))
+
+    snapshots = {}
+    for product_id, fields in zip(product_ids, pipeline.execute()):
+        if fields:
+            snapshots[product_id] = {"name": fields[b"name"].decode(), "price": int(fields[b"price"]),
+                                     "stock": int(fields[b"stock"])}
+
+    missing = [product_id for product_id in product_ids if product_id not in snapshots]
+    if missing:
+        pipeline = redis_connection.pipeline(transaction=False)
+        products = Product.query.filter(Product.id.in_(missing)).all()
+        available = available_quantities(products)
+        for product in products:
+            snapshots[product.id] = {"name": product.name, "price": product.price, "stock": available[product.id]}
+            pipeline.hset(snapshot_key(product.id), mapping=snapshots[product.id])
+            pipeline.expire(snapshot_key(product.id), SNAPSHOT_TTL)
+        pipeline.execute()
+    return snapshots
+
+
+def invalidate_product_snapshots(*product_ids):
+    """
+    Drop the cached snapshots after the price or stock of the products changed.
+    """
+    if not product_ids:
+        return
+    try:
+        current_app.extensions["redis"].delete(*(snapshot_key(product_id) for product_id in product_ids))
+    except RedisError:
+        logging.error("Could not invalidate the snapshots of products %s", product_ids, exc_info=True)
+
+
+def get_cart(user_id: int) -> dict:
+    """
+    Lines of the cart ({product_id: quantity}) with the current snapshot of each product.
+    Products deleted since they were added are removed from the cart.
+    """
+    redis_connection = current_app.extensions["redis"]
+    quantities = {int(product_id): int(quantity)
+                  for product_id, quantity in redis_connection.hgetall(cart_key(user_id)).items()}
+    snapshots = product_snapshots(sorted(quantities))
+
+    gone = [product_id for product_id in quantities if product_id not in snapshots]
+    if gone:
+        redis_connection.hdel(cart_key(user_id), *gone)
+    return {product_id: (quantity, snapshots[product_id])
+            for product_id, quantity in sorted(quantities.items()) if product_id in snapshots}
+
+
+def add_item(user_id: int, product_id: int, quantity: int) -> int:
+    """
+    Add units of a product to the cart and return the quantity now in it. The stock is
+    checked against the snapshot, the database check happens at checkout.
+    """
+    snapshot = product_snapshots([product_id]).get(product_id)
+    if snapshot is None:
+        raise ResourceNotFound(f"Product with id {product_id} not found")
+
+    redis_connection = current_app.extensions["redis"]
+    pipeline = redis_connection.pipeline()
+    pipeline.hincrby(cart_key(user_id), product_id, quantity)
+    pipeline.expire(cart_key(user_id), CART_TTL)
+    total = pipeline.execute()[0]
+    if total > snapshot["stock"]:
+        if total == quantity:
+            redis_connection.hdel(cart_key(user_id), product_id)
+        else:
+            redis_connection.hincrby(cart_key(user_id), product_id, -quantity)
+        raise BadRequestsError(f"There is not enough stock of {snapshot['name']} "
+                               f"({snapshot['stock']} available, {total} requested)")
+    return total
+
+
+def remove_item(user_id: int, product_id: int):
+    if not current_app.extensions["redis"].hdel(cart_key(user_id), product_id):
+        raise ResourceNotFound(f"Product with id {product_id} is not in the cart")
+
+
+def checkout(user_id: int):
+    """
+    Turn the cart into an order through the regular order creation path (one transaction,
+    current prices, stock reserved in the database) and empty the cart.
+    """
+    redis_connection = current_app.extensions["redis"]
+    lock_key = f"{cart_key(user_id)}:checkout"
+    if not redis_connection.set(lock_key, 1, nx=True, ex=CHECKOUT_LOCK_TTL):
+        raise BadRequestsError("A checkout of this cart is already in progress")
+
+    try:
+        quantities = redis_connection.hgetall(cart_key(user_id))
+        if not quantities:
+            raise BadRequestsError("The cart is empty")
+
+        order = place_order(user_id, [{"product_id": int(product_id), "quantity": int(quantity)}
+                                      for product_id, quantity in sorted(quantities.items())])
+    except Exception:
+        redis_connection.delete(lock_key)
+        raise
+
+    # The order is committed: a Redis error now must not report the checkout as failed
+    try:
+        redis_connection.delete(cart_key(user_id), lock_key)
+    except RedisError:
+        logging.error("Could not empty the cart of user %s after order %s", user_id, order.id, exc_info=True)
+    return order
@@ -0,0 +1,55 @@
+from sqlalchemy import event, update
+from app.database import db
+from app.models import Product, ProductTombstone, ChangeSequence
+
+
+def reserve_change_seqs(connection, count: int, feed: str = "products") -> int:
+    """
+    Reserve "count" consecutive sequence numbers of a change feed and return the first one.
+
+    The counter row stays locked until the transaction ends, so a reader never sees a
+    sequence number committed before a lower one that is still in flight.
+    """
+    statement = (update(ChangeSequence)
+                 .where(ChangeSequence.name == feed)
+                 .values(value=ChangeSequence.value + count)
+                 .returning(ChangeSequence.value))
+    return connection.execute(statement).scalar_one() - count + 1
+
+
+@event.listens_for(db.session, "before_flush")
+def track_product_changes(session, flush_context, instances):
+    """
+    Give every inserted or updated product a new change_seq and leave a tombstone for
+    every deleted one. Bulk writes that bypass the ORM must call reserve_change_seqs().
+    """
+    changed = [obj for obj in session.new if isinstance(obj, Product)]
+    changed += [obj for obj in session.dirty
+                if isinstance(obj, Product) and session.is_modified(obj, include_collections=False)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Product)]
+    if not changed and not deleted:
+        return
+
+    seq = reserve_change_seqs(session.connection(), len(changed) + len(deleted))
+    for product in changed:
+        product.change_seq = seq
+        seq += 1
+    for product in deleted:
+        session.add(ProductTombstone(change_seq=seq, product_id=product.id))
+        seq += 1
+
+
+def product_changes(since: int, limit: int) -> tuple:
+    """
+    Products inserted, updated or deleted after the cursor "since", ordered by change_seq.
+
+    Returns (changes, has_more). Only the latest state of a product is reported, so the
+    cost depends on the number of changed products and not on the size of the catalog.
+    """
+    products = (Product.query.filter(Product.change_seq > since)
+                .order_by(Product.change_seq).limit(limit + 1).all())
+    tombstones = (ProductTombstone.query.filter(ProductTombstone.change_seq > since)
+                  .order_by(ProductTombstone.change_seq).limit(limit + 1).all())
+
+    changes = sorted(products + tombstones, key=lambda change: change.change_seq)
+    return changes[:limit], len(changes) > limit
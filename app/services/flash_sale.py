@@ -0,0 +1,272 @@
+import time
+import uuid
+import logging
+from collections import Counter
+from flask import current_app
+from sqlalchemy import func, update, bindparam
+from app.database import db
+from app.models import Product, FlashSaleFlush, OrderItem
+from app.services import reservations
+from app.services.change_feed import reserve_change_seqs
+from app.utils.cache import invalidate_tags
+from app.utils.exceptions import BadRequestsError, ServiceUnavailable
+
+# Stock of a product in flash-sale mode: "flash:stock:<id>" is the authoritative counter
+# while the mode is on; "flash:pending" accumulates the units taken and not yet written
+# to products.stock, which the write-behind worker flushes in batches
+PENDING_KEY = "flash:pending"
+FLUSHING_KEY = "flash:flushing"
+FLUSHING_ID_KEY = "flash:flushing:id"
+FLUSH_LOCK_KEY = "flash:flush:lock"
+FLUSH_LOCK_TTL = 60
+
+# KEYS: stock counters..., pending hash. ARGV: quantities..., product ids...
+# Takes every quantity or none of them: returns {1, 0}, or {0, i} / {-1, i} when the
+# i-th product has not enough stock / has no counter.
+TAKE_SCRIPT = """
+local count = #KEYS - 1
+for i = 1, count do
+    local stock = redis.call('GET', KEYS[i])
+    if not stock then return {-1, i} end
+    if tonumber(stock) < tonumber(ARGV[i]) then return {0, i} end
+end
+for i = 1, count do
+    redis.call('DECRBY', KEYS[i], ARGV[i])
+    redis.call('HINCRBY', KEYS[#KEYS], ARGV[count + i], ARGV[i])
+end
+return {1, 0}
+"""
+
+# Same arguments as TAKE_SCRIPT. Gives the quantities back to the products that still
+# have a counter and returns the ids of the ones that do not (flash sale stopped).
+RELEASE_SCRIPT = """
+local count = #KEYS - 1
+local missing = {}
+for i = 1, count do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+        redis.call('HINCRBY', KEYS[#KEYS], ARGV[count + i], -tonumber(ARGV[i]))
+    else
+        table.insert(missing, ARGV[count + i])
+    end
+end
+return missing
+"""
+
+# KEYS: pending, flushing, flushing id. ARGV: new batch id. Moves the pending decrements
+# to the flushing hash, unless a previous flush did not finish: that batch is retried.
+TAKE_BATCH_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then return {} end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('SET', KEYS[3], ARGV[1])
+end
+local batch_id = redis.call('GET', KEYS[3])
+return {batch_id, redis.call('HGETALL', KEYS[2])}
+"""
+
+# KEYS: stock counter, pending. ARGV: product id, stock in the database. The counter must
+# be the database stock minus what is taken but not flushed; returns the previous counter.
+RECONCILE_SCRIPT = """
+local pending = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+local previous = redis.call('GET', KEYS[1])
+redis.call('SET', KEYS[1], tonumber(ARGV[2]) - pending)
+return previous
+"""
+
+
+def stock_key(product_id: int) -> str:
+    return f"flash:stock:{product_id}"
+
+
+def _script_args(quantities: dict) -> tuple:
+    product_ids = sorted(quantities)
+    keys = [stock_key(product_id) for product_id in product_ids] + [PENDING_KEY]
+    return keys, [quantities[product_id] for product_id in product_ids] + product_ids, product_ids
+
+
+def take_stock(items: list):
+    """
+    Atomically take the stock of the flash-sale items ([(product_id, quantity)]) from Redis.
+    Raises BadRequestsError, and takes nothing, when one of them has not enough stock.
+    """
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+    keys, args, product_ids = _script_args(quantities)
+
+    redis_connection = current_app.extensions["redis"]
+    taken, index = redis_connection.register_script(TAKE_SCRIPT)(keys=keys, args=args)
+    if taken == -1:
+        raise ServiceUnavailable(f"The flash-sale stock of product {product_ids[index - 1]} is not loaded, "
+                                 f"run flask flash-sale reconcile")
+    if taken == 0:
+        raise BadRequestsError(f"There is not enough stock of product {product_ids[index - 1]} to complete the order")
+
+
+def release_stock(items: list):
+    """
+    Give back the stock of flash-sale items ([(product_id, quantity)]) of a cancelled order.
+    Products no longer in flash-sale mode get it back in the database (flushed already).
+    """
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+    keys, args, _ = _script_args(quantities)
+
+    missing = current_app.extensions["redis"].register_script(RELEASE_SCRIPT)(keys=keys, args=args)
+    for product_id in map(int, missing):
+        product = db.session.get(Product, product_id)
+        if product is not None:
+            product.stock += quantities[product_id]
+    if missing:
+        db.session.commit()
+        invalidate_tags("products:list", *(f"product:{int(product_id)}" for product_id in missing))
+
+
+def adjust_stock(product_id: int, delta: int):
+    """
+    Apply a manual change of products.stock to the counter of a flash-sale product.
+    """
+    current_app.extensions["redis"].incrby(stock_key(product_id), delta)
+
+
+def available_stock(product_ids: list) -> dict:
+    """
+    {product_id: units left} of the flash-sale products with a counter.
+    """
+    values = current_app.extensions["redis"].mget([stock_key(product_id) for product_id in product_ids])
+    return {product_id: int(value) for product_id, value in zip(product_ids, values) if value is not None}
+
+
+def _flush_batch() -> dict:
+    redis_connection = current_app.extensions["redis"]
+    batch = redis_connection.register_script(TAKE_BATCH_SCRIPT)(
+        keys=[PENDING_KEY, FLUSHING_KEY, FLUSHING_ID_KEY], args=[str(uuid.uuid4())])
+    if not batch:
+        return {}
+
+    batch_id, fields = batch[0].decode(), batch[1]
+    decrements = {int(fields[i]): int(fields[i + 1]) for i in range(0, len(fields), 2) if int(fields[i + 1])}
+
+    state = db.session.get(FlashSaleFlush, "products")
+    if state is not None and state.batch_id == batch_id:
+        logging.warning("Flash-sale batch %s was already applied, discarding it", batch_id)
+    else:
+        if state is None:
+            state = FlashSaleFlush(name="products", batch_id=batch_id)
+            db.session.add(state)
+        state.batch_id = batch_id
+        if decrements:
+            # One UPDATE per product, in a single transaction; the change feed sees them as updates
+            # and the new version makes a concurrent read-modify-write of the product fail
+            first_seq = reserve_change_seqs(db.session.connection(), len(decrements))
+            db.session.execute(
+                update(Product.__table__)
+                .where(Product.__table__.c.id == bindparam("product_id"))
+                .values(stock=Product.__table__.c.stock - bindparam("units"), change_seq=bindparam("seq"),
+                        updated_at=func.now(), version=Product.__table__.c.version + 1),
+                [{"product_id": product_id, "units": units, "seq": first_seq + offset}
+                 for offset, (product_id, units) in enumerate(sorted(decrements.items()))]
+            )
+        db.session.commit()
+
+    redis_connection.delete(FLUSHING_KEY, FLUSHING_ID_KEY)
+    if decrements:
+        invalidate_tags("products:list", *(f"product:{product_id}" for product_id in decrements))
+    return decrements
+
+
+def flush() -> dict | None:
+    """
+    Write the pending flash-sale decrements to products.stock. Returns {product_id: units}
+    written, or None when another worker holds the flush lock.
+    """
+    redis_connection = current_app.extensions["redis"]
+    if not redis_connection.set(FLUSH_LOCK_KEY, 1, nx=True, ex=FLUSH_LOCK_TTL):
+        return None
+    try:
+        return _flush_batch()
+    finally:
+        redis_connection.delete(FLUSH_LOCK_KEY)
+
+
+def start(product_ids: list):
+    """
+    Put products in flash-sale mode, loading their available stock into Redis first. The
+    units held by pending orders become taken flash-sale stock of those orders (written to
+    products.stock by the next flush), so they are neither sold again nor taken twice.
+    """
+    redis_connection = current_app.extensions["redis"]
+    products = Product.query.filter(Product.id.in_(product_ids)).all()
+    starting = [product for product in products if not product.flash_sale]
+    available = reservations.available_quantities(starting)
+    holds = reservations.active_holds([product.id for product in starting])
+
+    held = Counter()
+    for hold in holds:
+        held[hold.product_id] += hold.quantity
+
+    for product in starting:
+        redis_connection.set(stock_key(product.id), available[product.id])
+        product.flash_sale = True
+    for hold in holds:
+        db.session.execute(
+            update(OrderItem)
+            .where(OrderItem.order_id == hold.order_id, OrderItem.product_id == hold.product_id,
+                   OrderItem.stock_taken.is_(False))
+            .values(stock_taken=True)
+        )
+        db.session.delete(hold)
+    db.session.commit()
+
+    if held:
+        pipeline = redis_connection.pipeline()
+        for product_id, units in held.items():
+            pipeline.hincrby(PENDING_KEY, product_id, units)
+        pipeline.execute()
+    invalidate_tags("products:list", *(f"product:{product.id}" for product in products))
+    return [product.id for product in products]
+
+
+def stop(product_ids: list):
+    """
+    Take products out of flash-sale mode: new orders use products.stock again once the
+    pending decrements are flushed and the counters are removed.
+    """
+    redis_connection = current_app.extensions["redis"]
+    products = Product.query.filter(Product.id.in_(product_ids), Product.flash_sale.is_(True)).all()
+    for product in products:
+        product.flash_sale = False
+    db.session.commit()
+
+    while flush() is None:
+        time.sleep(0.1)  # another worker is flushing, wait for the lock
+    if products:
+        redis_connection.delete(*(stock_key(product.id) for product in products))
+    invalidate_tags("products:list", *(f"product:{product.id}" for product in products))
+    return [product.id for product in products]
+
+
+def reconcile() -> dict:
+    """
+    Flush the pending decrements and reset every counter to the stock in the database minus
+    what is still pending. Returns {product_id: (counter before, counter after)} of the
+    products whose counter had drifted (or was missing).
+    """
+    redis_connection = current_app.extensions["redis"]
+    while not redis_connection.set(FLUSH_LOCK_KEY, 1, nx=True, ex=FLUSH_LOCK_TTL):
+        time.sleep(0.1)  # wait for the write-behind worker to finish its batch
+    try:
+        _flush_batch()
+        db.session.expire_all()
+        drift = {}
+        for product in Product.query.filter(Product.flash_sale.is_(True)).order_by(Product.id):
+            previous = redis_connection.register_script(RECONCILE_SCRIPT)(
+                keys=[stock_key(product.id), PENDING_KEY], args=[product.id, product.stock])
+            current = int(redis_connection.get(stock_key(product.id)))
+            if previous is None or int(previous) != current:
+                drift[product.id] = (None if previous is None else int(previous), current)
+        return drift
+    finally:
+        redis_connection.delete(FLUSH_LOCK_KEY)
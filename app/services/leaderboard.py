@@ -0,0 +1,107 @@
+import logging
+from datetime import date, datetime, timedelta, timezone
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from app.database import db
+from app.models import Order, OrderItem
+
+# One sorted set per day (member: product id, score: units sold), kept a little longer
+# than the widest window so GET /products/top can always merge a full window
+MAX_WINDOW_DAYS = 30
+BUCKET_TTL = (MAX_WINDOW_DAYS + 2) * 24 * 60 * 60
+# Merged windows are reused for this long before the buckets are merged again
+TOP_CACHE_TTL = 60
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def bucket_key(day: date) -> str:
+    return f"leaderboard:products:{day:%Y%m%d}"
+
+
+def window_keys(days: int, today: date | None = None) -> list:
+    today = today or _today()
+    return [bucket_key(today - timedelta(days=offset)) for offset in range(days)]
+
+
+def record_sales(ordered_at: datetime | None, items: list, sign: int = 1):
+    """
+    Add the units of an order ([(product_id, quantity)]) to the bucket of the day it was
+    placed; sign=-1 takes them back when the order is cancelled or deleted. A Redis outage
+    is only logged: "flask rebuild-leaderboard" recovers the lost increments.
+    """
+    day = ordered_at.date() if ordered_at else _today()
+    if not items or (_today() - day).days >= MAX_WINDOW_DAYS:
+        return
+
+    key = bucket_key(day)
+    pipeline = current_app.extensions["redis"].pipeline(transaction=False)
+    for product_id, quantity in items:
+        pipeline.zincrby(key, sign * quantity, product_id)
+    pipeline.expire(key, BUCKET_TTL)
+    try:
+        pipeline.execute()
+    except RedisError:
+        logging.error("Could not update the best-seller leaderboard", exc_info=True)
+
+
+def top_products(days: int, limit: int) -> list:
+    """
+    [(product_id, units_sold)] of the last "days" days, best sellers first.
+    """
+    redis_connection = current_app.extensions["redis"]
+    today = _today()
+    union_key = f"leaderboard:products:top:{days}d:{today:%Y%m%d}"
+
+    if not redis_connection.exists(union_key):
+        pipeline = redis_connection.pipeline()
+        pipeline.zunionstore(union_key, window_keys(days, today))
+        pipeline.expire(union_key, TOP_CACHE_TTL)
+        pipeline.execute()
+
+    # Cancellations can leave products with no units left in the window
+    top = redis_connection.zrevrangebyscore(union_key, "+inf", "(0", start=0, num=limit, withscores=True)
+    return [(int(product_id), int(units)) for product_id, units in top]
+
+
+def daily_sales(days: int) -> dict:
+    """
+    {day: {product_id: units}} of the orders placed in the last "days" days, not counting
+    cancelled ones. Read from the database, for rebuilding the Redis buckets.
+    """
+    since = datetime.combine(_today() - timedelta(days=days - 1), datetime.min.time())
+    day = func.date(Order.created_at)
+    statement = (select(day, OrderItem.product_id, func.sum(OrderItem.quantity))
+                 .join(OrderItem, OrderItem.order_id == Order.id)
+                 .where(Order.created_at >= since, Order.status != 'cancelled')
+                 .group_by(day, OrderItem.product_id))
+
+    sales = {}
+    for order_day, product_id, units in db.session.execute(statement):
+        order_day = date.fromisoformat(str(order_day))
+        sales.setdefault(order_day, {})[product_id] = int(units)
+    return sales
+
+
+def rebuild(days: int = MAX_WINDOW_DAYS) -> int:
+    """
+    Recompute the buckets of the last "days" days from the order items. Returns the
+    number of buckets written.
+    """
+    sales = daily_sales(days)
+    today = _today()
+
+    pipeline = current_app.extensions["redis"].pipeline()
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        pipeline.delete(bucket_key(day))
+        if day in sales:
+            pipeline.zadd(bucket_key(day), sales[day])
+            pipeline.expire(bucket_key(day), BUCKET_TTL)
+    pipeline.delete(*(f"leaderboard:products:top:{window}d:{today:%Y%m%d}"
+                      for window in range(1, MAX_WINDOW_DAYS + 1)))
+    pipeline.execute()
+    return len(sales)
@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+import secrets
+import threading
+from flask import current_app
+from redis.exceptions import RedisError
+
+# Each buyer has a Redis stream with their recent events (so clients can resume from
+# Last-Event-ID) and a pub/sub channel used only to wake up the open connections
+STREAM_MAXLEN = 1000
+STREAM_TTL = 24 * 60 * 60
+HEARTBEAT_INTERVAL = 15
+RETRY_MS = 3000
+# EventSource cannot send headers: clients exchange their JWT for a single-use ticket that
+# goes in the URL, so the token itself never reaches the access logs
+TICKET_TTL = 30
+RECONNECT_DELAY = 1.0
+
+_EVENT_ID = re.compile(r"^\d+-\d+$")
+
+
+def stream_key(buyer_id: int) -> str:
+    return f"order_events:{buyer_id}"
+
+
+def channel(buyer_id: int) -> str:
+    return f"order_events:{buyer_id}:notify"
+
+
+CHANNEL_PATTERN = channel("*")
+
+
+def ticket_key(ticket: str) -> str:
+    return f"order_events:ticket:{ticket}"
+
+
+def issue_ticket(redis_connection, buyer_id: int) -> str:
+    ticket = secrets.token_urlsafe(32)
+    redis_connection.set(ticket_key(ticket), buyer_id, ex=TICKET_TTL)
+    return ticket
+
+
+def redeem_ticket(redis_connection, ticket: str) -> int | None:
+    """
+    Buyer id of a stream ticket, or None when it is unknown, expired or already used.
+    """
+    buyer_id = redis_connection.getdel(ticket_key(ticket))
+    return int(buyer_id) if buyer_id is not None else None
+
+
+def is_valid_event_id(event_id: str) -> bool:
+    return bool(_EVENT_ID.match(event_id))
+
+
+def format_event(event_id: str, event: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+def publish_order_status(buyer_id: int, order_id: int, status: str, previous_status: str):
+    """
+    Append a status transition to the buyer's stream and notify the connected clients.
+    Call it after the change is committed; a Redis outage only loses the push.
+    """
+    data = json.dumps({"order_id": order_id, "status": status, "previous_status": previous_status})
+    pipeline = current_app.extensions["redis"].pipeline()
+    pipeline.xadd(stream_key(buyer_id), {"event": "order_status", "data": data},
+                  maxlen=STREAM_MAXLEN, approximate=True)
+    pipeline.expire(stream_key(buyer_id), STREAM_TTL)
+    pipeline.publish(channel(buyer_id), order_id)
+    try:
+        pipeline.execute()
+    except RedisError:
+        logging.error("Could not publish the status change of order %s", order_id, exc_info=True)
+
+
+def _read_after(redis_connection, buyer_id: int, last_id: str) -> list:
+    return redis_connection.xrange(stream_key(buyer_id), min=f"({last_id}", max="+")
+
+
+class Subscription:
+    """
+    Wake-ups of one open stream. At most one is queued: the stream is read from the last
+    event id anyway, so coalesced notifications lose nothing.
+    """
+    def __init__(self, hub, buyer_id: int):
+        self.hub = hub
+        self.buyer_id = buyer_id
+        self._queue = queue.Queue(maxsize=1)
+
+    def notify(self):
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def wait(self, timeout: float) -> bool:
+        try:
+            self._queue.get(timeout=timeout)
+            return True
+        except queue.Empty:
+            return False
+
+    def close(self):
+        self.hub.remove(self)
+
+
+class OrderEventHub:
+    """
+    One pattern subscription to every buyer's channel per worker, read by a background
+    thread (a greenlet under the gevent workers) that wakes the streams of the buyer named
+    in each message. Open streams therefore share one Redis connection instead of holding
+    one each.
+    """
+    def __init__(self, redis_connection):
+        self.redis_connection = redis_connection
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._pubsub = None
+        self._pid = None
+
+    def _start(self):
+        # Under the lock. A forked worker starts its own listener instead of the parent's
+        if self._pubsub is not None and self._pid == os.getpid():
+            return
+        pubsub = self.redis_connection.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(CHANNEL_PATTERN)
+        self._pubsub, self._pid = pubsub, os.getpid()
+        threading.Thread(target=self._listen, args=(pubsub,), name="order-events", daemon=True).start()
+
+    def subscribe(self, buyer_id: int) -> Subscription:
+        """
+        Register a stream of the buyer; raises RedisError when the listener cannot subscribe.
+        """
+        subscription = Subscription(self, buyer_id)
+        with self._lock:
+            self._start()
+            self._subscriptions.setdefault(buyer_id, set()).add(subscription)
+        return subscription
+
+    def remove(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.buyer_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.buyer_id]
+
+    def dispatch(self, buyer_id: int):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(buyer_id, ()))
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def _dispatch_all(self):
+        with self._lock:
+            subscriptions = [s for buyer in self._subscriptions.values() for s in buyer]
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def _listen(self, pubsub):
+        while pubsub is self._pubsub:
+            try:
+                message = pubsub.get_message(timeout=HEARTBEAT_INTERVAL)
+            except (RedisError, OSError, ValueError):
+                if pubsub is not self._pubsub:
+                    return  # closed by stop()
+                logging.warning("Order events listener disconnected, resubscribing", exc_info=True)
+                time.sleep(RECONNECT_DELAY)
+                try:
+                    pubsub.psubscribe(CHANNEL_PATTERN)
+                except RedisError:
+                    continue
+                # Notifications sent while disconnected were lost: every stream reads again
+                self._dispatch_all()
+                continue
+            if message is None or message["type"] != "pmessage":
+                continue
+            try:
+                buyer_id = int(message["channel"].split(b":")[1])
+            except (IndexError, ValueError):
+                continue
+            self.dispatch(buyer_id)
+
+    def stop(self):
+        with self._lock:
+            pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+
+
+def subscribe(hub: OrderEventHub, buyer_id: int, last_event_id: str | None):
+    """
+    Register a stream of the buyer in the worker's hub and return (subscription, last_id).
+    Without Last-Event-ID only the events published from now on are sent.
+    """
+    redis_connection = hub.redis_connection
+    if last_event_id is None:
+        newest = redis_connection.xrevrange(stream_key(buyer_id), max="+", min="-", count=1)
+        last_event_id = newest[0][0].decode() if newest else "0-0"
+
+    return hub.subscribe(buyer_id), last_event_id
+
+
+def order_event_stream(redis_connection, subscription: Subscription, buyer_id: int, last_id: str,
+                       heartbeat: float = HEARTBEAT_INTERVAL):
+    """
+    Server-Sent Events for the buyer. The stream is read again after every notification
+    and every heartbeat, so nothing published between the subscription and the first read
+    (or while a notification was in flight) is lost.
+    """
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            for event_id, fields in _read_after(redis_connection, buyer_id, last_id):
+                last_id = event_id.decode()
+                yield format_event(last_id, fields[b"event"].decode(), fields[b"data"].decode())
+
+            if not subscription.wait(heartbeat):
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+    finally:
+        subscription.close()
@@ -0,0 +1,220 @@
+from collections import Counter, defaultdict
+from sqlalchemy import case, delete, func, select, update
+from app.models import Order, Product, OrderItem, StockReservation
+from app.database import db
+from app.services.analytics import mark_dirty
+from app.services.change_feed import reserve_change_seqs
+from app.services.flash_sale import take_stock, release_stock
+from app.services.leaderboard import record_sales
+from app.services.reservations import active_holds, reserve
+from app.utils.cache import invalidate_tags
+from app.utils.exceptions import ResourceNotFound, BadRequestsError, Conflict, ServiceUnavailable
+
+MAX_BULK_ORDERS = 500
+
+
+def place_order(buyer_id: int, products: list) -> Order:
+    """
+    Create a pending order with the requested products ([{"product_id", "quantity"}]) in one
+    transaction, at the current prices. The stock is reserved for the order until it ships or
+    the reservation expires (products in flash-sale mode take it from Redis right away); the
+    order is rejected when a product does not have enough available stock.
+    """
+    try:
+        new_order = Order(
+            buyer_id=buyer_id,
+            total=0.01,
+            status="pending"
+        )
+
+        db.session.add(new_order)
+        db.session.flush()  # assign an id before to make a commit
+
+        total_price = 0
+        order_products = []
+        products_db = {p.id: p for p in Product.query.filter(Product.id.in_(product.get('product_id') for product in
+                                                                            products)).all()}
+
+        for product in products:
+
+            if not product.get('product_id') or not product.get('quantity'):
+                raise BadRequestsError("Each product must have 'product_id' and 'quantity'")
+            try:
+                product["product_id"] = int(product["product_id"])
+                product["quantity"] = int(product["quantity"])
+            except (ValueError, TypeError):
+                raise BadRequestsError("product_id must be an integer and quantity must be an integer")
+
+            if product["product_id"] < 0 or product["quantity"] <= 0:
+                raise BadRequestsError("Product_id must be non-negative and quantity must be greater than 0")
+
+            product_db = products_db.get(product["product_id"])
+            if not product_db:
+                raise ResourceNotFound(f"Product with id {product['product_id']} not found")
+            total_price += product_db.price * product["quantity"]
+            order_item = OrderItem(
+                order=new_order,
+                product_id=product["product_id"],
+                quantity=product["quantity"],
+                price=product_db.price,
+                stock_taken=product_db.flash_sale
+            )
+            order_products.append(order_item)
+        db.session.add_all(order_products)
+
+        reserved = Counter()
+        for item in order_products:
+            if not item.stock_taken:
+                reserved[item.product_id] += item.quantity
+        reserve(new_order, reserved)
+
+        # Flash-sale products take their stock now, from Redis, instead of locking the product rows
+        flash_items = [(item.product_id, item.quantity) for item in order_products if item.stock_taken]
+        if flash_items:
+            take_stock(flash_items)
+
+        new_order.total = total_price
+        new_order.item_count = sum(item.quantity for item in order_products)
+        try:
+            db.session.commit()
+        except Exception:
+            if flash_items:
+                release_stock(flash_items)
+            raise
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+    # The available stock of the products changed: held, or taken from the flash-sale counters
+    ordered = {item.product_id for item in new_order.order_products}
+    invalidate_tags(f"orders:buyer:{new_order.buyer_id}", "products:list",
+                    *(f"product:{product_id}" for product_id in sorted(ordered)))
+    record_sales(new_order.created_at, [(item.product_id, item.quantity) for item in new_order.order_products])
+    mark_dirty(new_order.created_at)
+    return new_order
+
+
+def ship_orders(order_ids: list) -> tuple:
+    """
+    Ship a batch of pending orders with a few set-based statements: the demand of all their
+    items is added up per product and taken with one conditional UPDATE of products, then the
+    statuses change with one UPDATE of orders. Orders are shipped in the given order while the
+    stock not held by other pending orders lasts; the others are left as they are.
+    Returns ({order_id: buyer_id} shipped, {order_id: reason} not shipped, ids of the products
+    whose stock changed).
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    failed = {}
+    flash_taken = []
+    try:
+        orders = {order.id: order for order in db.session.execute(
+            select(Order.id, Order.buyer_id, Order.status)
+            .where(Order.id.in_(order_ids)).order_by(Order.id).with_for_update()
+        )}
+        pending = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                failed[order_id] = "Order not found"
+            elif order.status != "pending":
+                failed[order_id] = f"Cannot ship an order that is {order.status}"
+            else:
+                pending.append(order_id)
+
+        # Items of flash-sale products that took their stock when the order was placed are skipped
+        demand = defaultdict(Counter)
+        for order_id, product_id, quantity in db.session.execute(
+                select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+                .where(OrderItem.order_id.in_(pending), OrderItem.stock_taken.is_(False))):
+            demand[order_id][product_id] += quantity
+
+        # Locked in id order, like reserve() does, so concurrent orders wait instead of deadlocking
+        product_ids = sorted(set().union(*demand.values()))
+        products = {product.id: product for product in db.session.execute(
+            select(Product.id, Product.name, Product.stock, Product.flash_sale)
+            .where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+        )}
+        # Every active hold counts against the stock; an order's own hold is only given back
+        # when that order ships, so a failed order keeps what it holds
+        held, own_holds = Counter(), defaultdict(Counter)
+        pending_ids = set(pending)
+        for hold in active_holds(product_ids):
+            held[hold.product_id] += hold.quantity
+            if hold.order_id in pending_ids:
+                own_holds[hold.order_id][hold.product_id] += hold.quantity
+        left = {product.id: product.stock - held[product.id] for product in products.values()}
+
+        shipped, taken = {}, Counter()
+        for order_id in pending:
+            regular = {product_id: quantity for product_id, quantity in demand[order_id].items()
+                       if not products[product_id].flash_sale}
+            own = own_holds[order_id]
+            short = [product_id for product_id, quantity in sorted(regular.items())
+                     if left[product_id] + own[product_id] < quantity]
+            if short:
+                failed[order_id] = f"There is not enough stock of {products[short[0]].name} to complete the order"
+                continue
+
+            flash_items = [(product_id, quantity) for product_id, quantity in demand[order_id].items()
+                           if products[product_id].flash_sale]
+            if flash_items:
+                try:
+                    take_stock(flash_items)
+                except (BadRequestsError, ServiceUnavailable) as error:
+                    failed[order_id] = error.message
+                    continue
+                flash_taken.append((order_id, flash_items))
+
+            for product_id, quantity in regular.items():
+                left[product_id] -= quantity - own[product_id]
+                taken[product_id] += quantity
+            shipped[order_id] = orders[order_id].buyer_id
+
+        if taken:
+            # The guard only fails if the stock changed under the locks (databases without FOR UPDATE)
+            products_table = Product.__table__
+            first_seq = reserve_change_seqs(db.session.connection(), len(taken))
+            seqs = {product_id: first_seq + offset for offset, product_id in enumerate(sorted(taken))}
+            units = case(taken, value=products_table.c.id)
+            updated = db.session.execute(
+                update(products_table)
+                .where(products_table.c.id.in_(taken), products_table.c.stock >= units)
+                .values(stock=products_table.c.stock - units,
+                        change_seq=case(seqs, value=products_table.c.id),
+                        updated_at=func.now(), version=products_table.c.version + 1)
+                .returning(products_table.c.id)
+            ).scalars().all()
+            if len(updated) != len(taken):
+                raise Conflict("The stock of the products changed while shipping the orders, retry")
+
+        if shipped:
+            orders_table = Order.__table__
+            db.session.execute(
+                update(orders_table)
+                .where(orders_table.c.id.in_(shipped), orders_table.c.status == "pending")
+                .values(status="shipped", version=orders_table.c.version + 1)
+            )
+            db.session.execute(delete(StockReservation).where(StockReservation.order_id.in_(shipped)))
+        if flash_taken:
+            items_table = OrderItem.__table__
+            db.session.execute(
+                update(items_table)
+                .where(items_table.c.order_id.in_([order_id for order_id, _ in flash_taken]),
+                       items_table.c.product_id.in_([product_id for product_id in products
+                                                     if products[product_id].flash_sale]))
+                .values(stock_taken=True)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for _, flash_items in flash_taken:
+            release_stock(flash_items)
+        raise
+
+    # Shipped orders released their holds, so every product involved changed its available stock
+    changed = sorted({product_id for order_id in shipped for product_id in demand[order_id]})
+    invalidate_tags(*(f"order:{order_id}" for order_id in shipped),
+                    *(f"orders:buyer:{buyer_id}" for buyer_id in set(shipped.values())))
+    if changed:
+        invalidate_tags("products:list", *(f"product:{product_id}" for product_id in changed))
+    return shipped, failed, changed
@@ -0,0 +1,196 @@
+import re
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from sqlalchemy import event, text
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.schema import AddConstraint, CreateIndex
+from app.database import db
+from app.models import Order, OrderItem
+
+# Optional monthly range partitioning of orders (on created_at) and order_items (on the
+# order_created_at they carry) in PostgreSQL. "flask orders-partitions enable" converts the
+# tables once; the app works the same with or without partitions.
+PARTITION_KEYS = {"orders": "created_at", "order_items": "order_created_at"}
+MODELS = {"orders": Order, "order_items": OrderItem}
+PARTITION_NAME = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+@event.listens_for(db.session, "before_flush")
+def copy_order_dates(session, flush_context, instances):
+    """
+    Items added by order_id (not through Order.order_products, which copies it) get the
+    created_at of their order, their partition key.
+    """
+    for item in session.new:
+        if isinstance(item, OrderItem) and item.order_created_at is None and item.order is None:
+            order = session.get(Order, item.order_id)
+            if order is not None:
+                item.order_created_at = order.created_at
+
+
+def load_order_items(orders: list):
+    """
+    Load the items of "orders" in one query bounded by the dates of the orders, so PostgreSQL
+    only reads the partitions of those months (a selectinload matches (order_id, date) pairs,
+    which does not prune).
+    """
+    if not orders:
+        return
+    dates = [order.created_at for order in orders]
+    items = defaultdict(list)
+    for item in OrderItem.query.filter(OrderItem.order_id.in_([order.id for order in orders]),
+                                       OrderItem.order_created_at.between(min(dates), max(dates))):
+        items[item.order_id].append(item)
+    for order in orders:
+        set_committed_value(order, "order_products", items[order.id])
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _this_month() -> date:
+    return month_start(datetime.now(timezone.utc).date())
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                                   "WHERE partrelid = to_regclass('orders'))")).scalar()
+
+
+def partition_months(connection, table: str) -> list:
+    """
+    Months of the partitions attached to "table", oldest first.
+    """
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {"table": table}).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.search(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def _create_month(connection, month: date):
+    """
+    Create the partitions of "month", moving in the rows that fell into the DEFAULT
+    partitions meanwhile (PostgreSQL refuses a new range that the default one overlaps).
+    """
+    bounds = {"start": month, "end": add_months(month, 1)}
+    for table, key in PARTITION_KEYS.items():
+        connection.execute(text(f"CREATE TABLE {partition_name(table, month)} (LIKE {table} INCLUDING DEFAULTS)"))
+        connection.execute(text(
+            f"INSERT INTO {partition_name(table, month)} SELECT * FROM {default_partition_name(table)} "
+            f"WHERE {key} >= :start AND {key} < :end"
+        ), bounds)
+    # The items first: they reference the orders
+    for table, key in reversed(PARTITION_KEYS.items()):
+        connection.execute(text(f"DELETE FROM {default_partition_name(table)} WHERE {key} >= :start AND {key} < :end"),
+                           bounds)
+    for table in PARTITION_KEYS:
+        connection.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {partition_name(table, month)} "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        ))
+
+
+def create_partitions(connection, months_ahead: int = 3, since: date | None = None) -> list:
+    """
+    Create the missing monthly partitions of both tables from "since" (this month by default)
+    to "months_ahead" months after this one. Returns the months created.
+
+    Rows outside every monthly partition (the worker was down when a new month started) go
+    to the DEFAULT partition of each table, so inserts never fail; they are moved to their
+    month when its partition is created.
+    """
+    for table in PARTITION_KEYS:
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} "
+                                f"PARTITION OF {table} DEFAULT"))
+
+    month, last = month_start(since or _this_month()), add_months(_this_month(), months_ahead)
+    existing = set(partition_months(connection, "orders"))
+    created = []
+    while month <= last:
+        if month not in existing:
+            _create_month(connection, month)
+            created.append(month)
+        month = add_months(month, 1)
+    return created
+
+
+def enable(connection, months_ahead: int = 3) -> list:
+    """
+    Rebuild orders and order_items as monthly partitioned tables, copying their rows, in one
+    transaction that locks both tables (run it in a maintenance window). The primary keys
+    become (id, <partition key>), as PostgreSQL requires; indexes and foreign keys are the
+    ones of the models. A DEFAULT partition per table takes the rows of the months that have
+    no partition yet. Returns the months created.
+    """
+    connection.execute(text("LOCK TABLE orders, order_items IN ACCESS EXCLUSIVE MODE"))
+    for table in PARTITION_KEYS:
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned"))
+        connection.execute(text(f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) "
+                                f"PARTITION BY RANGE ({PARTITION_KEYS[table]})"))
+
+    first = connection.execute(text("SELECT MIN(created_at) FROM orders_unpartitioned")).scalar()
+    created = create_partitions(connection, months_ahead, since=first.date() if first else None)
+
+    for table in PARTITION_KEYS:
+        columns = ", ".join(column.name for column in MODELS[table].__table__.columns)
+        connection.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_unpartitioned"))
+        connection.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+    connection.execute(text("DROP TABLE order_items_unpartitioned"))
+    connection.execute(text("DROP TABLE orders_unpartitioned"))
+
+    for table, key in PARTITION_KEYS.items():
+        model_table = MODELS[table].__table__
+        connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {key})"))
+        for index in model_table.indexes:
+            connection.execute(CreateIndex(index))
+        for constraint in model_table.foreign_key_constraints:
+            connection.execute(AddConstraint(constraint))
+    return created
+
+
+def detach_partitions(connection, keep_months: int, archive_schema: str | None = None, drop: bool = False) -> list:
+    """
+    Detach the partitions of the months before the last "keep_months" (this one included).
+    The detached tables are moved to "archive_schema", dropped with drop=True, or left as
+    standalone tables. Returns the months detached.
+    """
+    cutoff = add_months(_this_month(), -(keep_months - 1))
+    months = [month for month in partition_months(connection, "orders") if month < cutoff]
+    if archive_schema:
+        connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+
+    for month in months:
+        items, orders = partition_name("order_items", month), partition_name("orders", month)
+        # The items first, and without their foreign key, so the orders partition is no longer referenced
+        connection.execute(text(f"ALTER TABLE order_items DETACH PARTITION {items}"))
+        connection.execute(text(f"ALTER TABLE {items} DROP CONSTRAINT IF EXISTS fk_order_items_order"))
+        connection.execute(text(f"ALTER TABLE orders DETACH PARTITION {orders}"))
+        for name in (items, orders):
+            if drop:
+                connection.execute(text(f"DROP TABLE {name}"))
+            elif archive_schema:
+                connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+    return months
@@ -0,0 +1,62 @@
+from flask import current_app, g, request
+from flask_limiter.util import get_remote_address
+from app.services.auth import decode_jwt_token, get_bearer_token
+from app.utils.exceptions import TokenExpired, TokenInvalid
+
+# Hits charged per request; endpoints not listed cost 1
+ENDPOINT_COSTS = {
+    "orders.get_all_orders": 10,
+    "orders.get_orders_buyer": 3,
+    "products.get_all_products": 5,
+    "users.get_all_users": 5,
+}
+
+
+def rate_limit_key() -> str:
+    """
+    Limit authenticated clients by user (JWT "sub") and anonymous ones by IP address.
+    """
+    token = get_bearer_token()
+    if token:
+        try:
+            return f"user:{decode_jwt_token(token)['sub']}"
+        except (TokenExpired, TokenInvalid, KeyError):
+            pass
+    return get_remote_address()
+
+
+def endpoint_cost() -> int:
+    return current_app.config["RATELIMIT_ENDPOINT_COSTS"].get(request.endpoint, 1)
+
+
+def charge_rows(rows: int):
+    """
+    Report how many rows a list endpoint returned, so bulk readers can be charged for them.
+    """
+    g.rate_limit_rows = rows
+
+
+class RateLimitCost:
+    @staticmethod
+    def init_app(app, limiter):
+        """
+        RATELIMIT_ENDPOINT_COSTS: hits charged per endpoint before the view runs.
+        RATELIMIT_ROWS_PER_HIT: when set, one extra hit is charged for every that many rows
+        a list endpoint returns (see charge_rows); None disables the dynamic cost.
+        """
+        app.config.setdefault("RATELIMIT_ENDPOINT_COSTS", ENDPOINT_COSTS)
+        app.config.setdefault("RATELIMIT_ROWS_PER_HIT", None)
+
+        @app.after_request
+        def charge_returned_rows(response):
+            rows = g.pop("rate_limit_rows", 0)
+            rows_per_hit = app.config["RATELIMIT_ROWS_PER_HIT"]
+            if not rows or not rows_per_hit or not limiter.enabled:
+                return response
+
+            extra_cost = rows // rows_per_hit
+            if extra_cost:
+                # Counted against the next requests: the current one has already been served
+                for limit in limiter.current_limits:
+                    limit.limiter.hit(limit.limit, *limit.request_args, cost=extra_cost)
+            return response
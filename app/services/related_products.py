@@ -0,0 +1,197 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, select
+from app.database import db
+from app.models import Order, OrderItem
+
+STATE_FILE = "co_occurrence.npz"
+PUBLISHED_FILE = "related_products.npz"
+# Orders younger than this are left for the next run: an order id can be committed after
+# a higher one, and the incremental run never looks back below the ids it processed
+SETTLE_MINUTES = 5
+
+
+def _incidence(order_ids, product_ids, size: int):
+    """
+    Orders x products matrix with a 1 where the order contains the product.
+    """
+    rows = np.unique(order_ids, return_inverse=True)[1]
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, product_ids)),
+                               shape=(rows.max() + 1 if len(rows) else 0, size))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1  # the same product twice in an order counts once
+    return matrix
+
+
+def count_co_occurrences(matrix, after_order_id: int = 0, chunk_orders: int = 50000,
+                         settle_minutes: float = SETTLE_MINUTES, report=None):
+    """
+    Add the pairs of products bought in the same order to "matrix" (products x products,
+    grown as needed), reading the order items after "after_order_id" in chunks of whole
+    orders. Returns (matrix, last_order_id, ids of the products whose counts changed).
+    """
+    last_order_id = after_order_id
+    touched = []
+    settled = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=settle_minutes)
+    max_order_id = db.session.execute(select(func.max(Order.id)).where(Order.created_at <= settled)).scalar() or 0
+    max_product_id = db.session.execute(select(func.max(OrderItem.product_id))).scalar() or 0
+    size = max(matrix.shape[0], max_product_id + 1)
+    matrix = matrix.tocsr()
+    matrix.resize((size, size))
+
+    while last_order_id < max_order_id:
+        chunk_end = last_order_id + chunk_orders
+        rows = db.session.execute(
+            select(OrderItem.order_id, OrderItem.product_id)
+            .where(OrderItem.order_id > last_order_id, OrderItem.order_id <= min(chunk_end, max_order_id))
+        ).all()
+        if rows:
+            order_ids, product_ids = np.array(rows, dtype=np.int64).T
+            incidence = _incidence(order_ids, product_ids, size)
+            matrix = matrix + (incidence.T @ incidence).astype(np.int32)
+            touched.append(np.unique(product_ids))
+            if report:
+                report(len(rows))
+        last_order_id = chunk_end
+
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    touched = np.unique(np.concatenate(touched)) if touched else np.array([], dtype=np.int64)
+    return matrix, max(after_order_id, min(last_order_id, max_order_id)), touched
+
+
+def top_k(matrix, k: int):
+    """
+    Keep the k strongest neighbours of every product, as a CSR matrix whose rows are sorted
+    by decreasing count (ties by product id).
+    """
+    coo = matrix.tocoo()
+    order = np.lexsort((coo.col, -coo.data, coo.row))
+    rows, cols, data = coo.row[order], coo.col[order], coo.data[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+    keep = rank < k
+
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows[keep], minlength=matrix.shape[0]))))
+    return sparse.csr_matrix((data[keep], cols[keep], indptr), shape=matrix.shape)
+
+
+def load_state(directory: str) -> tuple:
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return sparse.csr_matrix((0, 0), dtype=np.int32), 0
+    with np.load(path) as state:
+        matrix = sparse.csr_matrix((state["data"], state["indices"], state["indptr"]), shape=tuple(state["shape"]))
+        return matrix, int(state["last_order_id"])
+
+
+def _save_npz(path: str, **arrays):
+    # Write then rename, so readers never see a half-written file
+    temporary = f"{path}.tmp.npz"
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+
+
+def save_state(directory: str, matrix, last_order_id: int):
+    os.makedirs(directory, exist_ok=True)
+    _save_npz(os.path.join(directory, STATE_FILE), data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+              shape=np.array(matrix.shape), last_order_id=np.array(last_order_id))
+
+
+class RedisRelatedStore:
+    """
+    One string per product ("related:<id>") holding its neighbours as JSON [[id, count], ...].
+    """
+    def __init__(self, redis_connection):
+        self.redis = redis_connection
+
+    def get(self, product_id: int) -> list:
+        value = self.redis.get(f"related:{product_id}")
+        return json.loads(value) if value else []
+
+    def publish(self, related, products=None, batch_size: int = 1000):
+        """
+        Write the neighbours of "products" (every product when None).
+        """
+        pipeline = self.redis.pipeline(transaction=False)
+        for product_id in (range(related.shape[0]) if products is None else products.tolist()):
+            start, end = related.indptr[product_id], related.indptr[product_id + 1]
+            if start == end:
+                pipeline.delete(f"related:{product_id}")
+            else:
+                pipeline.set(f"related:{product_id}", json.dumps(
+                    list(zip(related.indices[start:end].tolist(), related.data[start:end].tolist()))))
+            if len(pipeline) >= batch_size:
+                pipeline.execute()
+        pipeline.execute()
+
+
+class FileRelatedStore:
+    """
+    The top-k CSR arrays in one .npz file, loaded by every worker and reloaded when the
+    job publishes a new version. For single-host deployments without Redis.
+    """
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, PUBLISHED_FILE)
+        self._loaded = (None, None)  # (mtime, csr matrix)
+        self._lock = threading.Lock()
+
+    def _matrix(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if self._loaded[0] != mtime:
+            with self._lock, np.load(self.path) as arrays:
+                matrix = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                                           shape=tuple(arrays["shape"]))
+                self._loaded = (mtime, matrix)
+        return self._loaded[1]
+
+    def get(self, product_id: int) -> list:
+        matrix = self._matrix()
+        if matrix is None or product_id >= matrix.shape[0]:
+            return []
+        start, end = matrix.indptr[product_id], matrix.indptr[product_id + 1]
+        return list(zip(matrix.indices[start:end].tolist(), matrix.data[start:end].tolist()))
+
+    def publish(self, related, products=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _save_npz(self.path, data=related.data, indices=related.indices, indptr=related.indptr,
+                  shape=np.array(related.shape))
+
+
+def build(store, directory: str, k: int = 20, chunk_orders: int = 50000, full: bool = False,
+          settle_minutes: float = SETTLE_MINUTES, report=None) -> dict:
+    """
+    Update the co-occurrence counts with the orders placed since the previous run (all of
+    them with full=True) and publish the top-k neighbours to "store". Incremental runs only
+    rewrite the products that appeared in the new orders.
+    """
+    matrix, previous = (sparse.csr_matrix((0, 0), dtype=np.int32), 0) if full else load_state(directory)
+    matrix, last_order_id, touched = count_co_occurrences(matrix, previous, chunk_orders, settle_minutes, report)
+    save_state(directory, matrix, last_order_id)
+
+    related = top_k(matrix, k)
+    store.publish(related, None if full else touched)
+    return {"orders_from": previous, "orders_to": last_order_id, "pairs": matrix.nnz,
+            "products_updated": related.shape[0] if full else len(touched)}
+
+
+class RelatedProducts:
+    @staticmethod
+    def init_app(app):
+        """
+        RELATED_PRODUCTS_STORE: "redis" or "file", where the offline job publishes the neighbours.
+        RELATED_PRODUCTS_DIR: job state (co-occurrence counts) and the published file.
+        """
+        app.config.setdefault("RELATED_PRODUCTS_STORE", "redis")
+        app.config.setdefault("RELATED_PRODUCTS_DIR", "data")
+
+        if app.config["RELATED_PRODUCTS_STORE"] == "file":
+            app.extensions["related_products"] = FileRelatedStore(app.config["RELATED_PRODUCTS_DIR"])
+        else:
+            app.extensions["related_products"] = RedisRelatedStore(app.extensions["redis"])
@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import delete, func, select
+from app.database import db
+from app.models import Product, StockReservation
+from app.services import flash_sale
+from app.utils.exceptions import BadRequestsError
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def held_quantities(product_ids=None, exclude_order_ids=None) -> dict:
+    """
+    {product_id: units held by active reservations} of "product_ids" (every product when
+    None), optionally leaving out the holds of some orders.
+    """
+    query = (select(StockReservation.product_id, func.sum(StockReservation.quantity))
+             .where(StockReservation.expires_at > _now())
+             .group_by(StockReservation.product_id))
+    if product_ids is not None:
+        query = query.where(StockReservation.product_id.in_(product_ids))
+    if exclude_order_ids:
+        query = query.where(StockReservation.order_id.not_in(exclude_order_ids))
+    return {product_id: int(units) for product_id, units in db.session.execute(query)}
+
+
+def active_holds(product_ids: list) -> list:
+    """
+    The reservations of "product_ids" that have not expired.
+    """
+    return StockReservation.query.filter(StockReservation.product_id.in_(product_ids),
+                                         StockReservation.expires_at > _now()).all()
+
+
+def available_quantities(products: list, all_products: bool = False) -> dict:
+    """
+    {product_id: units that can still be ordered}: the stock minus the active holds, or the
+    Redis counter for the products in flash-sale mode. all_products reads the holds of the
+    whole catalog in one query instead of filtering by id.
+    """
+    regular = [product for product in products if not product.flash_sale]
+    held = held_quantities(None if all_products else [product.id for product in regular]) if regular else {}
+    available = {product.id: product.stock - held.get(product.id, 0) for product in regular}
+
+    flash = [product for product in products if product.flash_sale]
+    if flash:
+        try:
+            counters = flash_sale.available_stock([product.id for product in flash])
+        except RedisError:
+            logging.error("Could not read the flash-sale stock, reporting the database stock", exc_info=True)
+            counters = {}
+        available.update({product.id: counters.get(product.id, product.stock) for product in flash})
+    return available
+
+
+def reserve(order, quantities: dict):
+    """
+    Hold {product_id: quantity} for a pending order until the reservation expires. The product
+    rows are locked (in id order) so two orders can not both take the last units; raises
+    BadRequestsError when a product does not have enough available stock.
+    """
+    if not quantities:
+        return
+    products = {product_id: (name, stock) for product_id, name, stock in db.session.execute(
+        select(Product.id, Product.name, Product.stock)
+        .where(Product.id.in_(quantities)).order_by(Product.id).with_for_update()
+    )}
+    held = held_quantities(list(quantities))
+    for product_id, quantity in sorted(quantities.items()):
+        name, stock = products[product_id]
+        if stock - held.get(product_id, 0) < quantity:
+            raise BadRequestsError(f"There is not enough stock of {name} to complete the order")
+
+    expires_at = _now() + timedelta(minutes=current_app.config["STOCK_RESERVATION_MINUTES"])
+    order.reservations.extend(StockReservation(product_id=product_id, quantity=quantity, expires_at=expires_at)
+                              for product_id, quantity in sorted(quantities.items()))
+
+
+def release(order):
+    """
+    Drop the holds of an order that shipped (the stock was taken) or was cancelled.
+    """
+    order.reservations.clear()
+
+
+def release_expired(batch_size: int = 1000) -> tuple:
+    """
+    Delete one batch of expired reservations. Returns (reservations deleted, ids of their products).
+    """
+    ids = select(StockReservation.id).where(StockReservation.expires_at <= _now()).limit(batch_size)
+    product_ids = db.session.execute(
+        delete(StockReservation).where(StockReservation.id.in_(ids.scalar_subquery()))
+        .returning(StockReservation.product_id)
+    ).scalars().all()
+    db.session.commit()
+    return len(product_ids), sorted(set(product_ids))
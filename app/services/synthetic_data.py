@@ -0,0 +1,150 @@
+import io
+import csv
+import random
+import itertools
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, text
+from app.database import db
+from app.models import User, Product, Order, OrderItem
+from app.services.auth import encrypt_password
+from app.services.change_feed import reserve_change_seqs
+
+ORDER_COLUMNS = ["id", "buyer_id", "total", "item_count", "status", "created_at"]
+# order_created_at: order_items carry the date of their order (their partition key)
+ITEM_COLUMNS = ["id", "order_id", "order_created_at", "product_id", "quantity", "price"]
+STATUSES = ["pending", "pending", "shipped", "shipped", "shipped", "delivered", "delivered", "delivered", "cancelled"]
+
+
+def zipf_weights(count: int, skew: float) -> list:
+    """
+    Cumulative weights where item k is chosen with probability proportional to 1 / k^skew,
+    so a few items (hot products, power buyers) get most of the picks.
+    """
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def _batched(rows, size: int):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _copy_rows(conn, table, columns: list, rows: list):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.close()
+
+
+def bulk_load(conn, model, columns: list, rows, batch_size: int, report=None) -> int:
+    """
+    Load the rows (tuples in "columns" order) with COPY on PostgreSQL or batched executemany elsewhere.
+    """
+    table = model.__table__
+    total = 0
+    for batch in _batched(rows, batch_size):
+        if conn.dialect.name == "postgresql":
+            _copy_rows(conn, table, columns, batch)
+        else:
+            conn.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+        total += len(batch)
+        if report:
+            report(table.name, len(batch))
+    return total
+
+
+def _next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _reset_sequences(conn):
+    for model in (User, Product, Order, OrderItem):
+        table = model.__tablename__
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                          f"COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+
+
+def generate(users: int, products: int, orders: int, seed: int = 42, skew: float = 1.1, days: int = 365,
+             max_items: int = 5, batch_size: int = 10000, report=None) -> dict:
+    """
+    Generate deterministic synthetic users, products, orders and order items.
+
+    The same seed on an empty database always produces the same rows. Product popularity
+    and buyer activity follow a Zipf distribution with exponent "skew".
+    """
+    rng = random.Random(seed)
+    password = encrypt_password("synthetic-password")  # bcrypt is far too slow to run per row
+    end = datetime(2025, 1, 1)
+    counts = {}
+
+    with db.engine.begin() as conn:
+        first_user = _next_id(conn, User)
+        first_product = _next_id(conn, Product)
+        first_order = _next_id(conn, Order)
+        first_item = _next_id(conn, OrderItem)
+
+        user_ids = range(first_user, first_user + users)
+        seller_ids = user_ids[::10] or user_ids
+        counts["users"] = bulk_load(conn, User, ["id", "name", "email", "password", "role", "created_at"], (
+            (user_id, f"User {user_id}", f"user{user_id}@synthetic.local", password,
+             "seller" if (user_id - first_user) % 10 == 0 else "buyer", end - timedelta(days=days))
+            for user_id in user_ids
+        ), batch_size, report)
+
+        product_ids = range(first_product, first_product + products)
+        prices = [rng.randint(1, 1000) for _ in product_ids]
+        # COPY bypasses the ORM, so the change feed positions are reserved here
+        first_seq = reserve_change_seqs(conn, products) if products else 0
+        counts["products"] = bulk_load(conn, Product, ["id", "seller_id", "name", "description", "price", "stock",
+                                                       "created_at", "updated_at", "change_seq"], (
+            (product_id, rng.choice(seller_ids), f"Product {product_id}", f"Synthetic product {product_id}",
+             price, rng.randint(0, 10000), end - timedelta(days=days), end - timedelta(days=days),
+             first_seq + product_id - first_product)
+            for product_id, price in zip(product_ids, prices)
+        ), batch_size, report)
+
+        product_weights = zipf_weights(products, skew)
+        buyer_weights = zipf_weights(users, skew)
+        # Shuffle which ids are hot so popularity is not correlated with the id
+        hot_products = list(range(products))
+        hot_buyers = list(user_ids)
+        rng.shuffle(hot_products)
+        rng.shuffle(hot_buyers)
+
+        order_rows = []
+        item_rows = []
+        item_id = first_item
+        for order_id in range(first_order, first_order + orders):
+            total = 0
+            picked = rng.choices(hot_products, cum_weights=product_weights, k=rng.randint(1, max_items))
+            items = []
+            for index in set(picked):
+                quantity = rng.randint(1, 3)
+                total += prices[index] * quantity
+                items.append((product_ids[index], quantity, prices[index]))
+            buyer_id = rng.choices(hot_buyers, cum_weights=buyer_weights)[0]
+            created_at = end - timedelta(seconds=rng.randint(0, days * 86400))
+            for product_id, quantity, price in items:
+                item_rows.append((item_id, order_id, created_at, product_id, quantity, price))
+                item_id += 1
+            item_count = sum(quantity for _, quantity, _ in items)
+            order_rows.append((order_id, buyer_id, total, item_count, rng.choice(STATUSES), created_at))
+
+            if len(order_rows) >= batch_size:
+                counts["orders"] = counts.get("orders", 0) + bulk_load(
+                    conn, Order, ORDER_COLUMNS, order_rows, batch_size, report)
+                counts["order_items"] = counts.get("order_items", 0) + bulk_load(
+                    conn, OrderItem, ITEM_COLUMNS, item_rows, batch_size, report)
+                order_rows, item_rows = [], []
+
+        counts["orders"] = counts.get("orders", 0) + bulk_load(
+            conn, Order, ORDER_COLUMNS, order_rows, batch_size, report)
+        counts["order_items"] = counts.get("order_items", 0) + bulk_load(
+            conn, OrderItem, ITEM_COLUMNS, item_rows, batch_size, report)
+
+        if conn.dialect.name == "postgresql":
+            _reset_sequences(conn)
+
+    return counts
@@ -0,0 +1,231 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, g, request, make_response
+from redis.exceptions import RedisError
+from app.services.rate_limit import charge_rows
+from app.utils.compression import ENCODERS, choose_encoding, set_encoded_etag
+
+# Per-request headers that must not be replayed from the cache
+_SKIPPED_HEADERS = {"Content-Length", "Content-Encoding", "Set-Cookie", "Vary"}
+
+
+class CacheEntry:
+    def __init__(self, status: int, headers: list, body: bytes, variants: dict | None = None,
+                 rows: int | None = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.variants = variants or {}  # encoding -> compressed body
+        self.rows = rows  # rows reported to charge_rows(), charged again on every hit
+
+
+class LocalCacheBackend:
+    """
+    In-process LRU. Invalidations only reach the current worker, so use it for a single
+    process (development, tests) and the Redis backend behind gunicorn.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, CacheEntry)
+        self._tags = {}  # tag -> keys
+        self._key_tags = {}  # key -> tags, to remove evicted keys from their tags
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str):
+        # Under the lock
+        self._entries.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, entry: CacheEntry, ttl: int, tags: list):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.time() + ttl, entry)
+            self._key_tags[key] = tuple(tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def set_variant(self, key: str, encoding: str, data: bytes):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                item[1].variants[encoding] = data
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+
+class RedisCacheBackend:
+    """
+    Entries are Redis hashes (status, headers, body, rows and one "body:<encoding>" field per
+    compressed variant); each tag is a set with the keys of the entries it covers.
+    """
+    TAG_TTL = 24 * 60 * 60
+
+    def __init__(self, redis_connection):
+        self.redis = redis_connection
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"cache:tag:{tag}"
+
+    def get(self, key: str) -> CacheEntry | None:
+        fields = self.redis.hgetall(key)
+        if not fields:
+            return None
+        variants = {name[5:].decode(): value for name, value in fields.items() if name.startswith(b"body:")}
+        rows = int(fields[b"rows"]) if b"rows" in fields else None
+        return CacheEntry(int(fields[b"status"]), json.loads(fields[b"headers"]), fields[b"body"], variants, rows)
+
+    def set(self, key: str, entry: CacheEntry, ttl: int, tags: list):
+        pipeline = self.redis.pipeline()
+        pipeline.delete(key)
+        mapping = {"status": entry.status, "headers": json.dumps(entry.headers), "body": entry.body}
+        if entry.rows is not None:
+            mapping["rows"] = entry.rows
+        pipeline.hset(key, mapping=mapping)
+        pipeline.expire(key, ttl)
+        for tag in tags:
+            pipeline.sadd(self._tag_key(tag), key)
+            pipeline.expire(self._tag_key(tag), max(ttl, self.TAG_TTL))
+        pipeline.execute()
+
+    def set_variant(self, key: str, encoding: str, data: bytes):
+        pipeline = self.redis.pipeline()
+        pipeline.hset(key, f"body:{encoding}", data)
+        pipeline.ttl(key)
+        _, ttl = pipeline.execute()
+        if ttl == -1:
+            # The entry expired in between: do not leave a body-only hash without TTL behind
+            self.redis.delete(key)
+
+    def invalidate(self, tags):
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        pipeline = self.redis.pipeline()
+        for tag_key in tag_keys:
+            pipeline.smembers(tag_key)
+        keys = set().union(*pipeline.execute())
+        self.redis.delete(*keys, *tag_keys)
+
+
+def _cache_key(query_params) -> str:
+    view_args = sorted((request.view_args or {}).items())
+    args = sorted((name, value) for name, value in request.args.items(multi=True) if name in query_params)
+    return f"cache:{request.endpoint}:{urlencode(view_args)}?{urlencode(args)}"
+
+
+def _response_from_entry(backend, key: str, entry: CacheEntry):
+    if entry.rows is not None:
+        charge_rows(entry.rows)
+    response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+    response.headers["X-Cache"] = "HIT"
+
+    # Compressed variants live next to the raw body, so a hot entry is compressed only once
+    encoding = choose_encoding(response, entry.body)
+    if encoding is not None:
+        data = entry.variants.get(encoding)
+        if data is None:
+            data = ENCODERS[encoding](entry.body)
+            backend.set_variant(key, encoding, data)
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        set_encoded_etag(response, encoding)
+    return response
+
+
+def cached(ttl: int = 60, tags=(), query_params=()):
+    """
+    Cache the successful responses of a view.
+
+    The key is made of the endpoint, the view arguments and the "query_params" the view
+    reads; other parameters are ignored, so random ones cannot be used to bypass the cache.
+    "tags" are formatted with the view arguments, e.g. "product:{id}", and invalidate_tags()
+    drops every entry carrying one of them. The rows reported with charge_rows() are stored
+    with the entry and charged again on hits.
+    Apply it below token_required so the token is still checked on cache hits.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            backend = current_app.extensions.get("response_cache")
+            if backend is None:
+                return f(*args, **kwargs)
+
+            key = _cache_key(query_params)
+            try:
+                entry = backend.get(key)
+                if entry is not None:
+                    return _response_from_entry(backend, key, entry)
+            except RedisError:
+                logging.warning("Response cache unavailable", exc_info=True)
+                return f(*args, **kwargs)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name not in _SKIPPED_HEADERS]
+                entry = CacheEntry(response.status_code, headers, response.get_data(),
+                                   rows=g.get("rate_limit_rows"))
+                try:
+                    backend.set(key, entry, ttl, [tag.format(**kwargs) for tag in tags])
+                except RedisError:
+                    logging.warning("Response cache unavailable", exc_info=True)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_tags(*tags):
+    """
+    Drop every cached response carrying one of the tags. Call it after the write is committed.
+    """
+    backend = current_app.extensions.get("response_cache")
+    if backend is None or not tags:
+        return
+    try:
+        backend.invalidate(tags)
+    except RedisError:
+        logging.error("Could not invalidate cached responses for %s", tags, exc_info=True)
+
+
+class ResponseCache:
+    @staticmethod
+    def init_app(app):
+        """
+        CACHE_BACKEND: "redis" (shared by all workers), "local" (in-process LRU) or None to disable.
+        """
+        app.config.setdefault("CACHE_BACKEND", "redis")
+        app.config.setdefault("CACHE_LOCAL_MAX_ENTRIES", 1024)
+
+        backend = app.config["CACHE_BACKEND"]
+        if backend == "redis":
+            app.extensions["response_cache"] = RedisCacheBackend(app.extensions["redis"])
+        elif backend == "local":
+            app.extensions["response_cache"] = LocalCacheBackend(app.config["CACHE_LOCAL_MAX_ENTRIES"])
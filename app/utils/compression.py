@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, request
+
+# brotli and zstandard are optional, gzip is always available
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+def _gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=5)
+
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Server preference order, used to break ties between encodings the client accepts equally
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+ENCODERS["gzip"] = _gzip
+
+
+def negotiate_encoding() -> str | None:
+    """
+    Pick the best encoding for the current request from its Accept-Encoding header.
+    """
+    return request.accept_encodings.best_match(list(ENCODERS))
+
+
+def choose_encoding(response, data: bytes) -> str | None:
+    """
+    Encoding to apply to this response body, or None when it should be sent as it is.
+    """
+    if (len(data) < current_app.config["COMPRESS_MIN_SIZE"]
+            or response.mimetype not in current_app.config["COMPRESS_MIMETYPES"]):
+        return None
+    return negotiate_encoding()
+
+
+def set_encoded_etag(response, encoding: str):
+    """
+    A strong ETag identifies the exact bytes sent, so the encoded body gets its own
+    ("3" becomes "3-gzip"). check_if_match() accepts both forms.
+    """
+    value, weak = response.get_etag()
+    if value is not None and not weak:
+        response.set_etag(f"{value}-{encoding}")
+
+
+class CompressedBodyCache:
+    """
+    LRU of compressed bodies keyed by the digest of the raw bytes and the encoding,
+    so a hot response is compressed once and then served from memory.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, data: bytes, encoding: str) -> bytes:
+        if self.max_entries <= 0:
+            return ENCODERS[encoding](data)
+
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                return compressed
+
+        compressed = ENCODERS[encoding](data)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+
+class Compression:
+    @staticmethod
+    def init_app(app):
+        """
+        Compress responses with the best encoding the client accepts (zstd, br or gzip).
+
+        COMPRESS_MIN_SIZE: smaller bodies are sent as they are.
+        COMPRESS_MIMETYPES: content types worth compressing.
+        COMPRESS_CACHE_SIZE: number of compressed bodies kept in memory per worker.
+        """
+        app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+        app.config.setdefault("COMPRESS_MIMETYPES", ["application/json", "text/plain", "text/html"])
+        app.config.setdefault("COMPRESS_CACHE_SIZE", 256)
+        body_cache = CompressedBodyCache(app.config["COMPRESS_CACHE_SIZE"])
+        app.extensions["compression"] = body_cache
+
+        @app.after_request
+        def compress_response(response):
+            if (response.mimetype not in app.config["COMPRESS_MIMETYPES"]
+                    or response.direct_passthrough or response.is_streamed):
+                return response
+
+            response.vary.add("Accept-Encoding")
+            if ("Content-Encoding" in response.headers or response.status_code < 200
+                    or response.status_code in (204, 304)):
+                return response
+
+            data = response.get_data()
+            encoding = choose_encoding(response, data)
+            if encoding is None:
+                return response
+
+            response.set_data(body_cache.get_or_compress(data, encoding))
+            response.headers["Content-Encoding"] = encoding
+            set_encoded_etag(response, encoding)
+            return response
@@ -1,8 +1,11 @@
 import logging
 from flask import jsonify
 from flask_limiter.errors import RateLimitExceeded
+from redis.exceptions import RedisError
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from app.utils.exceptions import *
+from app.utils.metrics import RATE_LIMIT_REJECTIONS, endpoint_label
 
 
 class ErrorHandler:
@@ -40,9 +43,34 @@ class ErrorHandler:
             logging.info("Resource not found", exc_info=True)
             return jsonify({"error": "Resource Not Found", "message": error.message}), 404
 
+        @app.errorhandler(Conflict)
+        def handle_conflict(error):
+            logging.info("Conflict", exc_info=True)
+            return jsonify({"error": "Conflict", "message": error.message}), 409
+
+        @app.errorhandler(StaleDataError)
+        def handle_stale_data(error):
+            # The version of the row changed between the read and the UPDATE (optimistic locking)
+            logging.info("Concurrent update", exc_info=True)
+            return jsonify({"error": "Conflict", "message": Conflict().message}), 409
+
+        @app.errorhandler(ServiceUnavailable)
+        def handle_service_unavailable(error):
+            logging.error("Service unavailable", exc_info=True)
+            return jsonify({"error": "Service Unavailable", "message": error.message}), 503
+
+        @app.errorhandler(RedisError)
+        def handle_redis_error(error):
+            logging.error("Redis error", exc_info=True)
+            return jsonify({
+                "error": "Service Unavailable",
+                "message": "The service is temporarily unavailable"
+            }), 503
+
         @app.errorhandler(RateLimitExceeded)
         def handle_rate_limit_exceeded(error):
             logging.warning("Too Many Requests", exc_info=True)
+            RATE_LIMIT_REJECTIONS.labels(endpoint=endpoint_label()).inc()
             return jsonify({
                 "error": "Too Many Requests",
                 "message": str(error)
@@ -26,3 +26,18 @@ class TokenInvalid(Exception):
     def __init__(self, message="The token is invalid"):
         self.message = message
         super().__init__(self.message)
+
+class NPlusOneQueryDetected(Exception):
+    def __init__(self, endpoint, statement, executions):
+        self.message = f"{endpoint} executed the same statement {executions} times: {statement}"
+        super().__init__(self.message)
+
+class ServiceUnavailable(Exception):
+    def __init__(self, message="The service is temporarily unavailable"):
+        self.message = message
+        super().__init__(self.message)
+
+class Conflict(Exception):
+    def __init__(self, message="The resource was modified by another request, read it again and retry"):
+        self.message = message
+        super().__init__(self.message)
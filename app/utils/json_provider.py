@@ -0,0 +1,115 @@
+import dataclasses
+import decimal
+import enum
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, the stdlib provider is used instead
+    orjson = None
+
+
+def _default(o):
+    """
+    Types orjson does not serialize natively (and their stdlib equivalent).
+    """
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _rfc822_default(o):
+    # Flask's format ("Mon, 24 Mar 2025 14:30:00 GMT"), for orjson with OPT_PASSTHROUGH_DATETIME
+    if isinstance(o, (datetime, date)):
+        return http_date(o)
+    return _default(o)
+
+
+def _iso_default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return _default(o)
+
+
+def _stdlib_default(o, datetime_default=_rfc822_default):
+    if isinstance(o, (datetime, date)):
+        return datetime_default(o)
+    if isinstance(o, enum.Enum):
+        return o.value
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    return _default(o)
+
+
+def iso_datetimes(app) -> bool:
+    """
+    JSON_DATETIME_FORMAT: "rfc822" (Flask's default, what existing clients parse) or "iso8601".
+    """
+    return app.config.get("JSON_DATETIME_FORMAT", "rfc822") == "iso8601"
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    Fallback provider. Serializes datetimes and Enums exactly like OrjsonProvider, so the
+    output does not depend on which provider is installed.
+    """
+    default = staticmethod(_stdlib_default)
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if iso_datetimes(self._app):
+            kwargs.setdefault("default", lambda o: _stdlib_default(o, _iso_default))
+        return super().dumps(obj, **kwargs)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson, which serializes Enum, UUID and dataclasses natively, and
+    datetimes too when JSON_DATETIME_FORMAT is "iso8601".
+    """
+    mimetype = "application/json"
+
+    def _options(self, option: int):
+        if iso_datetimes(self._app):
+            return _iso_default, option
+        return _rfc822_default, option | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs) -> str:
+        default, option = self._options(orjson.OPT_NON_STR_KEYS)
+        return orjson.dumps(obj, default=default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        default, option = self._options(orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        # Bytes go straight into the response, no intermediate str
+        return self._app.response_class(orjson.dumps(obj, default=default, option=option),
+                                        mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {
+    "orjson": OrjsonProvider,
+    "stdlib": StdlibJSONProvider
+}
+
+
+def get_json_provider_class(name: str | None = None) -> type[JSONProvider]:
+    """
+    Return the provider registered as "name", or the fastest one available.
+    """
+    if name is None:
+        name = "orjson" if orjson is not None else "stdlib"
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but the orjson package is not installed")
+    return JSON_PROVIDERS[name]
@@ -0,0 +1,129 @@
+import os
+import time
+import redis
+from flask import g, request
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST,
+                               generate_latest, multiprocess)
+from app.database import db
+from app.utils.query_tracker import get_query_stats
+
+# Metrics are module level so they are registered once per process, no matter how many apps are created
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Total HTTP requests",
+    ["method", "endpoint", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds",
+    ["method", "endpoint"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method", "endpoint"],
+    multiprocess_mode="livesum"
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements executed by a request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_query_duration_seconds_per_request",
+    "Total time spent executing SQL statements by a request",
+    ["endpoint"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "SQLAlchemy connection pool usage",
+    ["state"],
+    multiprocess_mode="livesum"
+)
+REDIS_COMMAND_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command latency in seconds",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by the rate limiter",
+    ["endpoint"]
+)
+
+
+def endpoint_label() -> str:
+    return request.endpoint or "unmatched"
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Redis client that records the latency of every command it executes.
+    """
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_LATENCY.labels(command=str(args[0]).upper()).observe(time.perf_counter() - start)
+
+
+def update_pool_stats(engine):
+    pool = engine.pool
+    # Only QueuePool exposes these counters (SQLite uses a static/singleton pool)
+    for state, getter in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow")):
+        if hasattr(pool, getter):
+            DB_POOL_CONNECTIONS.labels(state=state).set(getattr(pool, getter)())
+
+
+def generate_metrics() -> tuple:
+    """
+    Render the metrics in the Prometheus text format. When PROMETHEUS_MULTIPROC_DIR is set
+    (gunicorn with several workers), the values of every worker are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class Metrics:
+    @staticmethod
+    def init_app(app):
+        """
+        Record per-endpoint request count, latency, in-flight requests and DB usage.
+        """
+        @app.before_request
+        def start_request_metrics():
+            g.metrics_start_time = time.perf_counter()
+            g.metrics_endpoint = endpoint_label()
+            REQUESTS_IN_PROGRESS.labels(method=request.method, endpoint=g.metrics_endpoint).inc()
+
+        @app.after_request
+        def record_request_metrics(response):
+            if "metrics_start_time" not in g:
+                return response
+
+            endpoint = g.metrics_endpoint
+            REQUEST_LATENCY.labels(method=request.method, endpoint=endpoint).observe(
+                time.perf_counter() - g.metrics_start_time)
+            REQUEST_COUNT.labels(method=request.method, endpoint=endpoint, status=response.status_code).inc()
+
+            stats = get_query_stats()
+            DB_QUERIES_PER_REQUEST.labels(endpoint=endpoint).observe(stats.count)
+            DB_TIME_PER_REQUEST.labels(endpoint=endpoint).observe(stats.total_time)
+            return response
+
+        @app.teardown_request
+        def finish_request_metrics(exception=None):
+            if g.pop("metrics_start_time", None) is None:
+                return
+
+            REQUESTS_IN_PROGRESS.labels(method=request.method, endpoint=g.metrics_endpoint).dec()
+            update_pool_stats(db.engine)
@@ -0,0 +1,135 @@
+import os
+import sys
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from flask import g, request, Response
+from app.services.auth import is_admin_request
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread at a fixed interval from a background thread.
+    The result is exported in the collapsed-stack format used by flamegraph.pl and speedscope.
+    """
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":"))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def _route_logger(profile_dir: str, endpoint: str, max_bytes: int) -> logging.Logger:
+    # One rotating file per route and worker process: gunicorn workers rotating the same file
+    # would rename it under each other. Appended collapsed stacks stay valid flamegraph input,
+    # so the per-worker files can simply be concatenated
+    logger = logging.getLogger(f"profiler.{endpoint}")
+    if not logger.handlers:
+        handler = RotatingFileHandler(os.path.join(profile_dir, f"{endpoint}.{os.getpid()}.collapsed"),
+                                      maxBytes=max_bytes, backupCount=3)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class RequestProfiler:
+    @staticmethod
+    def init_app(app):
+        """
+        Profile single requests on demand and, optionally, a random sample of all requests.
+
+        An admin can profile one request by sending the "X-Profile" header or the "_profile"
+        query parameter: "return" replaces the response with the collapsed stacks, any other
+        value stores them in PROFILE_DIR and returns the file name in "X-Profile-File".
+        With PROFILE_SAMPLE_RATE > 0 that fraction of requests is appended to a rotating
+        "<endpoint>.<pid>.collapsed" file per route and worker.
+        """
+        app.config.setdefault("PROFILE_DIR", os.path.join("logs", "profiles"))
+        app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+        app.config.setdefault("PROFILE_INTERVAL", 0.005)
+        app.config.setdefault("PROFILE_MAX_BYTES", 5 * 1024 * 1024)
+
+        @app.before_request
+        def start_profiler():
+            mode = request.headers.get("X-Profile") or request.args.get("_profile")
+            if mode:
+                if not is_admin_request():
+                    logging.warning("Profiling requested without admin credentials")
+                    mode = None
+            elif random.random() < app.config["PROFILE_SAMPLE_RATE"]:
+                mode = "sample"
+
+            if not mode:
+                return
+
+            g.profiler_mode = mode
+            g.profiler = SamplingProfiler(threading.get_ident(), app.config["PROFILE_INTERVAL"])
+            g.profiler.start()
+
+        @app.after_request
+        def finish_profiler(response):
+            profiler = g.pop("profiler", None)
+            if profiler is None:
+                return response
+
+            profiler.stop()
+            mode = g.pop("profiler_mode")
+            endpoint = request.endpoint or "unmatched"
+            profile_dir = app.config["PROFILE_DIR"]
+            os.makedirs(profile_dir, exist_ok=True)
+
+            if mode == "sample":
+                if profiler.stacks:
+                    _route_logger(profile_dir, endpoint, app.config["PROFILE_MAX_BYTES"]).info(
+                        profiler.collapsed().rstrip("\n"))
+                return response
+
+            if mode == "return":
+                return Response(profiler.collapsed(), mimetype="text/plain")
+
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            filename = f"{endpoint}-{timestamp}.collapsed"
+            with open(os.path.join(profile_dir, filename), "w") as profile_file:
+                profile_file.write(profiler.collapsed())
+            response.headers["X-Profile-File"] = filename
+            return response
+
+        @app.teardown_request
+        def stop_profiler(exception=None):
+            # The profiler is still running when the request failed before after_request
+            profiler = g.pop("profiler", None)
+            if profiler is not None:
+                profiler.stop()
@@ -0,0 +1,98 @@
+import re
+import time
+import logging
+from collections import Counter
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from app.database import db
+from app.utils.exceptions import NPlusOneQueryDetected
+
+# "IN (?, ?, ?)" and "IN (%(id_1)s, %(id_2)s)" must count as the same statement shape
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|%s))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+
+def statement_shape(statement: str) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _PLACEHOLDER_LIST.sub("(?)", statement)
+
+
+def get_query_stats() -> QueryStats:
+    """
+    Return the SQL statistics collected for the current request (or app context).
+    """
+    if "query_stats" not in g:
+        g.query_stats = QueryStats()
+    return g.query_stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    if not has_app_context():
+        return
+
+    stats = get_query_stats()
+    stats.count += 1
+    stats.total_time += elapsed
+    stats.shapes[statement_shape(statement)] += 1
+
+
+class QueryTracker:
+    @staticmethod
+    def init_app(app):
+        """
+        Count the SQL statements executed by each request and the time spent on them,
+        expose the totals in the Server-Timing header and detect N+1 query patterns.
+
+        SQL_N_PLUS_ONE_THRESHOLD: how many times a request may run the same statement shape.
+        SQL_N_PLUS_ONE_RAISE: raise NPlusOneQueryDetected instead of logging a warning (tests).
+        """
+        app.config.setdefault("SQL_N_PLUS_ONE_THRESHOLD", 10)
+        app.config.setdefault("SQL_N_PLUS_ONE_RAISE", False)
+
+        with app.app_context():
+            engine = db.engine
+
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+        @app.before_request
+        def reset_query_stats():
+            g.query_stats = QueryStats()
+
+        @app.after_request
+        def report_query_stats(response):
+            stats = get_query_stats()
+            response.headers.add(
+                "Server-Timing",
+                f'db;desc="{stats.count} queries";dur={stats.total_time * 1000:.2f}'
+            )
+
+            threshold = app.config["SQL_N_PLUS_ONE_THRESHOLD"]
+            repeated = {shape: count for shape, count in stats.shapes.items() if count > threshold}
+            if not repeated:
+                return response
+
+            shape, count = max(repeated.items(), key=lambda item: item[1])
+            logging.warning("N+1 query detected in %s: %d executions of %s", request.endpoint, count, shape, extra={
+                "endpoint": request.endpoint,
+                "path": request.path,
+                "statement": shape,
+                "executions": count,
+                "threshold": threshold
+            })
+            if app.config["SQL_N_PLUS_ONE_RAISE"]:
+                raise NPlusOneQueryDetected(request.endpoint, shape, count)
+            return response
@@ -0,0 +1,136 @@
+import time
+import logging
+import threading
+from limits.storage import Storage
+from redis.exceptions import RedisError
+from app.utils.metrics import InstrumentedRedis
+
+
+class _Window:
+    __slots__ = ("expires_at", "synced", "pending", "last_sync")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.synced = 0     # global count returned by Redis at the last sync
+        self.pending = 0    # local hits not yet pushed to Redis
+        self.last_sync = 0.0
+
+
+class HybridRedisStorage(Storage):
+    """
+    Fixed-window rate limit storage with a local tier in front of Redis.
+
+    Each worker counts hits in memory and pushes them to Redis in batches (every
+    "sync_batch" hits or "sync_interval" seconds per key), so most requests never
+    leave the process. The global count is therefore approximate: it can overshoot
+    the limit by at most workers * sync_batch hits per window. If Redis is down the
+    storage keeps limiting with the local counts and retries after "retry_after" seconds.
+
+    Used with a "hybrid+redis://host:port/db" storage uri.
+    """
+    STORAGE_SCHEME = ["hybrid+redis", "hybrid+rediss"]
+    PREFIX = "LIMITS"
+    MAX_LOCAL_KEYS = 10000
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, sync_interval: float = 1.0,
+                 sync_batch: int = 10, retry_after: float = 5.0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        options.setdefault("socket_timeout", 0.25)
+        options.setdefault("socket_connect_timeout", 0.25)
+        self.sync_interval = float(sync_interval)
+        self.sync_batch = int(sync_batch)
+        self.retry_after = float(retry_after)
+        self._redis = InstrumentedRedis.from_url(uri.removeprefix("hybrid+"), **options)
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+    @property
+    def base_exceptions(self):
+        return RedisError
+
+    def _prefixed(self, key: str) -> str:
+        return f"{self.PREFIX}:{key}"
+
+    def _window(self, key: str, expiry: int, now: float) -> _Window:
+        window = self._windows.get(key)
+        if window is None or window.expires_at <= now:
+            if len(self._windows) >= self.MAX_LOCAL_KEYS:
+                self._windows = {k: w for k, w in self._windows.items() if w.expires_at > now}
+            window = self._windows[key] = _Window(now + expiry)
+        return window
+
+    def _sync(self, key: str, window: _Window, expiry: int, elastic_expiry: bool, now: float):
+        if now < self._retry_at:
+            return
+
+        with self._lock:
+            pending, window.pending = window.pending, 0
+
+        try:
+            pipeline = self._redis.pipeline()
+            pipeline.incrby(self._prefixed(key), pending)
+            if elastic_expiry:
+                pipeline.expire(self._prefixed(key), expiry)
+            else:
+                pipeline.expire(self._prefixed(key), expiry, nx=True)
+            pipeline.ttl(self._prefixed(key))
+            count, _, ttl = pipeline.execute()
+        except RedisError:
+            logging.warning("Rate limit storage unavailable, limiting with local counts only", exc_info=True)
+            self._retry_at = now + self.retry_after
+            with self._lock:
+                window.pending += pending
+                window.last_sync = now
+            return
+
+        with self._lock:
+            window.synced = count
+            window.last_sync = now
+            if ttl > 0:
+                window.expires_at = now + ttl
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            window = self._window(key, expiry, now)
+            window.pending += amount
+            if elastic_expiry:
+                window.expires_at = now + expiry
+            # A new window syncs right away to learn what the other workers already used
+            due = window.pending >= self.sync_batch or now - window.last_sync >= self.sync_interval
+
+        if due:
+            self._sync(key, window, expiry, elastic_expiry, now)
+        return window.synced + window.pending
+
+    def get(self, key: str) -> int:
+        window = self._windows.get(key)
+        if window is None or window.expires_at <= time.time():
+            return 0
+        return window.synced + window.pending
+
+    def get_expiry(self, key: str) -> float:
+        window = self._windows.get(key)
+        if window is None:
+            return time.time()
+        return window.expires_at
+
+    def check(self) -> bool:
+        try:
+            return bool(self._redis.ping())
+        except RedisError:
+            return False
+
+    def reset(self) -> int | None:
+        with self._lock:
+            self._windows.clear()
+        keys = list(self._redis.scan_iter(match=self._prefixed("*")))
+        if keys:
+            self._redis.delete(*keys)
+        return len(keys)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._windows.pop(key, None)
+        self._redis.delete(self._prefixed(key))
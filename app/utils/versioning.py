@@ -0,0 +1,31 @@
+from flask import request
+from app.utils.compression import ENCODERS
+from app.utils.exceptions import Conflict
+
+# Products, orders and users have a version column that SQLAlchemy checks and increments on
+# every UPDATE ("UPDATE ... WHERE id = ? AND version = ?"), so two read-modify-writes of the
+# same row can no longer overwrite each other: the second one fails with StaleDataError (409).
+# The version is exposed as the ETag of the resource; clients send it back in If-Match to
+# also detect the changes made between their GET and their PATCH. Compressed responses carry
+# the encoding in the ETag ("3-gzip", see app.utils.compression), which matches too.
+
+
+def etag(instance) -> str:
+    return f'"{instance.version}"'
+
+
+def version_headers(instance) -> dict:
+    return {"ETag": etag(instance)}
+
+
+def check_if_match(instance):
+    """
+    Raise Conflict when the request has an If-Match header that does not match the current
+    version of "instance" (it was changed after the client read it). Requests without the
+    header are still protected against concurrent writes by the version check at commit.
+    """
+    if_match = request.if_match
+    version = str(instance.version)
+    if if_match and not any(if_match.contains(tag)
+                            for tag in (version, *(f"{version}-{encoding}" for encoding in ENCODERS))):
+        raise Conflict(f"The resource was modified (current ETag {etag(instance)}), read it again and retry")
@@ -0,0 +1,56 @@
+"""
+Compare the encode time of the JSON providers on a list of 10k order-like rows.
+
+    python -m benchmarks.json_encode [--rows 10000] [--repeat 20]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import Flask
+from app.models import RoleEnum
+from app.utils.json_provider import JSON_PROVIDERS
+
+
+def build_rows(count: int) -> list:
+    created_at = datetime(2025, 1, 1)
+    return [
+        {
+            "order_id": i,
+            "buyer_id": i % 500,
+            "role": RoleEnum.buyer,
+            "total": Decimal("125.85") + i,
+            "status": "pending",
+            "created_at": created_at + timedelta(minutes=i),
+            "order_products": [
+                {"product_id": i % 97, "quantity": 2, "price": 10.5},
+                {"product_id": i % 89, "quantity": 1, "price": 99.99}
+            ]
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rows = build_rows(args.rows)
+    results = {}
+    with app.app_context():
+        for name, provider_class in JSON_PROVIDERS.items():
+            provider = provider_class(app)
+            timings = timeit.repeat(lambda: provider.response(rows), number=1, repeat=args.repeat)
+            results[name] = {"best_ms": round(min(timings) * 1000, 3),
+                             "mean_ms": round(sum(timings) / len(timings) * 1000, 3)}
+
+    results["speedup"] = round(results["stdlib"]["best_ms"] / results["orjson"]["best_ms"], 2)
+    print(json.dumps({"rows": args.rows, "repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import shutil
+from prometheus_client import multiprocess
+
+bind = "0.0.0.0:8000"
+workers = 4
+
+
+def on_starting(server):
+    # Metrics from a previous run must not be aggregated with the new workers
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
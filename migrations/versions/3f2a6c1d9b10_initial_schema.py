@@ -0,0 +1,77 @@
+"""initial schema
+
+Revision ID: 3f2a6c1d9b10
+Revises: 
+Create Date: 2025-04-07 10:12:31.482011
+
+Databases initialized from ecommerce_respaldo.sql or by db.create_all() already have
+these tables: only the missing ones are created, so both can simply run "flask db upgrade".
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a6c1d9b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table('users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('email', sa.String(length=100), nullable=False),
+            sa.Column('password', sa.String(length=255), nullable=False),
+            sa.Column('role', sa.Enum('buyer', 'seller', 'admin', name='roleenum'), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('id')
+        )
+    if 'products' not in existing:
+        op.create_table('products',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('seller_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.String(), nullable=False),
+            sa.Column('price', sa.Integer(), nullable=False),
+            sa.Column('stock', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['seller_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'orders' not in existing:
+        op.create_table('orders',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('buyer_id', sa.Integer(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['buyer_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'order_items' not in existing:
+        op.create_table('order_items',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('order_id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('order_items')
+    op.drop_table('orders')
+    op.drop_table('products')
+    op.drop_table('users')
+    sa.Enum(name='roleenum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,47 @@
+"""add foreign-key and query indexes
+
+Revision ID: 8c41e07a5d23
+Revises: 3f2a6c1d9b10
+Create Date: 2025-04-07 10:40:05.913377
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, which does not block
+writes but cannot run inside a transaction. If a concurrent build fails it leaves an
+INVALID index behind: drop it and run the upgrade again.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e07a5d23'
+down_revision = '3f2a6c1d9b10'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_orders_buyer_id', 'orders', ['buyer_id']),
+    ('ix_orders_status_created_at', 'orders', ['status', 'created_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+    ('ix_products_seller_id', 'products', ['seller_id']),
+]
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, _ in INDEXES:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True)
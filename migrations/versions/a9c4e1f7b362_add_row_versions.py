@@ -0,0 +1,33 @@
+"""add row versions to products, orders and users
+
+Revision ID: a9c4e1f7b362
+Revises: f83b5d0e7c61
+Create Date: 2025-05-12 10:12:47.306115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e1f7b362'
+down_revision = 'f83b5d0e7c61'
+branch_labels = None
+depends_on = None
+
+TABLES = ('users', 'products', 'orders')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table in TABLES:
+        if 'version' not in {column['name'] for column in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
@@ -0,0 +1,45 @@
+"""add flash sale mode
+
+Revision ID: b7d3e2f14a90
+Revises: 5e9b1c7a2d44
+Create Date: 2025-04-17 16:02:11.583920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e2f14a90'
+down_revision = '5e9b1c7a2d44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+
+    if 'flash_sale' not in {column['name'] for column in inspector.get_columns('products')}:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.add_column(sa.Column('flash_sale', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    if 'stock_taken' not in {column['name'] for column in inspector.get_columns('order_items')}:
+        with op.batch_alter_table('order_items') as batch_op:
+            batch_op.add_column(sa.Column('stock_taken', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    if 'flash_sale_flushes' not in existing:
+        op.create_table('flash_sale_flushes',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('batch_id', sa.String(length=36), nullable=False),
+            sa.Column('applied_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('flash_sale_flushes')
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.drop_column('stock_taken')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('flash_sale')
@@ -0,0 +1,74 @@
+"""add item_count to orders and the buyer summary index
+
+Revision ID: c25e8d4b7f19
+Revises: a9c4e1f7b362
+Create Date: 2025-05-14 09:41:03.772514
+
+On PostgreSQL item_count is backfilled in batches of orders committed one by one and the
+indexes are built and dropped with CONCURRENTLY, so writes to orders are not blocked. If a
+concurrent build fails it leaves an INVALID index behind: drop it and run the upgrade again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c25e8d4b7f19'
+down_revision = 'a9c4e1f7b362'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 10000
+
+
+def _backfill_item_count():
+    bind = op.get_bind()
+    first, last = bind.execute(sa.text("SELECT MIN(id), MAX(id) FROM orders")).one()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        bind.execute(sa.text(
+            "UPDATE orders SET item_count = (SELECT COALESCE(SUM(quantity), 0) FROM order_items "
+            "WHERE order_items.order_id = orders.id) WHERE id >= :start AND id < :end"
+        ), {"start": start, "end": start + BATCH_SIZE})
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    postgresql = op.get_context().dialect.name == 'postgresql'
+
+    added = 'item_count' not in {column['name'] for column in inspector.get_columns('orders')}
+    if added:
+        with op.batch_alter_table('orders') as batch_op:
+            batch_op.add_column(sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+
+    # The new index starts with buyer_id, so it replaces the single-column one
+    if postgresql:
+        with op.get_context().autocommit_block():
+            if added:
+                _backfill_item_count()
+            op.create_index('ix_orders_buyer_id_created_at', 'orders', ['buyer_id', 'created_at'],
+                            postgresql_include=['status', 'total', 'item_count'],
+                            postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index('ix_orders_buyer_id', table_name='orders', postgresql_concurrently=True, if_exists=True)
+    else:
+        if added:
+            _backfill_item_count()
+        op.create_index('ix_orders_buyer_id_created_at', 'orders', ['buyer_id', 'created_at'], if_not_exists=True)
+        op.drop_index('ix_orders_buyer_id', table_name='orders', if_exists=True)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_orders_buyer_id', 'orders', ['buyer_id'], postgresql_concurrently=True,
+                            if_not_exists=True)
+            op.drop_index('ix_orders_buyer_id_created_at', table_name='orders', postgresql_concurrently=True,
+                          if_exists=True)
+    else:
+        op.create_index('ix_orders_buyer_id', 'orders', ['buyer_id'], if_not_exists=True)
+        op.drop_index('ix_orders_buyer_id_created_at', table_name='orders', if_exists=True)
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('item_count')
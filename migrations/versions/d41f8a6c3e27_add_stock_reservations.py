@@ -0,0 +1,45 @@
+"""add stock reservations
+
+Revision ID: d41f8a6c3e27
+Revises: b7d3e2f14a90
+Create Date: 2025-04-22 11:47:05.318264
+
+Orders placed before this revision hold no stock: they are checked against the stock
+when they ship, as before.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f8a6c3e27'
+down_revision = 'b7d3e2f14a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'stock_reservations' in inspector.get_table_names():
+        return
+
+    op.create_table('stock_reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_reservations') as batch_op:
+        batch_op.create_index('ix_stock_reservations_order_id', ['order_id'])
+        batch_op.create_index('ix_stock_reservations_expires_at', ['expires_at'])
+        batch_op.create_index('ix_stock_reservations_product_id_expires_at', ['product_id', 'expires_at'],
+                              postgresql_include=['quantity'])
+
+
+def downgrade():
+    op.drop_table('stock_reservations')
@@ -0,0 +1,48 @@
+"""add sales rollups
+
+Revision ID: e6a2c9d8b153
+Revises: d41f8a6c3e27
+Create Date: 2025-04-28 10:05:32.740116
+
+The tables start empty: run "flask refresh-sales-rollups --from <first day>" once to build
+the history.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2c9d8b153'
+down_revision = 'd41f8a6c3e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'sales_daily' not in existing:
+        op.create_table('sales_daily',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('orders', sa.Integer(), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('day')
+        )
+
+    if 'sales_daily_products' not in existing:
+        op.create_table('sales_daily_products',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('seller_id', sa.Integer(), nullable=False),
+            sa.Column('orders', sa.Integer(), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('day', 'product_id')
+        )
+
+
+def downgrade():
+    op.drop_table('sales_daily_products')
+    op.drop_table('sales_daily')
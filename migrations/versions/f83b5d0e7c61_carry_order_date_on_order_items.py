@@ -0,0 +1,142 @@
+"""carry the order date on order items
+
+Revision ID: f83b5d0e7c61
+Revises: e6a2c9d8b153
+Create Date: 2025-05-05 15:12:48.906337
+
+order_items gets the created_at of its order and references the order by (id, created_at),
+which is what "flask orders-partitions enable" needs to partition both tables by month.
+stock_reservations stops referencing orders: a partitioned table can only be referenced by
+its full primary key.
+
+On PostgreSQL the dates are copied in batches of items committed one by one, the unique
+index is built CONCURRENTLY and then attached as the constraint, and the NOT NULLs and the
+foreign key are checked by validating NOT VALID constraints, so writes are only blocked
+for the catalog changes. If the concurrent build fails it leaves an INVALID index behind:
+drop it and run the upgrade again.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f83b5d0e7c61'
+down_revision = 'e6a2c9d8b153'
+branch_labels = None
+depends_on = None
+
+# SQLite does not name foreign keys: batch mode names them with this convention
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _order_fk(inspector, table: str, columns: list) -> str | None:
+    for foreign_key in inspector.get_foreign_keys(table):
+        if foreign_key['referred_table'] == 'orders' and foreign_key['constrained_columns'] == columns:
+            return foreign_key['name'] or f"fk_{table}_{columns[0]}_orders"
+    return None
+
+
+BATCH_SIZE = 10000
+
+
+def _backfill_order_created_at():
+    bind = op.get_bind()
+    first, last = bind.execute(sa.text("SELECT MIN(id), MAX(id) FROM order_items")).one()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        bind.execute(sa.text(
+            "UPDATE order_items SET order_created_at = orders.created_at FROM orders "
+            "WHERE orders.id = order_items.order_id AND order_items.order_created_at IS NULL "
+            "AND order_items.id >= :start AND order_items.id < :end"
+        ), {"start": start, "end": start + BATCH_SIZE})
+
+
+def _set_not_null(table: str, column: str):
+    # SET NOT NULL skips its scan (under an exclusive lock) when a valid CHECK proves it
+    check = f"ck_{table}_{column}_not_null"
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID")
+    op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {check}")
+
+
+def _upgrade_postgresql(inspector):
+    columns = {column['name'] for column in inspector.get_columns('order_items')}
+    if 'order_created_at' not in columns:
+        op.add_column('order_items', sa.Column('order_created_at', sa.DateTime(), nullable=True))
+    unique = {constraint['name'] for constraint in inspector.get_unique_constraints('orders')}
+    foreign_keys = {foreign_key['name'] for foreign_key in inspector.get_foreign_keys('order_items')}
+
+    # Every statement commits on its own
+    with op.get_context().autocommit_block():
+        op.execute("UPDATE orders SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+        _set_not_null('orders', 'created_at')
+        if 'uq_orders_id_created_at' not in unique:
+            op.create_index('uq_orders_id_created_at', 'orders', ['id', 'created_at'], unique=True,
+                            postgresql_concurrently=True, if_not_exists=True)
+            op.execute("ALTER TABLE orders ADD CONSTRAINT uq_orders_id_created_at "
+                       "UNIQUE USING INDEX uq_orders_id_created_at")
+
+        _backfill_order_created_at()
+        _set_not_null('order_items', 'order_created_at')
+        if 'fk_order_items_order' not in foreign_keys:
+            old_fk = _order_fk(inspector, 'order_items', ['order_id'])
+            if old_fk:
+                op.drop_constraint(old_fk, 'order_items', type_='foreignkey')
+            op.execute("ALTER TABLE order_items ADD CONSTRAINT fk_order_items_order "
+                       "FOREIGN KEY (order_id, order_created_at) REFERENCES orders (id, created_at) "
+                       "ON DELETE CASCADE NOT VALID")
+            op.execute("ALTER TABLE order_items VALIDATE CONSTRAINT fk_order_items_order")
+
+        reservation_fk = _order_fk(inspector, 'stock_reservations', ['order_id'])
+        if reservation_fk:
+            op.drop_constraint(reservation_fk, 'stock_reservations', type_='foreignkey')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if op.get_context().dialect.name == 'postgresql':
+        _upgrade_postgresql(inspector)
+        return
+
+    if 'order_created_at' in {column['name'] for column in inspector.get_columns('order_items')}:
+        return
+
+    op.execute("UPDATE orders SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_unique_constraint('uq_orders_id_created_at', ['id', 'created_at'])
+
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.add_column(sa.Column('order_created_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE order_items SET order_created_at = "
+               "(SELECT orders.created_at FROM orders WHERE orders.id = order_items.order_id)")
+
+    old_fk = _order_fk(inspector, 'order_items', ['order_id'])
+    with op.batch_alter_table('order_items', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column('order_created_at', existing_type=sa.DateTime(), nullable=False)
+        if old_fk:
+            batch_op.drop_constraint(old_fk, type_='foreignkey')
+        batch_op.create_foreign_key('fk_order_items_order', 'orders', ['order_id', 'order_created_at'],
+                                    ['id', 'created_at'], ondelete='CASCADE')
+
+    reservation_fk = _order_fk(inspector, 'stock_reservations', ['order_id'])
+    if reservation_fk:
+        with op.batch_alter_table('stock_reservations', naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(reservation_fk, type_='foreignkey')
+
+
+def downgrade():
+    with op.batch_alter_table('stock_reservations') as batch_op:
+        batch_op.create_foreign_key('stock_reservations_order_id_fkey', 'orders', ['order_id'], ['id'],
+                                    ondelete='CASCADE')
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.drop_constraint('fk_order_items_order', type_='foreignkey')
+        batch_op.create_foreign_key('order_items_order_id_fkey', 'orders', ['order_id'], ['id'], ondelete='CASCADE')
+        batch_op.drop_column('order_created_at')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_constraint('uq_orders_id_created_at', type_='unique')
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
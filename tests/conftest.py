@@ -1,8 +1,10 @@
 import os
 import pytest
+import redis
 from app import create_app
 from app.database import db
 from app.config import Config
+from app.models import Product
 from flask.testing import FlaskClient
 
 @pytest.fixture
@@ -11,6 +13,8 @@ def app():
     config.TESTING = True
     config.SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     config.RATELIMIT_ENABLED = False
+    config.SQL_N_PLUS_ONE_RAISE = True
+    config.CACHE_BACKEND = "local"
     config.REDIS_URL = os.getenv("REDIS_URL_DEVELOPMENT", "redis://localhost:6379/0")
 
     app = create_app(config)
@@ -22,6 +26,17 @@ def app():
         db.session.remove()
         db.drop_all()
 
+@pytest.fixture
+def live_redis(app):
+    # Tests that need a Redis server are skipped when REDIS_URL_DEVELOPMENT is not reachable
+    try:
+        app.extensions["redis"].ping()
+    except redis.exceptions.RedisError:
+        pytest.skip("Redis is not available")
+    app.extensions["redis"].flushdb()
+    yield app.extensions["redis"]
+    app.extensions["redis"].flushdb()
+
 @pytest.fixture
 def client(app) -> FlaskClient:
     return app.test_client()
@@ -44,3 +59,18 @@ def auth_token(client):
     print(response)
     token = response.get_json()["token"]
     return token
+
+@pytest.fixture
+def auth_headers(auth_token) -> dict:
+    return {"Authorization": f"Bearer {auth_token}"}
+
+@pytest.fixture
+def create_product(app):
+    # Insert a product and return it; any column can be overridden
+    def create(name="Product A", **fields):
+        product = Product(**{"seller_id": 1, "price": 10, "stock": 100, "description": "Xiaomi 13T Plus",
+                             **fields, "name": name})
+        db.session.add(product)
+        db.session.commit()
+        return product
+    return create
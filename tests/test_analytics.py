@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from app.models import Product, Order, OrderItem
+from app.database import db
+from app.services import analytics
+
+
+def _sales(client, headers, **params):
+    return client.get("/analytics/sales", query_string=params, headers=headers)
+
+
+def _dataset():
+    first = Product(name="First", seller_id=1, price=10, stock=100, description="Xiaomi 13T Plus")
+    second = Product(name="Second", seller_id=2, price=5, stock=100, description="Xiaomi 13T Plus")
+    db.session.add_all([first, second])
+    for created_at, status, items in [
+        (datetime(2025, 4, 1, 9), "pending", [(first, 2), (second, 1)]),
+        (datetime(2025, 4, 1, 23), "delivered", [(first, 1)]),
+        (datetime(2025, 4, 2, 12), "shipped", [(second, 4)]),
+        (datetime(2025, 4, 2, 13), "cancelled", [(first, 10)]),
+    ]:
+        order = Order(buyer_id=1, total=0, status=status, created_at=created_at)
+        for product, quantity in items:
+            order.order_products.append(OrderItem(product=product, quantity=quantity, price=product.price))
+        db.session.add(order)
+    db.session.commit()
+    return first.id, second.id
+
+
+def test_sales_by_day_product_and_seller(client, auth_headers):
+    first, second = _dataset()
+    analytics.refresh(date(2025, 4, 1), date(2025, 4, 2))
+    dates = {"from": "2025-04-01", "to": "2025-04-02"}
+
+    by_day = _sales(client, auth_headers, group_by="day", **dates).get_json()["results"]
+    by_product = _sales(client, auth_headers, group_by="product", **dates).get_json()["results"]
+    by_seller = _sales(client, auth_headers, group_by="seller", **dates).get_json()["results"]
+
+    assert by_day == [{"day": "2025-04-01", "orders": 2, "units": 4, "revenue": 35},
+                      {"day": "2025-04-02", "orders": 1, "units": 4, "revenue": 20}]
+    assert by_product == [{"product_id": first, "orders": 2, "units": 3, "revenue": 30},
+                          {"product_id": second, "orders": 2, "units": 5, "revenue": 25}]
+    assert by_seller == [{"seller_id": 1, "units": 3, "revenue": 30}, {"seller_id": 2, "units": 5, "revenue": 25}]
+
+
+def test_refresh_replaces_only_its_range(client, auth_headers):
+    _dataset()
+    analytics.refresh(date(2025, 4, 1), date(2025, 4, 2))
+    Order.query.filter(Order.created_at < datetime(2025, 4, 2)).update({"status": "cancelled"})
+    db.session.commit()
+
+    analytics.refresh(date(2025, 4, 2), date(2025, 4, 2))
+
+    days = _sales(client, auth_headers, **{"from": "2025-04-01", "to": "2025-04-02"}).get_json()["results"]
+    assert [day["day"] for day in days] == ["2025-04-01", "2025-04-02"]
+
+
+def test_order_changes_queue_their_day(client, auth_headers, live_redis):
+    product = Product(name="First", seller_id=1, price=10, stock=100, description="Xiaomi 13T Plus")
+    db.session.add(product)
+    db.session.commit()
+
+    response = client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product.id, "quantity": 3}]},
+                           headers=auth_headers)
+    day = db.session.get(Order, response.get_json()["order_id"]).created_at.date()
+
+    assert analytics.refresh_dirty() == [day]
+    assert analytics.refresh_dirty() == []
+    results = _sales(client, auth_headers, **{"from": day.isoformat(), "to": day.isoformat()}).get_json()["results"]
+    assert results == [{"day": day.isoformat(), "orders": 1, "units": 3, "revenue": 30}]
+
+
+def test_sales_rejects_invalid_parameters(client, auth_headers):
+    assert _sales(client, auth_headers, group_by="week").status_code == 400
+    assert _sales(client, auth_headers, **{"from": "yesterday"}).status_code == 400
+    assert _sales(client, auth_headers, **{"from": "2025-04-02", "to": "2025-04-01"}).status_code == 400
+    assert _sales(client, auth_headers, **{"from": "2023-01-01", "to": "2025-01-01"}).status_code == 400
+    assert client.get("/analytics/sales").status_code == 401
@@ -0,0 +1,78 @@
+import gzip
+from app.utils.cache import CacheEntry, LocalCacheBackend
+
+
+def test_get_product_served_from_cache(client, create_product):
+    product_id = create_product(description="Xiaomi 13T Plus 250GB octa-core " * 50).id
+
+    first = client.get(f"/products/{product_id}")
+    second = client.get(f"/products/{product_id}")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+    assert second.content_type == "application/json"
+
+
+def test_update_product_invalidates_cached_entries(client, auth_token, create_product):
+    product_id = create_product(description="Xiaomi 13T Plus 250GB octa-core " * 50).id
+    client.get(f"/products/{product_id}")
+    client.get("/products")
+
+    client.patch(f"/products/{product_id}", json={"stock": 5}, headers={"Authorization": f"Bearer {auth_token}"})
+
+    product = client.get(f"/products/{product_id}")
+    products = client.get("/products")
+    assert product.headers["X-Cache"] == "MISS"
+    assert product.get_json()["stock"] == 5
+    assert products.headers["X-Cache"] == "MISS"
+
+
+def test_query_params_are_part_of_the_key(client, create_product):
+    product_id = create_product(description="Xiaomi 13T Plus 250GB octa-core " * 50).id
+
+    client.get(f"/products/{product_id}?fields=id")
+    response = client.get(f"/products/{product_id}?fields=name")
+
+    assert response.headers["X-Cache"] == "MISS"
+
+
+def test_unknown_query_params_do_not_bypass_the_cache(client, create_product):
+    product_id = create_product(description="Xiaomi 13T Plus 250GB octa-core " * 50).id
+
+    client.get(f"/products/{product_id}?a=1")
+    response = client.get(f"/products/{product_id}?a=2")
+
+    assert response.headers["X-Cache"] == "HIT"
+
+
+def test_evicted_keys_are_removed_from_their_tags():
+    backend = LocalCacheBackend(max_entries=1)
+    backend.set("a", CacheEntry(200, [], b"a"), 60, ["product:1"])
+    backend.set("b", CacheEntry(200, [], b"b"), 60, ["product:2"])
+    backend.set("c", CacheEntry(200, [], b"c"), -1, ["product:3"])
+
+    assert backend.get("c") is None
+    assert not backend._tags
+    assert not backend._key_tags
+
+
+def test_compressed_variant_stored_with_entry(app, client, create_product):
+    product_id = create_product(description="Xiaomi 13T Plus 250GB octa-core " * 50).id
+    client.get(f"/products/{product_id}")
+
+    hit = client.get(f"/products/{product_id}", headers={"Accept-Encoding": "gzip"})
+
+    assert hit.headers["X-Cache"] == "HIT"
+    assert hit.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(hit.get_data()).startswith(b'{"id":')
+    (_, entry), = app.extensions["response_cache"]._entries.values()
+    assert entry.variants["gzip"] == hit.get_data()
+
+
+def test_cached_protected_endpoint_still_requires_token(client, auth_token):
+    client.get("/users/1", headers={"Authorization": f"Bearer {auth_token}"})
+
+    response = client.get("/users/1")
+
+    assert response.status_code == 401
@@ -0,0 +1,83 @@
+import redis
+from app.models import Product, Order
+from app.database import db
+
+# Nothing listens on port 1: every command fails with a connection error
+UNREACHABLE_REDIS = redis.Redis(port=1, socket_connect_timeout=0.1)
+
+
+def test_cart_requires_token(client):
+    assert client.get("/cart").status_code == 401
+    assert client.post("/cart/checkout").status_code == 401
+
+
+def test_cart_unavailable_without_redis(app, client, auth_headers):
+    app.extensions["redis"] = UNREACHABLE_REDIS
+
+    assert client.get("/cart", headers=auth_headers).status_code == 503
+
+
+def test_add_and_remove_items(client, auth_headers, live_redis, create_product):
+    first = create_product("First", price=10).id
+    second = create_product("Second", price=5).id
+
+    client.post("/cart/items", json={"product_id": first, "quantity": 2}, headers=auth_headers)
+    client.post("/cart/items", json={"product_id": first, "quantity": 1}, headers=auth_headers)
+    response = client.post("/cart/items", json={"product_id": second, "quantity": 4}, headers=auth_headers)
+
+    cart = response.get_json()
+    assert [(item["product_id"], item["quantity"], item["subtotal"]) for item in cart["items"]] == [
+        (first, 3, 30), (second, 4, 20)]
+    assert cart["total"] == 50
+
+    response = client.delete(f"/cart/items/{first}", headers=auth_headers)
+    assert [item["product_id"] for item in response.get_json()["items"]] == [second]
+    assert client.delete(f"/cart/items/{first}", headers=auth_headers).status_code == 404
+
+
+def test_add_item_checks_stock_snapshot(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=3).id
+
+    response = client.post("/cart/items", json={"product_id": product_id, "quantity": 4},
+                           headers=auth_headers)
+
+    assert response.status_code == 400
+    assert client.get("/cart", headers=auth_headers).get_json()["items"] == []
+    assert client.post("/cart/items", json={"product_id": 999, "quantity": 1},
+                       headers=auth_headers).status_code == 404
+
+
+def test_snapshot_refreshed_after_product_update(client, auth_headers, live_redis, create_product):
+    product_id = create_product(price=10).id
+    client.post("/cart/items", json={"product_id": product_id, "quantity": 1}, headers=auth_headers)
+
+    client.patch(f"/products/{product_id}", json={"price": 12}, headers=auth_headers)
+
+    assert client.get("/cart", headers=auth_headers).get_json()["total"] == 12
+
+
+def test_checkout_creates_order_and_empties_cart(client, auth_headers, live_redis, create_product):
+    product_id = create_product(price=10).id
+    client.post("/cart/items", json={"product_id": product_id, "quantity": 2}, headers=auth_headers)
+
+    response = client.post("/cart/checkout", headers=auth_headers)
+
+    assert response.status_code == 201
+    order = db.session.get(Order, response.get_json()["order_id"])
+    assert order.total == 20
+    assert [(item.product_id, item.quantity) for item in order.order_products] == [(product_id, 2)]
+    assert client.get("/cart", headers=auth_headers).get_json()["items"] == []
+    assert client.post("/cart/checkout", headers=auth_headers).status_code == 400
+
+
+def test_checkout_checks_stock_in_database(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=5).id
+    client.post("/cart/items", json={"product_id": product_id, "quantity": 5}, headers=auth_headers)
+    db.session.get(Product, product_id).stock = 1
+    db.session.commit()
+
+    response = client.post("/cart/checkout", headers=auth_headers)
+
+    assert response.status_code == 400
+    assert db.session.query(Order).count() == 0
+    assert len(client.get("/cart", headers=auth_headers).get_json()["items"]) == 1
@@ -0,0 +1,34 @@
+from app.database import db
+from app.models import User, Product, Order, OrderItem
+
+
+def _snapshot():
+    return [
+        [(o.buyer_id, o.total, o.status, o.created_at) for o in Order.query.order_by(Order.id)],
+        [(i.order_id, i.product_id, i.quantity) for i in OrderItem.query.order_by(OrderItem.id)],
+    ]
+
+
+def test_generate_data_loads_every_table(app):
+    result = app.test_cli_runner().invoke(args=["generate-data", "--users", "20", "--products", "30",
+                                                "--orders", "100", "--batch-size", "40"])
+
+    assert result.exit_code == 0, result.output
+    assert "rows/s" in result.output
+    assert db.session.query(User).count() == 20
+    assert db.session.query(Product).count() == 30
+    assert db.session.query(Order).count() == 100
+    assert db.session.query(OrderItem).count() >= 100
+
+
+def test_generate_data_is_deterministic(app):
+    runner = app.test_cli_runner()
+    args = ["generate-data", "--users", "20", "--products", "30", "--orders", "50"]
+
+    runner.invoke(args=args)
+    first = _snapshot()
+    db.drop_all()
+    db.create_all()
+    runner.invoke(args=args)
+
+    assert _snapshot() == first
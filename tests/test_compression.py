@@ -0,0 +1,55 @@
+import gzip
+import pytest
+from app.models import Product
+from app.database import db
+
+
+@pytest.fixture
+def many_products():
+    db.session.add_all([
+        Product(name=f"Product {i}", seller_id=1, price=10.00, stock=100,
+                description="Xiaomi 13T Plus 250GB octa-core")
+        for i in range(50)
+    ])
+    db.session.commit()
+
+
+def test_products_list_is_gzip_compressed(client, many_products):
+    response = client.get("/products", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.get_data()).startswith(b'[{"id":1,')
+
+
+def test_client_preference_is_respected(client, many_products):
+    brotli = pytest.importorskip("brotli")
+    response = client.get("/products", headers={"Accept-Encoding": "gzip;q=0.5, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.get_data()).startswith(b'[{"id":1,')
+
+
+def test_response_not_compressed_without_accept_encoding(client, many_products):
+    response = client.get("/products")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()[0]["id"] == 1
+
+
+def test_small_response_not_compressed(client):
+    response = client.get("/products", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 404
+    assert "Content-Encoding" not in response.headers
+
+
+def test_hot_response_compressed_once(app, client, many_products):
+    body_cache = app.extensions["compression"]
+
+    first = client.get("/products", headers={"Accept-Encoding": "gzip"}).get_data()
+    second = client.get("/products", headers={"Accept-Encoding": "gzip"}).get_data()
+
+    assert first == second
+    assert len(body_cache._entries) == 1
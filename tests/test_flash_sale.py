@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+import redis
+from app.models import Order, Product, FlashSaleFlush
+from app.database import db
+from app.services import flash_sale
+from app.utils.exceptions import BadRequestsError
+
+
+def _order(client, headers, *items):
+    return client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product_id, "quantity": quantity}
+                                                                  for product_id, quantity in items]},
+                       headers=headers)
+
+
+def _stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock
+
+
+def test_concurrent_takes_do_not_oversell(app, live_redis, create_product):
+    product_id = create_product(stock=5).id
+    flash_sale.start([product_id])
+
+    def take(_):
+        with app.app_context():
+            try:
+                flash_sale.take_stock([(product_id, 1)])
+                return True
+            except BadRequestsError:
+                return False
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        taken = list(executor.map(take, range(20)))
+
+    assert taken.count(True) == 5
+    assert flash_sale.available_stock([product_id]) == {product_id: 0}
+
+
+def test_orders_take_flash_stock_written_behind(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=2).id
+    flash_sale.start([product_id])
+
+    statuses = [_order(client, auth_headers, (product_id, 1)).status_code for _ in range(3)]
+
+    assert statuses == [201, 201, 400]
+    # The database is written behind, by the flush
+    assert _stock(product_id) == 2
+    assert flash_sale.flush() == {product_id: 2}
+    assert _stock(product_id) == 0
+
+
+def test_take_stock_is_all_or_nothing(client, auth_headers, live_redis, create_product):
+    plenty = create_product("Plenty", stock=10).id
+    scarce = create_product("Scarce", stock=1).id
+    flash_sale.start([plenty, scarce])
+
+    assert _order(client, auth_headers, (plenty, 3), (scarce, 2)).status_code == 400
+
+    assert flash_sale.available_stock([plenty, scarce]) == {plenty: 10, scarce: 1}
+    assert flash_sale.flush() == {}
+
+
+def test_flush_applies_a_batch_once(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=10).id
+    flash_sale.start([product_id])
+    _order(client, auth_headers, (product_id, 4))
+
+    assert flash_sale.flush() == {product_id: 4}
+    # A worker that died after committing leaves the batch in Redis: the retry skips it
+    live_redis.hset(flash_sale.FLUSHING_KEY, product_id, 4)
+    live_redis.set(flash_sale.FLUSHING_ID_KEY, db.session.get(FlashSaleFlush, "products").batch_id)
+
+    flash_sale.flush()
+
+    assert _stock(product_id) == 6
+    assert not live_redis.exists(flash_sale.FLUSHING_KEY)
+
+
+def test_cancel_releases_flash_stock(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=3).id
+    flash_sale.start([product_id])
+    order_id = _order(client, auth_headers, (product_id, 3)).get_json()["order_id"]
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "cancelled"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert flash_sale.available_stock([product_id]) == {product_id: 3}
+    assert flash_sale.flush() == {}
+    assert _stock(product_id) == 3
+
+
+def test_shipping_does_not_take_flash_stock_twice(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=3).id
+    flash_sale.start([product_id])
+    order_id = _order(client, auth_headers, (product_id, 2)).get_json()["order_id"]
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "shipped"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    flash_sale.stop([product_id])
+    assert _stock(product_id) == 1
+    assert flash_sale.available_stock([product_id]) == {}
+
+
+def test_reconcile_corrects_drift(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=10).id
+    flash_sale.start([product_id])
+    _order(client, auth_headers, (product_id, 2))
+    live_redis.set(flash_sale.stock_key(product_id), 42)
+
+    assert flash_sale.reconcile() == {product_id: (42, 8)}
+    assert _stock(product_id) == 8
+    assert flash_sale.reconcile() == {}
+
+
+def test_start_keeps_the_units_held_by_pending_orders(client, auth_headers, live_redis, create_product):
+    product_id = create_product(stock=10).id
+    order_id = _order(client, auth_headers, (product_id, 3)).get_json()["order_id"]
+
+    flash_sale.start([product_id])
+
+    assert flash_sale.available_stock([product_id]) == {product_id: 7}
+    # The held units became flash stock of the order: shipping does not take them again
+    response = client.patch(f"/orders/{order_id}", json={"status": "shipped"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert flash_sale.available_stock([product_id]) == {product_id: 7}
+    flash_sale.flush()
+    assert _stock(product_id) == 7
+
+
+def test_delete_succeeds_when_flash_stock_cannot_be_given_back(app, client, auth_headers, live_redis, monkeypatch, create_product):
+    product_id = create_product(stock=10).id
+    flash_sale.start([product_id])
+    order_id = _order(client, auth_headers, (product_id, 2)).get_json()["order_id"]
+    monkeypatch.setitem(app.extensions, "redis", redis.Redis(port=1, socket_connect_timeout=0.1))
+
+    response = client.delete(f"/orders/{order_id}", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert db.session.get(Order, order_id) is None
@@ -0,0 +1,37 @@
+import json
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from app.models import RoleEnum
+from app.utils.json_provider import OrjsonProvider, StdlibJSONProvider
+
+PAYLOAD = {
+    "id": 1,
+    "role": RoleEnum.admin,
+    "price": Decimal("125.85"),
+    "created_at": datetime(2025, 3, 24, 14, 30, 0)
+}
+
+
+@pytest.mark.parametrize("provider_class", [OrjsonProvider, StdlibJSONProvider])
+def test_provider_serializes_model_types(app, provider_class):
+    body = json.loads(provider_class(app).dumps(PAYLOAD))
+
+    assert body == {"id": 1, "role": "admin", "price": "125.85", "created_at": "Mon, 24 Mar 2025 14:30:00 GMT"}
+
+
+@pytest.mark.parametrize("provider_class", [OrjsonProvider, StdlibJSONProvider])
+def test_iso_datetimes_behind_config_flag(app, provider_class):
+    app.config["JSON_DATETIME_FORMAT"] = "iso8601"
+
+    body = json.loads(provider_class(app).dumps(PAYLOAD))
+
+    assert body["created_at"] == "2025-03-24T14:30:00"
+
+
+def test_providers_produce_the_same_response(app):
+    orjson_response = OrjsonProvider(app).response(PAYLOAD)
+    stdlib_response = StdlibJSONProvider(app).response(PAYLOAD)
+
+    assert orjson_response.mimetype == stdlib_response.mimetype == "application/json"
+    assert json.loads(orjson_response.get_data()) == json.loads(stdlib_response.get_data())
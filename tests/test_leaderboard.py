@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+import redis
+from app.models import Order, OrderItem
+from app.database import db
+from app.services.leaderboard import daily_sales, window_keys
+
+# Nothing listens on port 1: every command fails with a connection error
+UNREACHABLE_REDIS = redis.Redis(port=1, socket_connect_timeout=0.1)
+
+
+def _create_order(product, quantity, status="pending", days_ago=0):
+    order = Order(buyer_id=1, total=10.00, status=status,
+                  created_at=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days_ago))
+    order.order_products.append(OrderItem(product=product, quantity=quantity, price=10.00))
+    db.session.add(order)
+    db.session.commit()
+
+
+def test_window_keys_cover_one_bucket_per_day():
+    keys = window_keys(3, datetime(2025, 4, 7).date())
+
+    assert keys == ["leaderboard:products:20250407", "leaderboard:products:20250406",
+                    "leaderboard:products:20250405"]
+
+
+def test_top_rejects_invalid_window(client):
+    assert client.get("/products/top?window=week").status_code == 400
+    assert client.get("/products/top?window=0d").status_code == 400
+    assert client.get("/products/top?window=31d").status_code == 400
+    assert client.get("/products/top?limit=abc").status_code == 400
+
+
+def test_top_unavailable_without_redis(app, client):
+    app.extensions["redis"] = UNREACHABLE_REDIS
+
+    assert client.get("/products/top?window=7d").status_code == 503
+
+
+def test_daily_sales_skip_cancelled_and_old_orders(app, create_product):
+    first, second = create_product("First"), create_product("Second")
+    _create_order(first, 2)
+    _create_order(first, 3)
+    _create_order(second, 1, days_ago=1)
+    _create_order(second, 5, status="cancelled")
+    _create_order(second, 7, days_ago=10)
+
+    sales = daily_sales(7)
+
+    today = datetime.now(timezone.utc).date()
+    assert sales == {today: {first.id: 5}, today - timedelta(days=1): {second.id: 1}}
+
+
+def test_top_products_follow_orders_and_cancellations(client, auth_token, live_redis, create_product):
+    first, second = create_product("First"), create_product("Second")
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": first.id, "quantity": 1}]},
+                headers=headers)
+    order = client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": second.id, "quantity": 3}]},
+                        headers=headers).get_json()
+
+    top = client.get("/products/top?window=1d").get_json()["products"]
+    assert [(product["id"], product["units_sold"]) for product in top] == [(second.id, 3), (first.id, 1)]
+
+    client.patch(f"/orders/{order['order_id']}", json={"status": "cancelled"}, headers=headers)
+    live_redis.delete(*live_redis.keys("leaderboard:products:top:*"))
+    top = client.get("/products/top?window=1d").get_json()["products"]
+    assert [(product["id"], product["units_sold"]) for product in top] == [(first.id, 1)]
+
+
+def test_rebuild_command_restores_counters(app, client, live_redis, create_product):
+    product = create_product()
+    _create_order(product, 4)
+
+    result = app.test_cli_runner().invoke(args=["rebuild-leaderboard", "--days", "7"])
+
+    assert result.exit_code == 0, result.output
+    top = client.get("/products/top?window=7d").get_json()["products"]
+    assert [(entry["id"], entry["units_sold"]) for entry in top] == [(product.id, 4)]
@@ -0,0 +1,18 @@
+def test_metrics_endpoint_exposes_request_metrics(client):
+    client.get("/products")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{endpoint="products.get_all_products",method="GET",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{endpoint="products.get_all_products"' in body
+    assert 'db_queries_per_request_count{endpoint="products.get_all_products"}' in body
+
+
+def test_metrics_endpoint_counts_unmatched_routes(client):
+    client.get("/does-not-exist")
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'http_requests_total{endpoint="unmatched",method="GET"' in body
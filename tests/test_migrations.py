@@ -0,0 +1,70 @@
+from flask_migrate import upgrade, downgrade
+from sqlalchemy import inspect, text
+from app.database import db
+from app.models import ChangeSequence
+
+QUERY_INDEXES = {
+    ("orders", "ix_orders_buyer_id_created_at"),
+    ("orders", "ix_orders_status_created_at"),
+    ("order_items", "ix_order_items_order_id"),
+    ("order_items", "ix_order_items_product_id"),
+    ("products", "ix_products_seller_id"),
+    ("products", "ix_products_change_seq"),
+    ("stock_reservations", "ix_stock_reservations_expires_at"),
+    ("stock_reservations", "ix_stock_reservations_product_id_expires_at"),
+}
+
+
+def _indexes():
+    inspector = inspect(db.engine)
+    return {(table, index["name"]) for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+def test_models_declare_the_query_indexes(app):
+    assert QUERY_INDEXES <= _indexes()
+
+
+def test_migrations_upgrade_and_downgrade(app):
+    # The schema already exists (db.create_all): the chain must adopt it
+    upgrade()
+    assert QUERY_INDEXES <= _indexes()
+
+    downgrade(revision="3f2a6c1d9b10")
+    assert not QUERY_INDEXES & _indexes()
+
+    upgrade()
+    assert QUERY_INDEXES <= _indexes()
+
+
+def test_change_feed_counter_starts_after_existing_products(app):
+    # A database of the first schema, where create_all() at startup already added the
+    # change_sequences table (seeded at 0) before the migrations run
+    upgrade()
+    downgrade(revision="3f2a6c1d9b10")
+    with db.engine.begin() as connection:
+        for product_id in (1, 2, 3):
+            connection.execute(text("INSERT INTO products (id, seller_id, name, description, price, stock, created_at) "
+                                    "VALUES (:id, 1, 'Product', 'Description', 10, 5, CURRENT_TIMESTAMP)"), {"id": product_id})
+    ChangeSequence.__table__.create(db.engine)
+
+    upgrade()
+
+    with db.engine.connect() as connection:
+        assert connection.execute(text("SELECT MAX(change_seq) FROM products")).scalar() == 3
+        assert connection.execute(text("SELECT value FROM change_sequences WHERE name = 'products'")).scalar() == 3
+
+
+def test_item_count_is_backfilled(app):
+    upgrade()
+    downgrade(revision="a9c4e1f7b362")
+    with db.engine.begin() as connection:
+        connection.execute(text("INSERT INTO orders (id, buyer_id, total, status, created_at) "
+                                "VALUES (1, 1, 30, 'pending', '2025-04-01 10:00:00')"))
+        for quantity in (1, 2):
+            connection.execute(text("INSERT INTO order_items (order_id, order_created_at, product_id, quantity, price) "
+                                    "VALUES (1, '2025-04-01 10:00:00', 1, :quantity, 10)"), {"quantity": quantity})
+
+    upgrade()
+
+    with db.engine.connect() as connection:
+        assert connection.execute(text("SELECT item_count FROM orders WHERE id = 1")).scalar() == 3
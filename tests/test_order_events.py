@@ -0,0 +1,143 @@
+import json
+import time
+import redis
+from app.models import Order
+from app.database import db
+from app.services.order_events import OrderEventHub, subscribe, order_event_stream, publish_order_status
+
+# Nothing listens on port 1: every command fails with a connection error
+UNREACHABLE_REDIS = redis.Redis(port=1, socket_connect_timeout=0.1)
+
+
+class FakePubSub:
+    def __init__(self):
+        self.closed = False
+
+    def psubscribe(self, *patterns):
+        pass
+
+    def get_message(self, timeout=0):
+        time.sleep(0.01)
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRedis:
+    """
+    The stream commands used by the order events, enough to replay them without a Redis server.
+    """
+    def __init__(self, events):
+        self.events = [(event_id.encode(), {b"event": b"order_status", b"data": json.dumps(data).encode()})
+                       for event_id, data in events]
+        self.pubsub_instance = FakePubSub()
+
+    def xrange(self, key, min, max):
+        after = tuple(map(int, min.lstrip("(").split("-")))
+        return [event for event in self.events if tuple(map(int, event[0].decode().split("-"))) > after]
+
+    def xrevrange(self, key, max, min, count):
+        return self.events[::-1][:count]
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self.pubsub_instance
+
+
+def _create_order(buyer_id=1, status="pending"):
+    order = Order(buyer_id=buyer_id, total=10.00, status=status)
+    db.session.add(order)
+    db.session.commit()
+    return order.id
+
+
+def test_stream_requires_token(client):
+    response = client.get("/orders/stream")
+
+    assert response.status_code == 401
+
+
+def test_stream_rejects_invalid_last_event_id(client, auth_token):
+    response = client.get("/orders/stream", headers={"Authorization": f"Bearer {auth_token}",
+                                                     "Last-Event-ID": "not-an-id"})
+
+    assert response.status_code == 400
+
+
+def test_stream_unavailable_without_redis(app, client, auth_token):
+    app.extensions["redis"] = UNREACHABLE_REDIS
+
+    response = client.get("/orders/stream?ticket=abc")
+
+    assert response.status_code == 503
+
+
+def test_stream_accepts_a_ticket_only_once(app, client, auth_token, live_redis):
+    ticket = client.post("/orders/stream/ticket", headers={"Authorization": f"Bearer {auth_token}"}).get_json()["ticket"]
+
+    response = client.get(f"/orders/stream?ticket={ticket}")
+    assert response.status_code == 200
+    response.close()
+    assert client.get(f"/orders/stream?ticket={ticket}").status_code == 401
+    assert client.get(f"/orders/stream?access_token={auth_token}").status_code == 401
+    app.extensions["order_events"].stop()
+
+
+def test_status_change_succeeds_when_events_cannot_be_published(app, client, auth_token):
+    app.extensions["redis"] = UNREACHABLE_REDIS
+    order_id = _create_order()
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "cancelled"},
+                            headers={"Authorization": f"Bearer {auth_token}"})
+
+    assert response.status_code == 200
+    assert db.session.get(Order, order_id).status == "cancelled"
+
+
+def test_stream_resumes_after_last_event_id():
+    fake = FakeRedis([("1-0", {"order_id": 1, "status": "shipped", "previous_status": "pending"}),
+                      ("2-0", {"order_id": 2, "status": "cancelled", "previous_status": "pending"})])
+    hub = OrderEventHub(fake)
+    subscription, last_id = subscribe(hub, 1, "1-0")
+    stream = order_event_stream(fake, subscription, 1, last_id, heartbeat=0)
+
+    assert next(stream).startswith("retry:")
+    event = next(stream)
+    assert event.startswith("id: 2-0\nevent: order_status\n")
+    assert json.loads(event.split("data: ")[1])["order_id"] == 2
+    assert next(stream) == ": keep-alive\n\n"
+
+    stream.close()
+    assert not hub._subscriptions
+    hub.stop()
+    assert fake.pubsub_instance.closed
+
+
+def test_stream_without_last_event_id_starts_at_newest_event():
+    fake = FakeRedis([("1-0", {"order_id": 1, "status": "shipped", "previous_status": "pending"})])
+    hub = OrderEventHub(fake)
+    subscription, last_id = subscribe(hub, 1, None)
+
+    assert last_id == "1-0"
+    hub.stop()
+
+
+def test_hub_wakes_only_the_streams_of_the_buyer():
+    hub = OrderEventHub(FakeRedis([]))
+    first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+
+    hub.dispatch(1)
+
+    assert first.wait(0) and second.wait(0)
+    assert not other.wait(0)
+    hub.stop()
+
+
+def test_streams_of_a_worker_share_one_subscription(app, live_redis):
+    hub = app.extensions["order_events"]
+    first, second = hub.subscribe(1), hub.subscribe(1)
+
+    assert live_redis.pubsub_numpat() == 1
+    publish_order_status(1, 7, "shipped", "pending")
+    assert first.wait(2) and second.wait(2)
+    hub.stop()
@@ -1,5 +1,4 @@
-import json
-from app.models import Product, Order, OrderItem
+from app.models import Product, Order, OrderItem, StockReservation
 from app.database import db
 
 
@@ -100,3 +99,115 @@ def test_create_order_no_token(client):
     data = response.get_json()
     assert data["error"] == "Token Missing"
     assert data["message"] == "Authorization token is missing"
+
+
+def _create_orders_with_items(buyer_id, count):
+    product = Product(name="Product A", seller_id=1, price=10.00, stock=100,
+                      description="Xiaomi 13T Plus 250GB octa-core")
+    db.session.add(product)
+    for _ in range(count):
+        order = Order(buyer_id=buyer_id, total=10.00, status="pending")
+        order.order_products.append(OrderItem(product=product, quantity=1, price=10.00))
+        db.session.add(order)
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_get_all_orders_does_not_query_per_order(client, auth_token):
+    _create_orders_with_items(buyer_id=1, count=15)
+
+    response = client.get("/orders", headers={"Authorization": f"Bearer {auth_token}"})
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 15
+    assert 'db;desc="' in response.headers["Server-Timing"]
+
+
+def test_get_orders_buyer_does_not_query_per_order(client, auth_token):
+    _create_orders_with_items(buyer_id=1, count=15)
+
+    response = client.get("/orders/buyer/1", headers={"Authorization": f"Bearer {auth_token}"})
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 15
+
+
+def _place_order(client, auth_token, product_id, quantity):
+    response = client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product_id, "quantity": quantity}]},
+                           headers={"Authorization": f"Bearer {auth_token}"})
+    return response.get_json()["order_id"]
+
+
+def test_bulk_ship_takes_the_stock_of_the_batch(client, auth_token):
+    product = Product(name="Product A", seller_id=1, price=10.00, stock=10, description="Xiaomi 13T Plus")
+    db.session.add(product)
+    db.session.commit()
+    product_id = product.id
+    first = _place_order(client, auth_token, product_id, 4)
+    second = _place_order(client, auth_token, product_id, 3)
+
+    response = client.patch("/orders/status", json={"order_ids": [first, second, 999], "status": "shipped"},
+                            headers={"Authorization": f"Bearer {auth_token}"})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["updated"] == [first, second]
+    assert body["failed"] == [{"order_id": 999, "message": "Order not found"}]
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).stock == 3
+    assert {db.session.get(Order, order_id).status for order_id in (first, second)} == {"shipped"}
+
+
+def test_bulk_ship_reports_orders_without_stock(client, auth_token):
+    product = Product(name="Product A", seller_id=1, price=10.00, stock=5, description="Xiaomi 13T Plus")
+    db.session.add(product)
+    db.session.commit()
+    product_id = product.id
+    first = _place_order(client, auth_token, product_id, 3)
+    second = _place_order(client, auth_token, product_id, 2)
+    # The hold of the second order is gone and the stock is lowered under the two orders
+    StockReservation.query.filter_by(order_id=second).delete()
+    product.stock = 4
+    db.session.commit()
+
+    response = client.patch("/orders/status", json={"order_ids": [first, second, first], "status": "shipped"},
+                            headers={"Authorization": f"Bearer {auth_token}"})
+
+    body = response.get_json()
+    assert body["updated"] == [first]
+    assert body["failed"] == [{"order_id": second,
+                               "message": "There is not enough stock of Product A to complete the order"}]
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).stock == 1
+    assert db.session.get(Order, second).status == "pending"
+
+    response = client.patch("/orders/status", json={"order_ids": [first], "status": "shipped"},
+                            headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.get_json()["failed"] == [{"order_id": first, "message": "Cannot ship an order that is shipped"}]
+
+
+def test_bulk_status_rejects_other_statuses(client, auth_token):
+    response = client.patch("/orders/status", json={"order_ids": [1], "status": "delivered"},
+                            headers={"Authorization": f"Bearer {auth_token}"})
+
+    assert response.status_code == 400
+
+
+def test_summary_view_reports_item_count(client, auth_token):
+    product = Product(name="Product A", seller_id=1, price=10.00, stock=10, description="Xiaomi 13T Plus")
+    db.session.add(product)
+    db.session.commit()
+    order_id = _place_order(client, auth_token, product.id, 3)
+
+    for url in ("/orders?view=summary", "/orders/buyer/1?view=summary"):
+        response = client.get(url, headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        summary = response.get_json()[0]
+        assert summary["order_id"] == order_id
+        assert summary["item_count"] == 3
+        assert summary["total"] == 30.0
+        assert "order_products" not in summary
+
+    response = client.get("/orders?view=compact", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 400
@@ -0,0 +1,56 @@
+from datetime import date, datetime
+from werkzeug.http import parse_date
+from app.models import Product, Order, OrderItem
+from app.database import db
+from app.services import partitions
+
+
+def _orders():
+    product = Product(name="Product A", seller_id=1, price=10, stock=100, description="Xiaomi 13T Plus")
+    db.session.add(product)
+    for created_at in (datetime(2025, 1, 31, 23), datetime(2025, 2, 1, 1), datetime(2025, 3, 15)):
+        order = Order(buyer_id=1, total=10, status="pending", created_at=created_at)
+        order.order_products.append(OrderItem(product=product, quantity=1, price=10))
+        db.session.add(order)
+    db.session.commit()
+
+
+def test_month_arithmetic():
+    assert partitions.month_start(date(2025, 2, 17)) == date(2025, 2, 1)
+    assert partitions.add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert partitions.add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert partitions.partition_name("order_items", date(2025, 4, 1)) == "order_items_p2025_04"
+
+
+def test_items_carry_the_date_of_their_order(app):
+    _orders()
+    order = Order(buyer_id=1, total=10, status="pending")
+    db.session.add(order)
+    db.session.flush()
+    # Added by id, not through the relationship
+    db.session.add(OrderItem(order_id=order.id, product_id=1, quantity=1, price=10))
+    db.session.commit()
+
+    assert {item.order_created_at for item in OrderItem.query} == {order.created_at for order in Order.query}
+
+
+def test_orders_can_be_listed_by_date(client, auth_headers):
+    _orders()
+
+    response = client.get("/orders?from=2025-02-01&to=2025-03-31", headers=auth_headers)
+    by_buyer = client.get("/orders/buyer/1?to=2025-01-31", headers=auth_headers)
+
+    assert [parse_date(order["created_at"]).date() for order in response.get_json()] == [date(2025, 2, 1),
+                                                                                         date(2025, 3, 15)]
+    assert all(len(order["order_products"]) == 1 for order in response.get_json())
+    assert len(by_buyer.get_json()) == 1
+    assert client.get("/orders?from=february", headers=auth_headers).status_code == 400
+
+
+def test_partition_commands_need_postgresql(app):
+    runner = app.test_cli_runner()
+
+    assert runner.invoke(args=["orders-partitions", "enable"]).exit_code != 0
+    result = runner.invoke(args=["orders-partitions", "create"])
+    assert result.exit_code == 0
+    assert "not partitioned" in result.output
@@ -0,0 +1,54 @@
+from app.models import Product, ProductTombstone
+from app.database import db
+
+
+def _changes(client, since=0, limit=500):
+    response = client.get(f"/products/changes?since={since}&limit={limit}")
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_changes_report_created_products_in_order(client, create_product):
+    first = create_product("First").id
+    second = create_product("Second").id
+
+    feed = _changes(client)
+
+    assert [(change["op"], change["id"]) for change in feed["changes"]] == [("upsert", first), ("upsert", second)]
+    assert feed["changes"][1]["product"]["name"] == "Second"
+    assert feed["next_cursor"] == feed["changes"][-1]["seq"]
+    assert feed["has_more"] is False
+
+
+def test_changes_since_cursor_only_return_newer_changes(client, auth_token, create_product):
+    first = create_product("First").id
+    second = create_product("Second").id
+    cursor = _changes(client)["next_cursor"]
+
+    client.patch(f"/products/{first}", json={"price": 25}, headers={"Authorization": f"Bearer {auth_token}"})
+    client.delete(f"/products/{second}", headers={"Authorization": f"Bearer {auth_token}"})
+    feed = _changes(client, since=cursor)
+
+    assert [(change["op"], change["id"]) for change in feed["changes"]] == [("upsert", first), ("delete", second)]
+    assert feed["changes"][0]["product"]["price"] == 25
+    assert feed["changes"][1]["product"] is None
+    assert db.session.query(ProductTombstone).filter_by(product_id=second).count() == 1
+    assert _changes(client, since=feed["next_cursor"])["changes"] == []
+
+
+def test_changes_are_paginated_with_the_cursor(client, create_product):
+    ids = [create_product(f"Product {i}").id for i in range(5)]
+
+    seen, cursor, has_more = [], 0, True
+    while has_more:
+        feed = _changes(client, since=cursor, limit=2)
+        seen += [change["id"] for change in feed["changes"]]
+        cursor, has_more = feed["next_cursor"], feed["has_more"]
+
+    assert seen == ids
+
+
+def test_changes_reject_invalid_cursor(client):
+    assert client.get("/products/changes?since=-1").status_code == 400
+    assert client.get("/products/changes?since=abc").status_code == 400
+    assert client.get("/products/changes?limit=0").status_code == 400
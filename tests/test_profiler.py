@@ -0,0 +1,75 @@
+import os
+import time
+import pytest
+from app.database import db
+from app.models import Product
+from app.routes import products
+from app.utils.profiler import _route_logger
+
+
+@pytest.fixture
+def admin_token(client):
+    client.post("/users", json={
+        "name": "Admin User",
+        "email": "admin@example.com",
+        "password": "password123",
+        "role": "admin"
+    })
+    response = client.post("/login", json={
+        "email": "admin@example.com",
+        "password": "password123"
+    })
+    return response.get_json()["token"]
+
+
+def test_profile_returned_to_admin(app, client, admin_token, monkeypatch):
+    app.config["PROFILE_INTERVAL"] = 0.0001
+    db.session.add(Product(name="Product A", seller_id=1, price=10, stock=5, description="Xiaomi 13T Plus"))
+    db.session.commit()
+    available_quantities = products.available_quantities
+
+    def slow_available_quantities(*args, **kwargs):
+        # Long enough for the sampler to see the view on the stack
+        time.sleep(0.05)
+        return available_quantities(*args, **kwargs)
+
+    monkeypatch.setattr(products, "available_quantities", slow_available_quantities)
+
+    response = client.get("/products?_profile=return", headers={"Authorization": f"Bearer {admin_token}"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "get_all_products" in response.get_data(as_text=True)
+
+
+def test_profile_stored_for_admin(app, client, admin_token, tmp_path):
+    app.config["PROFILE_DIR"] = str(tmp_path)
+
+    response = client.get("/products", headers={"Authorization": f"Bearer {admin_token}", "X-Profile": "store"})
+
+    filename = response.headers["X-Profile-File"]
+    assert filename.startswith("products.get_all_products-")
+    assert os.path.exists(tmp_path / filename)
+
+
+def test_profile_ignored_for_non_admin(client, auth_token):
+    response = client.get("/products", headers={"Authorization": f"Bearer {auth_token}", "X-Profile": "return"})
+
+    assert response.mimetype == "application/json"
+    assert "X-Profile-File" not in response.headers
+
+
+def test_profile_query_parameter_ignored_for_non_admin(client, auth_token):
+    response = client.get("/products?_profile=return", headers={"Authorization": f"Bearer {auth_token}"})
+
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {"error": "Resource Not Found", "message": "Products not found"}
+
+
+def test_sampled_profiles_written_per_worker(tmp_path):
+    logger = _route_logger(str(tmp_path), "tests.per_worker", 1024)
+    logger.info("main;view 3")
+    for handler in logger.handlers:
+        handler.close()
+
+    assert os.listdir(tmp_path) == [f"tests.per_worker.{os.getpid()}.collapsed"]
@@ -0,0 +1,179 @@
+"""
+Query-plan regression tests: every hot query a route issues is captured and run through
+EXPLAIN QUERY PLAN (SQLite). A query that falls back to a full table scan fails the build.
+
+Set QUERY_PLAN_DATABASE_URI to a local PostgreSQL database to also check the plans with
+EXPLAIN (FORMAT JSON) there (sequential scans are disabled so only usable indexes are chosen).
+"""
+import os
+import re
+import pytest
+from sqlalchemy import event
+from app import create_app
+from app.config import Config
+from app.database import db
+from app.models import Product, Order, OrderItem
+
+BACKENDS = ["sqlite:///:memory:"]
+if os.getenv("QUERY_PLAN_DATABASE_URI"):
+    BACKENDS.append(os.getenv("QUERY_PLAN_DATABASE_URI"))
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda uri: uri.split(":")[0])
+def app(request):
+    config = Config()
+    config.TESTING = True
+    config.SQLALCHEMY_DATABASE_URI = request.param
+    config.RATELIMIT_ENABLED = False
+    config.CACHE_BACKEND = None
+    config.REDIS_URL = os.getenv("REDIS_URL_DEVELOPMENT", "redis://localhost:6379/0")
+
+    app = create_app(config)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def captured(app):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def dataset(client, auth_token):
+    product = Product(name="Product A", seller_id=1, price=10, stock=100, description="Xiaomi 13T Plus")
+    db.session.add(product)
+    for _ in range(3):
+        order = Order(buyer_id=1, total=10.00, status="pending")
+        order.order_products.append(OrderItem(product=product, quantity=1, price=10.00))
+        db.session.add(order)
+    db.session.commit()
+    return {"product_id": product.id, "order_id": order.id, "token": auth_token}
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def explain(statement: str, parameters) -> list:
+    """
+    Plan of a captured statement as a list of (operation, table, index) tuples.
+    """
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if db.engine.dialect.name == "postgresql":
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = cursor.fetchone()[0][0]["Plan"]
+            return [(node["Node Type"], node.get("Relation Name"), node.get("Index Name"))
+                    for node in _plan_nodes(plan)]
+
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        steps = []
+        for *_, detail in cursor.fetchall():
+            match = re.match(r"(SCAN|SEARCH) (?:TABLE )?(\w+)(?: USING (?:COVERING )?(INDEX \w+|INTEGER PRIMARY KEY))?",
+                             detail)
+            if match:
+                steps.append((match.group(1), match.group(2), match.group(3)))
+            else:
+                steps.append((detail, None, None))
+        return steps
+    finally:
+        raw.close()
+
+
+def is_full_scan(step) -> bool:
+    operation, table, index = step
+    return (operation == "SCAN" and index is None) or operation == "Seq Scan"
+
+
+def plans_for(captured: list, table: str) -> list:
+    plans = [explain(statement, parameters) for statement, parameters in captured
+             if re.search(rf"\bFROM {table}\b", statement)]
+    assert plans, f"No query on {table} was captured"
+    return plans
+
+
+def assert_uses_index(captured: list, table: str):
+    for plan in plans_for(captured, table):
+        steps = [step for step in plan if step[1] == table]
+        assert steps, plan
+        assert not any(is_full_scan(step) for step in steps), f"Full scan of {table}: {plan}"
+
+
+def test_product_by_id_uses_primary_key(client, dataset, captured):
+    client.get(f"/products/{dataset['product_id']}")
+
+    assert_uses_index(captured, "products")
+
+
+def test_products_list_is_read_in_primary_key_order(client, dataset, captured):
+    client.get("/products")
+
+    # The whole catalog is returned, so the scan itself is expected: no sort step is, because
+    # the rows are read in primary key order
+    for plan in plans_for(captured, "products"):
+        assert not any("TEMP B-TREE" in step[0] or step[0] == "Sort" for step in plan), plan
+
+
+def test_available_stock_reads_active_holds_by_index(client, dataset, captured):
+    client.get(f"/products/{dataset['product_id']}")
+    client.get("/products")
+
+    assert_uses_index(captured, "stock_reservations")
+
+
+def test_product_changes_use_change_seq_index(client, dataset, captured):
+    client.get("/products/changes?since=1")
+
+    assert_uses_index(captured, "products")
+    assert_uses_index(captured, "product_tombstones")
+
+
+def test_orders_by_buyer_uses_buyer_index(client, dataset, captured):
+    client.get("/orders/buyer/1", headers={"Authorization": f"Bearer {dataset['token']}"})
+
+    assert_uses_index(captured, "orders")
+    assert_uses_index(captured, "order_items")
+
+
+def test_order_summaries_by_buyer_read_only_orders(client, dataset, captured):
+    client.get("/orders/buyer/1?view=summary", headers={"Authorization": f"Bearer {dataset['token']}"})
+
+    assert_uses_index(captured, "orders")
+    assert not any(re.search(r"\bFROM order_items\b", statement) for statement, _ in captured)
+
+
+def test_items_of_an_order_use_order_index(client, dataset, captured):
+    client.get(f"/orders/{dataset['order_id']}", headers={"Authorization": f"Bearer {dataset['token']}"})
+
+    assert_uses_index(captured, "orders")
+    assert_uses_index(captured, "order_items")
+
+
+def test_sales_reports_read_rollups_by_day(client, dataset, captured):
+    for group_by in ("day", "product", "seller"):
+        client.get(f"/analytics/sales?group_by={group_by}", headers={"Authorization": f"Bearer {dataset['token']}"})
+
+    assert_uses_index(captured, "sales_daily")
+    assert_uses_index(captured, "sales_daily_products")
+
+
+def test_login_finds_user_by_email_index(client, dataset, captured):
+    client.post("/login", json={"email": "test@example.com", "password": "password123"})
+
+    assert_uses_index(captured, "users")
@@ -0,0 +1,27 @@
+import pytest
+from flask import Response
+from app.models import Product
+from app.database import db
+from app.utils.exceptions import NPlusOneQueryDetected
+from app.utils.query_tracker import statement_shape
+
+
+def test_statement_shape_collapses_placeholder_lists():
+    assert statement_shape("SELECT * FROM products WHERE id IN (?, ?, ?)") == \
+        statement_shape("SELECT *\n FROM products WHERE id IN (?)")
+
+
+def test_repeated_statement_raises_in_test_mode(app):
+    with app.test_request_context("/products"):
+        app.preprocess_request()
+        for product_id in range(app.config["SQL_N_PLUS_ONE_THRESHOLD"] + 1):
+            db.session.get(Product, product_id)
+
+        with pytest.raises(NPlusOneQueryDetected):
+            app.process_response(Response())
+
+
+def test_server_timing_header_reports_queries(client):
+    response = client.get("/products")
+
+    assert response.headers["Server-Timing"].startswith('db;desc="1 queries";dur=')
@@ -0,0 +1,72 @@
+import pytest
+from app import create_app
+from app.config import Config
+from app.database import db
+from app.models import Product
+from app.services.rate_limit import rate_limit_key
+from app.utils.cache import LocalCacheBackend
+
+
+@pytest.fixture
+def limited_app():
+    config = Config()
+    config.TESTING = True
+    config.SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    config.RATELIMIT_ENABLED = True
+    # Unreachable on purpose: the hybrid storage limits with its local counters
+    config.REDIS_URL = "redis://localhost:1/0"
+
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_key_is_user_when_token_present(client, auth_token):
+    with client.application.test_request_context(headers={"Authorization": f"Bearer {auth_token}"}):
+        assert rate_limit_key() == "user:1"
+
+
+def test_key_is_address_without_valid_token(client):
+    with client.application.test_request_context(headers={"Authorization": "Bearer not-a-token"},
+                                                 environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        assert rate_limit_key() == "10.0.0.1"
+
+
+def test_list_endpoint_costs_more_than_point_lookup(limited_app):
+    client = limited_app.test_client()
+    # 100/hour with "products.get_all_products" costing 5 hits
+    statuses = [client.get("/products").status_code for _ in range(21)]
+
+    assert statuses[:20] == [404] * 20
+    assert statuses[20] == 429
+
+
+def test_rows_returned_are_charged(limited_app):
+    limited_app.config["RATELIMIT_ROWS_PER_HIT"] = 10
+    db.session.add_all([Product(name=f"Product {i}", seller_id=1, price=10.00, stock=100,
+                                description="Xiaomi 13T Plus 250GB octa-core") for i in range(50)])
+    db.session.commit()
+    client = limited_app.test_client()
+
+    # Every call costs 5 hits before the view and 50 rows / 10 = 5 hits after it
+    statuses = [client.get("/products").status_code for _ in range(11)]
+
+    assert statuses[:10] == [200] * 10
+    assert statuses[10] == 429
+
+
+def test_rows_are_charged_on_cache_hits(limited_app):
+    limited_app.config["RATELIMIT_ROWS_PER_HIT"] = 10
+    limited_app.extensions["response_cache"] = LocalCacheBackend()
+    db.session.add_all([Product(name=f"Product {i}", seller_id=1, price=10.00, stock=100,
+                                description="Xiaomi 13T Plus 250GB octa-core") for i in range(50)])
+    db.session.commit()
+    client = limited_app.test_client()
+
+    responses = [client.get("/products") for _ in range(11)]
+
+    assert [response.headers.get("X-Cache") for response in responses[:10]] == ["MISS"] + ["HIT"] * 9
+    assert responses[10].status_code == 429
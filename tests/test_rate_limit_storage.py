@@ -0,0 +1,36 @@
+import time
+from limits import RateLimitItemPerMinute
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from app.utils.rate_limit_storage import HybridRedisStorage
+
+# Nothing listens on this port: the storage must degrade to local-only limiting
+UNREACHABLE_REDIS = "hybrid+redis://localhost:1/0"
+
+
+def test_storage_registered_for_hybrid_scheme():
+    storage = storage_from_string(UNREACHABLE_REDIS)
+
+    assert isinstance(storage, HybridRedisStorage)
+
+
+def test_limits_locally_when_redis_is_down():
+    storage = HybridRedisStorage(UNREACHABLE_REDIS)
+    limiter = FixedWindowRateLimiter(storage)
+    limit = RateLimitItemPerMinute(3)
+
+    assert [limiter.hit(limit, "client") for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(limit, "other-client")
+    assert not storage.check()
+
+
+def test_redis_not_retried_until_retry_after():
+    storage = HybridRedisStorage(UNREACHABLE_REDIS, retry_after=60)
+
+    storage.incr("client", 60)
+    retry_at = storage._retry_at
+    storage.incr("client", 60, amount=20)
+
+    assert storage._retry_at == retry_at
+    assert storage.get("client") == 21
+    assert storage.get_expiry("client") > time.time()
@@ -0,0 +1,83 @@
+import numpy as np
+from scipy import sparse
+from app.models import Product, Order, OrderItem
+from app.database import db
+from app.services.related_products import FileRelatedStore, build, top_k
+
+
+def _create_products(count):
+    products = [Product(name=f"Product {i}", seller_id=1, price=10, stock=100, description="Xiaomi 13T Plus")
+                for i in range(count)]
+    db.session.add_all(products)
+    db.session.commit()
+    return [product.id for product in products]
+
+
+def _create_order(*product_ids):
+    order = Order(buyer_id=1, total=10.00, status="pending")
+    for product_id in product_ids:
+        order.order_products.append(OrderItem(product_id=product_id, quantity=1, price=10.00))
+    db.session.add(order)
+    db.session.commit()
+
+
+def test_top_k_keeps_strongest_neighbours_in_order():
+    counts = sparse.csr_matrix(np.array([
+        [0, 3, 1, 5],
+        [3, 0, 0, 0],
+        [1, 0, 0, 2],
+        [5, 0, 2, 0],
+    ]))
+
+    related = top_k(counts, 2)
+
+    assert related[0].indices.tolist() == [3, 1]
+    assert related[0].data.tolist() == [5, 3]
+    assert related[1].indices.tolist() == [0]
+    assert related[2].indices.tolist() == [3, 0]
+
+
+def test_build_counts_products_bought_together(app, tmp_path):
+    a, b, c = _create_products(3)
+    _create_order(a, b)
+    _create_order(a, b, c)
+    _create_order(a, c, c)  # repeated items count once
+    store = FileRelatedStore(str(tmp_path))
+
+    build(store, str(tmp_path), k=5, chunk_orders=2, settle_minutes=0)
+
+    assert store.get(a) == [(b, 2), (c, 2)]
+    assert store.get(c) == [(a, 2), (b, 1)]
+
+
+def test_incremental_build_matches_full_build(app, tmp_path):
+    a, b, c = _create_products(3)
+    _create_order(a, b)
+    store = FileRelatedStore(str(tmp_path))
+    build(store, str(tmp_path), settle_minutes=0)
+
+    _create_order(b, c)
+    _create_order(a, b)
+    summary = build(store, str(tmp_path), settle_minutes=0)
+    incremental = [store.get(product_id) for product_id in (a, b, c)]
+
+    build(store, str(tmp_path), full=True, settle_minutes=0)
+    assert summary["orders_from"] == 1
+    assert incremental == [store.get(product_id) for product_id in (a, b, c)]
+    assert store.get(b) == [(a, 2), (c, 1)]
+
+
+def test_related_endpoint_serves_published_neighbours(app, client, tmp_path):
+    a, b, c = _create_products(3)
+    _create_order(a, b)
+    _create_order(a, b, c)
+    app.config["RELATED_PRODUCTS_DIR"] = str(tmp_path)
+    app.extensions["related_products"] = FileRelatedStore(str(tmp_path))
+
+    result = app.test_cli_runner().invoke(args=["build-related-products", "--settle-minutes", "0"])
+    assert result.exit_code == 0, result.output
+
+    response = client.get(f"/products/{a}/related?limit=1")
+    assert response.status_code == 200
+    assert response.get_json()["related"] == [{"id": b, "name": "Product 1", "price": 10, "orders_together": 2}]
+    assert client.get("/products/999/related").status_code == 404
@@ -0,0 +1,139 @@
+from datetime import timedelta
+from app.models import Product, StockReservation
+from app.database import db
+from app.services import reservations
+
+
+def _order(client, headers, product_id, quantity):
+    return client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product_id, "quantity": quantity}]},
+                       headers=headers)
+
+
+def _available(client, product_id):
+    return client.get(f"/products/{product_id}").get_json()["available_stock"]
+
+
+def test_orders_reserve_available_stock(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+
+    assert _order(client, auth_headers, product_id, 3).status_code == 201
+    response = _order(client, auth_headers, product_id, 3)
+
+    assert response.status_code == 400
+    assert "not enough stock" in response.get_json()["message"]
+    assert _available(client, product_id) == 2
+    assert client.get("/products").get_json()[0]["available_stock"] == 2
+    assert _order(client, auth_headers, product_id, 2).status_code == 201
+
+
+def test_new_and_expired_holds_refresh_the_cached_list(app, client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    client.get("/products")
+
+    _order(client, auth_headers, product_id, 3)
+    assert client.get("/products").get_json()[0]["available_stock"] == 2
+
+    for reservation in StockReservation.query.all():
+        reservation.expires_at -= timedelta(hours=1)
+    db.session.commit()
+    assert app.test_cli_runner().invoke(args=["release-expired-reservations"]).exit_code == 0
+    assert client.get("/products").get_json()[0]["available_stock"] == 5
+
+
+def test_cancel_releases_the_hold(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    order_id = _order(client, auth_headers, product_id, 5).get_json()["order_id"]
+
+    client.patch(f"/orders/{order_id}", json={"status": "cancelled"}, headers=auth_headers)
+
+    assert _available(client, product_id) == 5
+    assert StockReservation.query.count() == 0
+
+
+def test_shipping_takes_the_reserved_stock(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    order_id = _order(client, auth_headers, product_id, 4).get_json()["order_id"]
+    _order(client, auth_headers, product_id, 1)
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "shipped"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert db.session.get(Product, product_id).stock == 1
+    assert _available(client, product_id) == 0
+
+
+def test_shipping_without_a_hold_respects_other_holds(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    order_id = _order(client, auth_headers, product_id, 3).get_json()["order_id"]
+    StockReservation.query.filter_by(order_id=order_id).delete()
+    db.session.commit()
+    _order(client, auth_headers, product_id, 4)
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "shipped"}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert db.session.get(Product, product_id).stock == 5
+
+
+def test_batch_shipping_keeps_the_holds_of_orders_that_fail(client, auth_headers, create_product):
+    product_id, other_id = create_product(stock=5).id, create_product(stock=1).id
+    unheld_id = _order(client, auth_headers, product_id, 3).get_json()["order_id"]
+    StockReservation.query.filter_by(order_id=unheld_id).delete()
+    db.session.commit()
+    held_id = client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product_id, "quantity": 3},
+                                                                      {"product_id": other_id, "quantity": 1}]},
+                          headers=auth_headers).get_json()["order_id"]
+    db.session.get(Product, other_id).stock = 0
+    db.session.commit()
+
+    response = client.patch("/orders/status", json={"order_ids": [held_id, unheld_id], "status": "shipped"},
+                            headers=auth_headers)
+
+    # The failed order still holds 3 of the 5 units: the other one cannot take them
+    assert {failure["order_id"] for failure in response.get_json()["failed"]} == {held_id, unheld_id}
+    assert db.session.get(Product, product_id).stock == 5
+
+
+def test_deleting_an_order_releases_the_hold(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    order_id = _order(client, auth_headers, product_id, 5).get_json()["order_id"]
+
+    assert _available(client, product_id) == 0  # cached
+
+    client.delete(f"/orders/{order_id}", headers=auth_headers)
+
+    assert StockReservation.query.count() == 0
+    assert _available(client, product_id) == 5
+
+
+def test_reopening_a_cancelled_order_holds_its_stock_again(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    order_id = _order(client, auth_headers, product_id, 3).get_json()["order_id"]
+    client.patch(f"/orders/{order_id}", json={"status": "cancelled"}, headers=auth_headers)
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "pending"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert _available(client, product_id) == 2
+
+    client.patch(f"/orders/{order_id}", json={"status": "cancelled"}, headers=auth_headers)
+    _order(client, auth_headers, product_id, 4)
+    response = client.patch(f"/orders/{order_id}", json={"status": "pending"}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert "not enough stock" in response.get_json()["message"]
+    assert _available(client, product_id) == 1
+
+
+def test_expired_holds_do_not_count_and_are_swept(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    for _ in range(3):
+        _order(client, auth_headers, product_id, 1)
+    for reservation in StockReservation.query.all():
+        reservation.expires_at -= timedelta(hours=1)
+    db.session.commit()
+
+    assert reservations.held_quantities([product_id]) == {}
+    assert reservations.release_expired(batch_size=2) == (2, [product_id])
+    assert reservations.release_expired(batch_size=2) == (1, [product_id])
+    assert reservations.release_expired(batch_size=2) == (0, [])
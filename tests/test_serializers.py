@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from app.models import Order, OrderItem
+from app.database import db
+from app.serializers import ORDER, PRODUCT, order_items
+
+
+def test_dump_converts_and_fills_computed_fields(app, create_product):
+    product = create_product(stock=5, description="Xiaomi 13T Plus " * 100)
+    order = Order(buyer_id=1, total=20.004, status="pending")
+    order.order_products.append(OrderItem(product=product, quantity=2, price=10.0004))
+    db.session.add(order)
+    db.session.commit()
+
+    assert ORDER.dump(order, ("order_id", "total", "order_products"), order_products=order_items) == {
+        "order_id": order.id,
+        "total": 20.0,
+        "order_products": [{"product_id": product.id, "quantity": 2, "price": 10.0}]
+    }
+    assert list(PRODUCT.dump(product, available_stock=lambda product: 3)) == list(PRODUCT.default)
+
+
+def test_sparse_fields_select_only_their_columns(client, app, create_product):
+    create_product(stock=5, description="Xiaomi 13T Plus " * 100)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        response = client.get("/products?fields=price,id,name")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert response.status_code == 200
+    assert list(response.get_json()[0]) == ["id", "name", "price"]
+    products_query = [statement for statement in statements if "FROM products" in statement]
+    assert products_query and not any("description" in statement for statement in products_query)
+    # available_stock was not requested, so the holds are not read either
+    assert not any("stock_reservations" in statement for statement in statements)
+
+
+def test_sparse_fields_on_single_resources(client, auth_token, create_product):
+    product = create_product(stock=5, description="Xiaomi 13T Plus " * 100)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    assert client.get(f"/products/{product.id}?fields=id,available_stock").get_json() == {
+        "id": product.id, "available_stock": 5}
+    assert client.get("/users/1?fields=role", headers=headers).get_json() == {"role": "buyer"}
+    assert "ETag" in client.get("/users/1?fields=role", headers=headers).headers
+
+
+def test_order_lists_load_items_only_when_requested(client, auth_token, create_product):
+    product = create_product(stock=5, description="Xiaomi 13T Plus " * 100)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product.id, "quantity": 2}]},
+                headers=headers)
+
+    orders = client.get("/orders/buyer/1?fields=order_id,status", headers=headers).get_json()
+    assert list(orders[0]) == ["order_id", "status"]
+
+    orders = client.get("/orders?fields=order_products", headers=headers).get_json()
+    assert orders == [{"order_products": [{"product_id": product.id, "quantity": 2, "price": 10.0}]}]
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get("/products?fields=id,secret")
+
+    assert response.status_code == 400
+    assert "secret" in response.get_json()["message"]
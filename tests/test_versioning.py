@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import Order, Product, User
+from app.database import db
+
+
+def test_product_etag_follows_the_version(client, auth_headers, create_product):
+    product_id = create_product().id
+
+    response = client.get(f"/products/{product_id}")
+    assert response.headers["ETag"] == '"1"'
+
+    response = client.patch(f"/products/{product_id}", json={"stock": 7},
+                            headers={**auth_headers, "If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert client.get(f"/products/{product_id}").headers["ETag"] == '"2"'
+
+
+def test_compressed_responses_carry_the_encoding_in_the_etag(client, auth_headers, create_product):
+    product = create_product(stock=5, description="Xiaomi 13T Plus " * 100)
+    gzip_headers = {"Accept-Encoding": "gzip"}
+
+    miss = client.get(f"/products/{product.id}", headers=gzip_headers)
+    hit = client.get(f"/products/{product.id}", headers=gzip_headers)
+
+    assert miss.headers["Content-Encoding"] == hit.headers["Content-Encoding"] == "gzip"
+    assert miss.headers["ETag"] == hit.headers["ETag"] == '"1-gzip"'
+    assert client.get(f"/products/{product.id}").headers["ETag"] == '"1"'
+    assert client.patch(f"/products/{product.id}", json={"stock": 7},
+                        headers={**auth_headers, "If-Match": '"1-gzip"'}).status_code == 200
+
+
+def test_stale_if_match_is_a_conflict(client, auth_headers, create_product):
+    product_id = create_product(stock=5).id
+    client.patch(f"/products/{product_id}", json={"stock": 7}, headers=auth_headers)
+
+    response = client.patch(f"/products/{product_id}", json={"stock": 1},
+                            headers={**auth_headers, "If-Match": '"1"'})
+
+    assert response.status_code == 409
+    assert response.get_json()["error"] == "Conflict"
+    assert db.session.get(Product, product_id).stock == 7
+
+
+def test_wildcard_and_missing_if_match_update(client, auth_headers, create_product):
+    product_id = create_product().id
+
+    assert client.patch(f"/products/{product_id}", json={"stock": 6},
+                        headers={**auth_headers, "If-Match": "*"}).status_code == 200
+    assert client.patch(f"/products/{product_id}", json={"stock": 4}, headers=auth_headers).status_code == 200
+    assert db.session.get(Product, product_id).version == 3
+
+
+def test_concurrent_write_is_detected_at_commit(app, create_product):
+    product_id = create_product(stock=5).id
+    product = db.session.get(Product, product_id)
+
+    # Another writer (e.g. the flash-sale flush) changes the row after it was read
+    products = Product.__table__
+    db.session.execute(update(products).where(products.c.id == product_id)
+                       .values(stock=products.c.stock - 1, version=products.c.version + 1))
+    product.stock = 10
+
+    with pytest.raises(StaleDataError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_order_update_checks_if_match(client, auth_headers, create_product):
+    product_id = create_product().id
+    order_id = client.post("/orders", json={"buyer_id": 1, "products": [{"product_id": product_id, "quantity": 1}]},
+                           headers=auth_headers).get_json()["order_id"]
+    etag = client.get(f"/orders/{order_id}", headers=auth_headers).headers["ETag"]
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "shipped"},
+                            headers={**auth_headers, "If-Match": '"99"'})
+    assert response.status_code == 409
+    assert db.session.get(Order, order_id).status == "pending"
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "shipped"},
+                            headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_user_update_checks_if_match(client, auth_headers):
+    assert client.get("/users/1", headers=auth_headers).headers["ETag"] == '"1"'
+    client.patch("/users/1", json={"name": "First"}, headers={**auth_headers, "If-Match": '"1"'})
+
+    response = client.patch("/users/1", json={"name": "Second"}, headers={**auth_headers, "If-Match": '"1"'})
+
+    assert response.status_code == 409
+    assert db.session.get(User, 1).name == "First"